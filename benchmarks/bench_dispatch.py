@@ -0,0 +1,194 @@
+"""Dispatch overhead benchmark.
+
+Measures the requests per second and the median and p99 latencies of a
+LogicLayer app called in-process, for sync and async routes, routes with path,
+query and body parameters, raw routes, apps with many modules, and the
+`/_health` route with several checks. The same routes in a plain FastAPI app are measured too,
+so the cost LogicLayer adds on top of FastAPI can be read from the results.
+
+Usage:
+    python -m benchmarks.bench_dispatch [--requests N] [--rounds N] [--filter TEXT]
+        [--output results.json] [--baseline baseline.json] [--threshold 0.1]
+
+With `--baseline`, each case is compared against the results of a previous run
+written with `--output`, and the command fails if the median latency of any
+case grew more than `threshold`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from dataclasses import dataclass
+
+from fastapi import FastAPI
+
+import logiclayer as ll
+
+from .harness import BenchCase, BenchRequest, compare, print_result, run_case, write_results
+
+
+@dataclass
+class BodySchema:
+    value: str
+
+
+class BenchModule(ll.LogicLayerModule):
+    @ll.route("GET", "/sync")
+    def route_sync(self):
+        return {"ok": True}
+
+    @ll.route("GET", "/async")
+    async def route_async(self):
+        return {"ok": True}
+
+    @ll.route("GET", "/item/{item_id}")
+    async def route_path(self, item_id: int):
+        return {"id": item_id}
+
+    @ll.route("GET", "/query")
+    async def route_query(self, name: str, limit: int = 10, exact: bool = False):
+        return {"name": name, "limit": limit, "exact": exact}
+
+    @ll.route("POST", "/body")
+    async def route_body(self, body: BodySchema):
+        return {"value": body.value}
+
+
+class RawBenchModule(ll.LogicLayerModule):
+    @ll.route("GET", "/sync", raw=True)
+    def route_sync(self):
+        return {"ok": True}
+
+    @ll.route("GET", "/async", raw=True)
+    async def route_async(self):
+        return {"ok": True}
+
+    @ll.route("GET", "/item/{item_id}", raw=True)
+    async def route_path(self, item_id: int):
+        return {"id": item_id}
+
+    @ll.route("GET", "/query", raw=True)
+    async def route_query(self, name: str, limit: int = 10, exact: bool = False):
+        return {"name": name, "limit": limit, "exact": exact}
+
+
+def build_fastapi() -> FastAPI:
+    """Build a plain FastAPI app with the same routes as :class:`BenchModule`."""
+    app = FastAPI()
+
+    @app.get("/bench/sync")
+    def route_sync():
+        return {"ok": True}
+
+    @app.get("/bench/async")
+    async def route_async():
+        return {"ok": True}
+
+    @app.get("/bench/item/{item_id}")
+    async def route_path(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/bench/query")
+    async def route_query(name: str, limit: int = 10, exact: bool = False):
+        return {"name": name, "limit": limit, "exact": exact}
+
+    @app.post("/bench/body")
+    async def route_body(body: BodySchema):
+        return {"value": body.value}
+
+    return app
+
+
+def build_layer(modules: int = 1) -> ll.LogicLayer:
+    layer = ll.LogicLayer(healthchecks=False)
+    for index in range(modules - 1):
+        layer.add_module(f"/filler{index}", BenchModule())
+    layer.add_module("/bench", BenchModule())
+    return layer
+
+
+def build_raw() -> ll.LogicLayer:
+    layer = ll.LogicLayer(healthchecks=False)
+    layer.add_module("/bench", RawBenchModule())
+    return layer
+
+
+def build_health(checks: int) -> ll.LogicLayer:
+    layer = ll.LogicLayer()
+    for index in range(checks):
+
+        async def check() -> bool:
+            return True
+
+        check.__name__ = f"check_{index}"
+        layer.add_check(check)
+    return layer
+
+
+REQUESTS = {
+    "sync": BenchRequest(path="/bench/sync"),
+    "async": BenchRequest(path="/bench/async"),
+    "path": BenchRequest(path="/bench/item/42"),
+    "query": BenchRequest(path="/bench/query", query={"name": "abc", "limit": 5, "exact": 1}),
+    "body": BenchRequest(method="POST", path="/bench/body", body={"value": "abc"}),
+}
+
+
+def build_cases() -> list[BenchCase]:
+    cases = []
+    for name, request in REQUESTS.items():
+        cases.append(BenchCase(f"fastapi.{name}", build_fastapi, request))
+        cases.append(BenchCase(f"logiclayer.{name}", build_layer, request))
+        if request.method == "GET":
+            cases.append(BenchCase(f"logiclayer.raw_{name}", build_raw, request))
+    for modules in (10, 50):
+        cases.append(
+            BenchCase(
+                f"logiclayer.modules_{modules}",
+                lambda modules=modules: build_layer(modules),
+                REQUESTS["async"],
+                f"Route of the last of {modules} modules",
+            )
+        )
+    for checks in (0, 10, 50):
+        cases.append(
+            BenchCase(
+                f"logiclayer.health_{checks}",
+                lambda checks=checks: build_health(checks),
+                BenchRequest(path="/_health", status=204),
+                f"/_health with {checks} checks",
+            )
+        )
+    return cases
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--filter", default="", help="Run only the cases containing this text")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare the results against this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = []
+    for case in build_cases():
+        if args.filter in case.name:
+            result = run_case(case, requests=args.requests, rounds=args.rounds)
+            print_result(result)
+            results.append(result)
+
+    if args.output:
+        write_results(args.output, results, requests=args.requests, rounds=args.rounds)
+    if args.baseline:
+        regressions = compare(results, args.baseline, threshold=args.threshold)
+        if regressions:
+            print(f"\nRegressions above {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
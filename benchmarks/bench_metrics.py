@@ -0,0 +1,109 @@
+"""Metrics overhead benchmark.
+
+Measures the cost added by the metrics instrumentation of a LogicLayer app:
+the recording of a single request, the instrumentation around a minimal ASGI
+app (where the difference is not hidden by the cost of the routing), and
+end-to-end by calling the full app in-process with and without metrics.
+
+Usage:
+    python -m benchmarks.bench_metrics [--requests N] [--rounds N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import timeit
+from typing import Callable
+
+import logiclayer as ll
+from logiclayer.metrics import MetricsRegistry
+
+
+class BenchModule(ll.LogicLayerModule):
+    @ll.route("GET", "/item/{item_id}")
+    async def route_item(self, item_id: int):
+        return {"id": item_id}
+
+
+def build_layer(*, metrics: bool) -> ll.LogicLayer:
+    layer = ll.LogicLayer(metrics_path="/_metrics" if metrics else None)
+    layer.add_module("/bench", BenchModule())
+    return layer
+
+
+async def bare_app(scope, receive, send) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def build_bare_layer(*, metrics: bool) -> ll.LogicLayer:
+    layer = build_layer(metrics=metrics)
+    layer.app = bare_app  # type: ignore[assignment]
+    return layer
+
+
+async def drive(layer: ll.LogicLayer, requests: int) -> float:
+    """Call the app `requests` times and return the seconds per request."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/bench/item/1",
+        "raw_path": b"/bench/item/1",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(100):
+        await layer(dict(scope), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await layer(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    scope = {"route": None, "endpoint": None}
+    number = 200_000
+    record = timeit.timeit(lambda: registry.observe_request(scope, 200, 0.01), number=number)
+    print(f"Recording a request: {record / number * 1e6:.2f} us")
+
+    compare("Minimal ASGI app", build_bare_layer, args)
+    compare("Full app", build_layer, args)
+
+
+def compare(title: str, build: Callable[..., ll.LogicLayer], args: argparse.Namespace) -> None:
+    # alternate the runs and keep the best of each, to reduce the noise
+    plain, measured = build(metrics=False), build(metrics=True)
+    base = instrumented = float("inf")
+    for _ in range(args.rounds):
+        base = min(base, asyncio.run(drive(plain, args.requests)))
+        instrumented = min(instrumented, asyncio.run(drive(measured, args.requests)))
+    print(f"{title}:")
+    print(f"  Request without metrics: {base * 1e6:.1f} us")
+    print(f"  Request with metrics:    {instrumented * 1e6:.1f} us")
+    print(f"  Overhead per request:    {(instrumented - base) * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Serialization benchmark.
+
+Compares the time to serialize typical route results through FastAPI's default
+path (`jsonable_encoder` followed by `JSONResponse.render`) against the
+LogicLayer fast path (`FastJSONResponse.render`).
+
+Since `jsonable_encoder` doesn't support numpy or pandas objects, the default
+path receives the same data already converted to native python objects, as a
+route has to do today.
+
+Usage:
+    python -m benchmarks.bench_serialization [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import statistics
+import timeit
+from typing import Any, Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from logiclayer import FastJSONResponse, ModuleStatus, responses
+
+
+def build_payloads() -> dict[str, tuple[Any, Any]]:
+    """Return pairs of (native payload, payload for the fast path) by name."""
+    start = datetime.datetime(2024, 1, 1)
+    records = [
+        {"id": index, "value": index * 0.5, "label": f"item-{index}", "date": start}
+        for index in range(10_000)
+    ]
+    status = ModuleStatus(module="bench", version="1.0", debug=False, status="ok")
+    payloads: dict[str, tuple[Any, Any]] = {
+        "records": (records, records),
+        "status": (status, status),
+    }
+
+    try:
+        import numpy as np
+    except ImportError:
+        return payloads
+
+    arrays = {"x": np.arange(100_000, dtype="float64"), "y": np.arange(100_000)}
+    native = {key: value.tolist() for key, value in arrays.items()}
+    payloads["numpy"] = (native, arrays)
+
+    try:
+        import pandas as pd
+    except ImportError:
+        return payloads
+
+    df = pd.DataFrame({"id": np.arange(10_000), "value": np.random.rand(10_000)})
+    payloads["dataframe"] = (df.to_dict(orient="records"), df)
+    return payloads
+
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    """Return the median time in milliseconds of a call to `func`."""
+    number = 5
+    times = timeit.repeat(func, number=number, repeat=repeat)
+    return statistics.median(times) / number * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    default = JSONResponse(None)
+    fast = FastJSONResponse(None)
+    encoder = "orjson" if responses.orjson is not None else "json"
+    print(f"Fast path encoder: {encoder}")
+    print(f"{'payload':<12}{'default (ms)':>14}{'fast (ms)':>12}{'speedup':>10}")
+
+    for name, (native, rich) in build_payloads().items():
+        base = measure(lambda: default.render(jsonable_encoder(native)), args.repeat)
+        opt = measure(lambda: fast.render(rich), args.repeat)
+        print(f"{name:<12}{base:>14.2f}{opt:>12.2f}{base / opt:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
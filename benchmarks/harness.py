@@ -0,0 +1,219 @@
+"""Benchmark harness.
+
+Drives ASGI apps in-process, without a server or network, and records the
+latency of each request. The results can be written as JSON and compared
+against the results of a previous run, to catch regressions between releases.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses as dcls
+import json
+import platform
+import statistics
+import sys
+import time
+from collections.abc import Awaitable, Iterable, Sequence
+from pathlib import Path
+from typing import Any, Callable, Optional
+from urllib.parse import urlencode
+
+from starlette.types import ASGIApp, Message, Scope
+
+
+@dcls.dataclass(frozen=True)
+class BenchRequest:
+    """A request sent repeatedly to an app."""
+
+    method: str = "GET"
+    path: str = "/"
+    query: Optional[dict[str, Any]] = None
+    body: Any = None
+    status: int = 200
+
+    def scope(self) -> Scope:
+        headers = [(b"host", b"bench")]
+        if self.body is not None:
+            headers.append((b"content-type", b"application/json"))
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": self.method,
+            "scheme": "http",
+            "path": self.path,
+            "raw_path": self.path.encode(),
+            "root_path": "",
+            "query_string": urlencode(self.query or {}, doseq=True).encode(),
+            "headers": headers,
+            "client": ("127.0.0.1", 1234),
+            "server": ("bench", 80),
+        }
+
+
+@dcls.dataclass(frozen=True)
+class BenchCase:
+    """A scenario to measure: an app factory and the request to send to it."""
+
+    name: str
+    build: Callable[[], ASGIApp]
+    request: BenchRequest
+    description: str = ""
+
+
+@dcls.dataclass
+class BenchResult:
+    """Summary of the latencies measured for a case, in microseconds."""
+
+    name: str
+    requests: int
+    rps: float
+    mean: float
+    p50: float
+    p99: float
+
+    @classmethod
+    def from_latencies(cls, name: str, latencies: Sequence[float]) -> BenchResult:
+        ordered = sorted(latencies)
+        total = sum(ordered)
+        return cls(
+            name=name,
+            requests=len(ordered),
+            rps=len(ordered) / total if total else 0.0,
+            mean=statistics.fmean(ordered) * 1e6,
+            p50=_percentile(ordered, 0.50) * 1e6,
+            p99=_percentile(ordered, 0.99) * 1e6,
+        )
+
+
+async def drive(app: ASGIApp, request: BenchRequest, requests: int) -> list[float]:
+    """Send a request to an app `requests` times, returning each latency in seconds."""
+    scope = request.scope()
+    body = json.dumps(request.body).encode() if request.body is not None else b""
+    status = 0
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message: Message) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    latencies = []
+    clock = time.perf_counter
+    for _ in range(requests):
+        start = clock()
+        await app(dict(scope), receive, send)
+        latencies.append(clock() - start)
+
+    if status != request.status:
+        msg = f"{request.method} {request.path} answered {status}, expected {request.status}"
+        raise RuntimeError(msg)
+    return latencies
+
+
+async def _lifespan(app: ASGIApp, body: Callable[[], Awaitable[Any]]) -> Any:
+    """Run the startup and shutdown events of an app around a coroutine."""
+    events: asyncio.Queue[Message] = asyncio.Queue()
+    replies: asyncio.Queue[Message] = asyncio.Queue()
+    await events.put({"type": "lifespan.startup"})
+
+    async def send(message: Message) -> None:
+        await replies.put(message)
+
+    task = asyncio.ensure_future(app({"type": "lifespan", "state": {}}, events.get, send))
+    reply = await replies.get()
+    if reply["type"] != "lifespan.startup.complete":
+        task.cancel()
+        raise RuntimeError(f"The app failed to start: {reply.get('message')}")
+    try:
+        return await body()
+    finally:
+        await events.put({"type": "lifespan.shutdown"})
+        await replies.get()
+        await task
+
+
+def run_case(case: BenchCase, *, requests: int, rounds: int, warmup: int = 200) -> BenchResult:
+    """Measure a case, keeping the round with the best median latency."""
+    app = case.build()
+
+    async def measure() -> list[float]:
+        await drive(app, case.request, warmup)
+        best: list[float] = []
+        for _ in range(rounds):
+            latencies = await drive(app, case.request, requests)
+            if not best or statistics.median(latencies) < statistics.median(best):
+                best = latencies
+        return best
+
+    latencies = asyncio.run(_lifespan(app, measure))
+    return BenchResult.from_latencies(case.name, latencies)
+
+
+def write_results(path: str | Path, results: Iterable[BenchResult], **metadata: Any) -> None:
+    """Write the results of a run as JSON, with details of the environment."""
+    import fastapi
+    import starlette
+
+    import logiclayer
+
+    content = {
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "logiclayer": logiclayer.__version__,
+            "fastapi": fastapi.__version__,
+            "starlette": starlette.__version__,
+        },
+        **metadata,
+        "results": {item.name: dcls.asdict(item) for item in results},
+    }
+    Path(path).write_text(json.dumps(content, indent=2) + "\n")
+
+
+def compare(
+    results: Iterable[BenchResult],
+    baseline: str | Path,
+    *,
+    threshold: float = 0.1,
+) -> list[str]:
+    """Compare the results against a baseline file written by :func:`write_results`.
+
+    Prints the change of the median and p99 latencies of each case, and returns
+    the names of the cases whose median latency grew more than `threshold`.
+    """
+    previous = json.loads(Path(baseline).read_text())["results"]
+    regressions = []
+    print(f"\n{'case':<32} {'p50 base':>10} {'p50':>10} {'change':>8} {'p99 change':>11}")
+    for result in results:
+        base = previous.get(result.name)
+        if base is None:
+            print(f"{result.name:<32} {'-':>10} {result.p50:>10.1f}")
+            continue
+        change = result.p50 / base["p50"] - 1
+        tail = result.p99 / base["p99"] - 1
+        flag = "  <-- regression" if change > threshold else ""
+        print(
+            f"{result.name:<32} {base['p50']:>10.1f} {result.p50:>10.1f} "
+            f"{change:>+8.1%} {tail:>+11.1%}{flag}"
+        )
+        if change > threshold:
+            regressions.append(result.name)
+    return regressions
+
+
+def print_result(result: BenchResult) -> None:
+    print(
+        f"{result.name:<32} {result.rps:>10.0f} req/s"
+        f"  p50 {result.p50:>8.1f} us  p99 {result.p99:>8.1f} us"
+    )
+
+
+def _percentile(ordered: Sequence[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
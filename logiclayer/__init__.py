@@ -5,23 +5,88 @@ __description__ = "A framework to quickly compose and use multiple functionaliti
 __version__ = "0.4.4"
 
 __all__ = (
+    "AdmissionPolicy",
+    "ArrowResponse",
+    "AsyncAuthProvider",
     "AuthProvider",
     "AuthToken",
     "AuthTokenType",
+    "BatchConfig",
+    "BatchItem",
+    "BatchResult",
+    "CacheBackend",
+    "CachePolicy",
+    "CacheStats",
+    "CachedAuthProvider",
+    "Deadline",
+    "DeadlineExceeded",
+    "DiskJobStore",
+    "ExecutorConfig",
+    "FastJSONResponse",
+    "JobStatus",
+    "JobStore",
+    "JobsConfig",
+    "JWTAuthProvider",
+    "LazyModule",
     "LogicLayer",
     "LogicLayerException",
     "LogicLayerModule",
+    "MemoryCache",
+    "MemoryJobStore",
     "ModuleStatus",
     "NotAuthorized",
+    "OpenAPIConfig",
+    "Overloaded",
+    "PoolTimeout",
+    "RecordStreamResponse",
+    "ResourcePool",
+    "ResourceRef",
+    "SharedMemoryCache",
+    "SharedResource",
+    "SharedStore",
+    "StaticConfig",
+    "TracingConfig",
+    "current_deadline",
     "exception_handler",
     "healthcheck",
+    "memoize",
     "on_shutdown",
     "on_startup",
+    "resource",
     "route",
+    "span",
 )
 
-from .auth import AuthProvider, AuthToken, AuthTokenType, NotAuthorized
+from .admission import AdmissionPolicy, Overloaded
+from .auth import (
+    AsyncAuthProvider,
+    AuthProvider,
+    AuthToken,
+    AuthTokenType,
+    CachedAuthProvider,
+    JWTAuthProvider,
+    NotAuthorized,
+)
+from .batch import BatchConfig, BatchItem, BatchResult
+from .cache import CacheBackend, CachePolicy, CacheStats, MemoryCache
 from .common import LogicLayerException
-from .decorators import exception_handler, healthcheck, on_shutdown, on_startup, route
+from .deadline import Deadline, DeadlineExceeded, current_deadline
+from .executor import ExecutorConfig
+from .decorators import (
+    exception_handler,
+    healthcheck,
+    memoize,
+    on_shutdown,
+    on_startup,
+    route,
+)
+from .jobs import DiskJobStore, JobsConfig, JobStatus, JobStore, MemoryJobStore
+from .lazy import LazyModule
 from .logiclayer import LogicLayer
 from .module import LogicLayerModule, ModuleStatus
+from .openapi import OpenAPIConfig
+from .resources import PoolTimeout, ResourcePool, ResourceRef, SharedResource, resource
+from .responses import ArrowResponse, FastJSONResponse, RecordStreamResponse
+from .shared_cache import SharedMemoryCache, SharedStore
+from .static import StaticConfig
+from .tracing import TracingConfig, span
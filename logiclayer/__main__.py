@@ -0,0 +1,31 @@
+"""Command line tools of the LogicLayer package.
+
+Usage:
+    python -m logiclayer openapi package.module:layer CACHE_DIR
+"""
+
+import argparse
+import sys
+
+from .openapi import build_cache
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m logiclayer")
+    commands = parser.add_subparsers(dest="command", required=True)
+    openapi = commands.add_parser(
+        "openapi",
+        help="Build the OpenAPI schema of an app into a cache directory.",
+    )
+    openapi.add_argument("app", help="The app to import, as 'package.module:attribute'")
+    openapi.add_argument("cache_dir", help="The directory where the schema is stored")
+    args = parser.parse_args()
+
+    if args.command == "openapi":
+        schema = build_cache(args.app, args.cache_dir)
+        print(f"Stored the OpenAPI schema {schema.etag} in {args.cache_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""Admission control module.
+
+Contains the definitions to limit the amount of requests a module, or a single
+route, handles at the same time. Requests beyond the limit wait in a bounded
+queue, and are rejected when the queue is full or they wait for too long, so a
+spike of traffic to a module doesn't degrade the latency of the whole app.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses as dcls
+from collections import deque
+from collections.abc import Awaitable, Iterable, Sequence
+from typing import Any, Callable, Optional
+
+from starlette.requests import Request
+
+from .common import Handler, LogicLayerException
+
+
+class Overloaded(LogicLayerException):
+    """A module or route is handling too many requests to accept another."""
+
+    def __init__(self, name: str, retry_after: int = 1) -> None:
+        super().__init__(f"'{name}' is handling too many requests, try again later.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+@dcls.dataclass(frozen=True)
+class AdmissionPolicy:
+    """Defines how many requests a module or route handles at the same time.
+
+    Attributes:
+        max_concurrent :int:
+            Maximum amount of requests being handled at the same time.
+        max_queue :int:
+            Maximum amount of requests waiting for their turn. Requests arriving
+            when the queue is full are rejected right away.
+        queue_timeout :float | None:
+            Maximum seconds a request can wait in the queue before being
+            rejected. `None` means it waits until its turn.
+        bypass_roles :frozenset[str]:
+            Requests from users with any of these roles are not limited.
+        retry_after :int:
+            Seconds suggested to the rejected clients before trying again.
+
+    """
+
+    max_concurrent: int
+    max_queue: int = 0
+    queue_timeout: Optional[float] = None
+    bypass_roles: frozenset[str] = frozenset()
+    retry_after: int = 1
+
+    def __post_init__(self) -> None:
+        if self.max_concurrent < 1 or self.max_queue < 0:
+            msg = "max_concurrent must be positive, and max_queue can't be negative"
+            raise ValueError(msg)
+        if not isinstance(self.bypass_roles, frozenset):
+            object.__setattr__(self, "bypass_roles", frozenset(self.bypass_roles))
+
+
+@dcls.dataclass
+class AdmissionStats:
+    """Counters describing the requests admitted by a limit."""
+
+    max_concurrent: int
+    active: int = 0
+    queued: int = 0
+    admitted: int = 0
+    bypassed: int = 0
+    rejected: int = 0
+    timeouts: int = 0
+
+
+class AdmissionController:
+    """Admits the requests to a module or route according to a policy."""
+
+    def __init__(self, policy: AdmissionPolicy, *, name: str) -> None:
+        self.policy = policy
+        self.name = name
+        self.stats = AdmissionStats(max_concurrent=policy.max_concurrent)
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+    def bypasses(self, roles: Iterable[str]) -> bool:
+        """Check if a request with these roles is not limited."""
+        return not self.policy.bypass_roles.isdisjoint(roles)
+
+    async def acquire(self) -> None:
+        """Wait for a turn to handle a request, or raise :class:`Overloaded`."""
+        policy = self.policy
+        stats = self.stats
+        if stats.active < policy.max_concurrent and not self._waiters:
+            stats.active += 1
+            stats.admitted += 1
+            return
+
+        if len(self._waiters) >= policy.max_queue:
+            stats.rejected += 1
+            raise Overloaded(self.name, policy.retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        stats.queued += 1
+        try:
+            await asyncio.wait_for(future, policy.queue_timeout)
+        except BaseException as exc:
+            # the turn could have been handed over right before the cancellation
+            if future.done() and not future.cancelled():
+                self.release()
+            if isinstance(exc, asyncio.TimeoutError):
+                stats.timeouts += 1
+                stats.rejected += 1
+                raise Overloaded(self.name, policy.retry_after) from None
+            raise
+        finally:
+            stats.queued -= 1
+            if future in self._waiters:
+                self._waiters.remove(future)
+        stats.admitted += 1
+
+    def release(self) -> None:
+        """End the turn of a request, and hand it over to the next waiting."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.stats.active -= 1
+
+
+def admitted_handler(
+    handler: Handler,
+    controllers: Sequence[AdmissionController],
+    *,
+    get_roles: Optional[Callable[[Request], Awaitable[Iterable[str]]]] = None,
+) -> Handler:
+    """Wrap a route handler to run only when admitted by all the controllers.
+
+    For streaming routes, the turn ends when the response starts, not when the
+    last record is sent.
+    """
+    resolve_roles = get_roles if any(item.policy.bypass_roles for item in controllers) else None
+
+    async def admission_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+        roles = await resolve_roles(request) if resolve_roles is not None else ()
+        acquired: list[AdmissionController] = []
+        try:
+            for controller in controllers:
+                if roles and controller.bypasses(roles):
+                    controller.stats.bypassed += 1
+                    continue
+                await controller.acquire()
+                acquired.append(controller)
+            return await handler(request, kwargs)
+        finally:
+            for controller in reversed(acquired):
+                controller.release()
+
+    return admission_handler
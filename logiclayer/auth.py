@@ -1,9 +1,19 @@
 import abc
 import enum
-from typing import Any, Iterable, Mapping, NamedTuple, Optional, Set
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Mapping, NamedTuple, Optional, Sequence, Set, Tuple, Union
 
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import HTTPConnection
+
+from .coalesce import SingleFlight
 from .common import LogicLayerException
 
+logger = logging.getLogger("logiclayer.auth")
+
 
 class NotAuthorized(LogicLayerException):
     """The roles provided don't match the roles needed to access some of the
@@ -35,6 +45,36 @@ class AuthToken(NamedTuple):
     value: str
 
 
+def parse_token(request: HTTPConnection) -> Optional[AuthToken]:
+    """Retrieve the authorization token used in a request, if present.
+
+    The `Authorization` header takes precedence over the `token` search param.
+    Bearer tokens with the shape of a JWT are labeled as such, otherwise are
+    considered OAuth 2.0 tokens.
+    """
+    header = request.headers.get("authorization")
+    if header:
+        scheme, _, value = header.partition(" ")
+        scheme = scheme.lower()
+        value = value.strip()
+        if scheme == "bearer":
+            kind = AuthTokenType.JWTOKEN if value.count(".") == 2 else AuthTokenType.OAUTH20
+            return AuthToken(kind, value)
+        if scheme == "basic":
+            return AuthToken(AuthTokenType.BASIC, value)
+        if scheme == "digest":
+            return AuthToken(AuthTokenType.DIGEST, value)
+        if scheme == "oauth":
+            return AuthToken(AuthTokenType.OAUTH10A, value)
+        return AuthToken(AuthTokenType.CUSTOM, header)
+
+    token = request.query_params.get("token")
+    if token:
+        return AuthToken(AuthTokenType.SEARCHPARAM, token)
+
+    return None
+
+
 class AuthProvider(abc.ABC):
     @abc.abstractmethod
     def get_roles(self, token: Optional["AuthToken"]) -> Set[str]:
@@ -51,3 +91,243 @@ class VoidAuthProvider(AuthProvider):
 
     def get_user(self, token):
         return None
+
+
+class AsyncAuthProvider(abc.ABC):
+    """Variant of :class:`AuthProvider` for providers which need to do I/O,
+    like calling an identity service, to resolve the roles and the user."""
+
+    @abc.abstractmethod
+    async def get_roles(self, token: Optional["AuthToken"]) -> Set[str]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_user(self, token: Optional["AuthToken"]) -> Optional[Mapping[str, Any]]:
+        raise NotImplementedError
+
+
+AnyAuthProvider = Union[AuthProvider, AsyncAuthProvider]
+
+
+class CachedAuthProvider(AsyncAuthProvider):
+    """Caches the roles and users resolved by another auth provider.
+
+    Results are stored by token for `ttl` seconds. Empty results, and errors
+    raised by the wrapped provider, are stored for `negative_ttl` seconds.
+    Synchronous providers are run in the threadpool, and concurrent calls for
+    the same token share a single call to the wrapped provider.
+    """
+
+    def __init__(
+        self,
+        provider: AnyAuthProvider,
+        *,
+        ttl: float = 60.0,
+        negative_ttl: float = 5.0,
+        maxsize: int = 4096,
+    ) -> None:
+        self.provider = provider
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self._flight = SingleFlight()
+        self._store: OrderedDict[Tuple[str, Optional[AuthToken]], Tuple[Any, bool, float]]
+        self._store = OrderedDict()
+
+    async def get_roles(self, token: Optional[AuthToken]) -> Set[str]:
+        return await self._resolve("get_roles", token)
+
+    async def get_user(self, token: Optional[AuthToken]) -> Optional[Mapping[str, Any]]:
+        return await self._resolve("get_user", token)
+
+    def invalidate(self, token: Optional[AuthToken] = None) -> None:
+        """Remove the stored results for a token, or for all tokens if omitted."""
+        if token is None:
+            self._store.clear()
+        else:
+            self._store.pop(("get_roles", token), None)
+            self._store.pop(("get_user", token), None)
+
+    async def _resolve(self, method: str, token: Optional[AuthToken]) -> Any:
+        key = (method, token)
+        item = self._store.get(key)
+        if item is not None:
+            value, failed, expires = item
+            if expires > time.monotonic():
+                self._store.move_to_end(key)
+                if failed:
+                    raise value
+                return value
+            del self._store[key]
+
+        flight_key = f"{method}:{token.kind.name}:{token.value}" if token else method
+        return await self._flight.do(flight_key, lambda: self._call(method, token))
+
+    async def _call(self, method: str, token: Optional[AuthToken]) -> Any:
+        func = getattr(self.provider, method)
+        try:
+            if isinstance(self.provider, AsyncAuthProvider):
+                value = await func(token)
+            else:
+                value = await run_in_threadpool(func, token)
+        except Exception as exc:
+            self._save((method, token), exc, failed=True)
+            raise
+
+        self._save((method, token), value, failed=False)
+        return value
+
+    def _save(self, key: Tuple[str, Optional[AuthToken]], value: Any, *, failed: bool) -> None:
+        ttl = self.negative_ttl if failed or not value else self.ttl
+        self._store[key] = (value, failed, time.monotonic() + ttl)
+        self._store.move_to_end(key)
+        while len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
+
+
+class JWTAuthProvider(AsyncAuthProvider):
+    """Resolves the roles and user from JSON Web Tokens.
+
+    Requires the `pyjwt` package; the `cryptography` package is also needed
+    for asymmetric algorithms. The signing keys are parsed once when the
+    provider is created, and the claims of verified tokens are kept until the
+    token expires, so repeated requests with the same token skip the signature
+    verification. The verification of new tokens runs in the threadpool.
+    Invalid tokens resolve to no roles and no user.
+
+    Arguments:
+        keys :str | bytes | Mapping | Sequence[Mapping]:
+            A shared secret or PEM-encoded public key, a JWK, a list of JWKs,
+            or a JWKS document (a mapping with a "keys" list). Keys in a JWKS
+            are selected using the "kid" header of the token.
+
+    Keyword Arguments:
+        algorithms :Sequence[str]:
+            The algorithms accepted for the signature of the tokens.
+        audience :str | None:
+            The expected value of the "aud" claim.
+        issuer :str | None:
+            The expected value of the "iss" claim.
+        leeway :float:
+            Seconds of tolerance when checking the expiration of tokens.
+        roles_claim :str:
+            The claim containing the list of roles of the user.
+        max_age :float:
+            Seconds a verified token without "exp" claim is kept in cache.
+        maxsize :int:
+            Maximum amount of verified tokens kept in cache.
+
+    """
+
+    def __init__(
+        self,
+        keys: Union[str, bytes, Mapping[str, Any], Sequence[Mapping[str, Any]]],
+        *,
+        algorithms: Sequence[str] = ("HS256",),
+        audience: Optional[str] = None,
+        issuer: Optional[str] = None,
+        leeway: float = 0,
+        roles_claim: str = "roles",
+        max_age: float = 300.0,
+        maxsize: int = 4096,
+    ) -> None:
+        try:
+            import jwt
+        except ImportError as exc:
+            msg = "JWTAuthProvider requires the 'pyjwt' package to be installed."
+            raise LogicLayerException(msg) from exc
+
+        self._jwt = jwt
+        self.algorithms = list(algorithms)
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self.roles_claim = roles_claim
+        self.max_age = max_age
+        self.maxsize = maxsize
+        self._keys = self._parse_keys(keys)
+        self._lock = threading.Lock()
+        self._tokens: OrderedDict[str, Tuple[Optional[Mapping[str, Any]], float]]
+        self._tokens = OrderedDict()
+
+    def _parse_keys(self, keys: Any) -> dict[Optional[str], Any]:
+        jwt = self._jwt
+        if isinstance(keys, (str, bytes)):
+            algorithm = jwt.get_algorithm_by_name(self.algorithms[0])
+            return {None: algorithm.prepare_key(keys)}
+
+        if isinstance(keys, Mapping):
+            keys = keys["keys"] if "keys" in keys else [keys]
+
+        parsed: dict[Optional[str], Any] = {}
+        for item in keys:
+            jwk = jwt.PyJWK(dict(item))
+            parsed[jwk.key_id] = jwk.key
+        if len(parsed) == 1:
+            parsed[None] = next(iter(parsed.values()))
+        return parsed
+
+    def _cached(self, token: str) -> Tuple[bool, Optional[Mapping[str, Any]]]:
+        """Look up the claims of a token verified before."""
+        with self._lock:
+            item = self._tokens.get(token)
+            if item is None:
+                return False, None
+            claims, expires = item
+            if expires > time.time():
+                self._tokens.move_to_end(token)
+                return True, claims
+            del self._tokens[token]
+            return False, None
+
+    def verify(self, token: str) -> Optional[Mapping[str, Any]]:
+        """Return the claims of a token, or `None` if the token is not valid."""
+        found, claims = self._cached(token)
+        if found:
+            return claims
+
+        now = time.time()
+        jwt = self._jwt
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+            key = self._keys.get(kid) or self._keys[None]
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.leeway,
+            )
+        except (jwt.InvalidTokenError, KeyError) as exc:
+            logger.debug("Invalid token: %s", exc)
+            claims, expires = None, now + min(self.max_age, 5.0)
+        else:
+            # the token is accepted until its expiration plus the leeway
+            exp = claims.get("exp")
+            expires = float(exp) + self.leeway if exp is not None else now + self.max_age
+
+        with self._lock:
+            self._tokens[token] = (claims, expires)
+            while len(self._tokens) > self.maxsize:
+                self._tokens.popitem(last=False)
+        return claims
+
+    async def _claims(self, token: Optional[AuthToken]) -> Optional[Mapping[str, Any]]:
+        if token is None or token.kind is not AuthTokenType.JWTOKEN:
+            return None
+        found, claims = self._cached(token.value)
+        if found:
+            return claims
+        # verifying a signature takes a while, specially with asymmetric keys
+        return await run_in_threadpool(self.verify, token.value)
+
+    async def get_roles(self, token: Optional[AuthToken]) -> Set[str]:
+        claims = await self._claims(token)
+        roles = claims.get(self.roles_claim) if claims else None
+        if isinstance(roles, str):
+            return set(roles.split())
+        return set(roles or ())
+
+    async def get_user(self, token: Optional[AuthToken]) -> Optional[Mapping[str, Any]]:
+        return await self._claims(token)
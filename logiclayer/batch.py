@@ -0,0 +1,274 @@
+"""Batch requests module.
+
+Contains the definitions of the batch route, which receives a list of requests
+to other routes of the app and handles them concurrently in the same process,
+without the network and proxy overhead of separate HTTP requests. The result
+of each request is streamed as soon as it completes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import dataclasses as dcls
+import json
+import logging
+from collections.abc import AsyncIterator
+from typing import Any, Optional, Union
+from urllib.parse import urlencode
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+from starlette.types import ASGIApp, Message, Scope
+
+logger = logging.getLogger("logiclayer.batch")
+
+BATCH_MEDIA_TYPE = "application/x-ndjson"
+
+# keys of the scope of the batch request shared with the requests of the batch
+_SCOPE_KEYS = ("type", "asgi", "http_version", "scheme", "server", "client", "root_path")
+
+
+@dcls.dataclass(frozen=True)
+class BatchConfig:
+    """Defines the batch route of the app.
+
+    Attributes:
+        path :str:
+            The path of the batch route.
+        max_requests :int:
+            Maximum amount of requests in a single batch.
+        max_concurrent :int:
+            Maximum amount of requests of a batch handled at the same time.
+        timeout :float | None:
+            Default amount of seconds a request of the batch can take.
+        forward_headers :frozenset[str]:
+            Headers of the batch request passed to each request of the batch,
+            unless the request sets its own. Includes the credentials by
+            default, so each request is authorized as the batch caller.
+
+    """
+
+    path: str = "/_batch"
+    max_requests: int = 50
+    max_concurrent: int = 10
+    timeout: Optional[float] = 30.0
+    forward_headers: frozenset[str] = frozenset(
+        ("accept", "accept-language", "authorization", "cookie", "x-forwarded-for")
+    )
+
+    def __post_init__(self) -> None:
+        if self.max_requests < 1 or self.max_concurrent < 1:
+            msg = "max_requests and max_concurrent must be positive"
+            raise ValueError(msg)
+        headers = frozenset(item.lower() for item in self.forward_headers)
+        object.__setattr__(self, "forward_headers", headers)
+
+
+class BatchItem(BaseModel):
+    """A request to a route of the app, as part of a batch."""
+
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str
+    query: Union[dict[str, Any], str, None] = None
+    headers: dict[str, str] = Field(default_factory=dict)
+    body: Any = None
+    timeout: Optional[float] = None
+
+
+class BatchResult(BaseModel):
+    """The response to a request of a batch.
+
+    JSON bodies are included as their value, text bodies as a string, and any
+    other content as a base64 string, with `encoding` set to "base64".
+    """
+
+    index: int
+    id: Optional[str] = None
+    status: int
+    headers: dict[str, str] = Field(default_factory=dict)
+    body: Any = None
+    encoding: Optional[str] = None
+
+
+class BatchRunner:
+    """Handles the requests of a batch through an ASGI app."""
+
+    def __init__(self, app: ASGIApp, config: BatchConfig) -> None:
+        self.app = app
+        self.config = config
+
+    async def __call__(self, request: Request, items: list[BatchItem]) -> StreamingResponse:
+        """Answer a batch request, streaming the results as NDJSON lines in the
+        order they complete."""
+        config = self.config
+        if len(items) > config.max_requests:
+            msg = f"A batch can't contain more than {config.max_requests} requests."
+            raise HTTPException(413, msg)
+
+        forwarded = [
+            (key, value)
+            for key, value in request.scope["headers"]
+            if key.decode("latin-1") in config.forward_headers
+        ]
+        return StreamingResponse(
+            self.stream(request.scope, items, forwarded),
+            media_type=BATCH_MEDIA_TYPE,
+        )
+
+    async def stream(
+        self,
+        parent: Scope,
+        items: list[BatchItem],
+        forwarded: list[tuple[bytes, bytes]],
+    ) -> AsyncIterator[bytes]:
+        semaphore = asyncio.Semaphore(self.config.max_concurrent)
+
+        async def run(index: int, item: BatchItem) -> BatchResult:
+            async with semaphore:
+                return await self.dispatch(parent, index, item, forwarded)
+
+        tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(items)]
+        try:
+            for future in asyncio.as_completed(tasks):
+                result = await future
+                yield result.model_dump_json(exclude_none=True).encode() + b"\n"
+        finally:
+            # the client disconnected before all the results were sent
+            for task in tasks:
+                task.cancel()
+
+    async def dispatch(
+        self,
+        parent: Scope,
+        index: int,
+        item: BatchItem,
+        forwarded: list[tuple[bytes, bytes]],
+    ) -> BatchResult:
+        """Handle a single request of the batch."""
+        path, _, query_string = item.path.partition("?")
+        if path.rstrip("/") == self.config.path.rstrip("/"):
+            return BatchResult(
+                index=index,
+                id=item.id,
+                status=400,
+                body={"detail": "Batch requests can't be nested."},
+            )
+
+        if isinstance(item.query, dict):
+            query_string = urlencode(item.query, doseq=True)
+        elif isinstance(item.query, str):
+            query_string = item.query.lstrip("?")
+
+        body = b""
+        own_headers = {key.lower(): value for key, value in item.headers.items()}
+        if item.body is not None:
+            if isinstance(item.body, str):
+                body = item.body.encode()
+                own_headers.setdefault("content-type", "text/plain; charset=utf-8")
+            else:
+                body = json.dumps(item.body).encode()
+                own_headers.setdefault("content-type", "application/json")
+            own_headers["content-length"] = str(len(body))
+        headers = [
+            (key, value) for key, value in forwarded if key.decode("latin-1") not in own_headers
+        ]
+        for key, value in own_headers.items():
+            try:
+                headers.append((key.encode("latin-1"), value.encode("latin-1")))
+            except UnicodeEncodeError:
+                return BatchResult(
+                    index=index,
+                    id=item.id,
+                    status=400,
+                    body={"detail": f"Header {key!r} can't be encoded as latin-1."},
+                )
+
+        scope = {
+            **{key: parent[key] for key in _SCOPE_KEYS if key in parent},
+            "method": item.method.upper(),
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query_string.encode(),
+            "headers": headers,
+            "state": dict(parent.get("state", {})),
+        }
+
+        sent = False
+
+        async def receive() -> Message:
+            nonlocal sent
+            if sent:
+                # blocks until the request is cancelled, like a connected client
+                await asyncio.Event().wait()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        status = 500
+        response_headers: list[tuple[bytes, bytes]] = []
+        chunks: list[bytes] = []
+
+        async def send(message: Message) -> None:
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        timeout = item.timeout if item.timeout is not None else self.config.timeout
+        try:
+            await asyncio.wait_for(self.app(scope, receive, send), timeout)
+        except asyncio.TimeoutError:
+            return BatchResult(
+                index=index,
+                id=item.id,
+                status=504,
+                body={"detail": f"The request didn't complete in {timeout} seconds."},
+            )
+        except Exception:
+            logger.exception("Batch request to %s %s failed", item.method, item.path)
+            return BatchResult(
+                index=index,
+                id=item.id,
+                status=500,
+                body={"detail": "Internal Server Error"},
+            )
+
+        result = BatchResult(
+            index=index,
+            id=item.id,
+            status=status,
+            headers={
+                key.decode("latin-1"): value.decode("latin-1")
+                for key, value in response_headers
+                if key not in (b"content-length", b"content-type")
+            },
+        )
+        _set_body(result, b"".join(chunks), dict(response_headers).get(b"content-type", b""))
+        return result
+
+
+def _set_body(result: BatchResult, content: bytes, content_type: bytes) -> None:
+    media_type = content_type.split(b";")[0].strip().decode("latin-1")
+    if media_type:
+        result.headers["content-type"] = content_type.decode("latin-1")
+    if not content:
+        return
+    if media_type == "application/json" or media_type.endswith("+json"):
+        try:
+            result.body = json.loads(content)
+            return
+        except ValueError:
+            pass
+    if media_type.startswith("text/") or media_type.endswith(("json", "xml")):
+        try:
+            result.body = content.decode()
+            return
+        except UnicodeDecodeError:
+            pass
+    result.body = base64.b64encode(content).decode("ascii")
+    result.encoding = "base64"
@@ -0,0 +1,236 @@
+"""Response cache module.
+
+Contains the definitions for the cache policies and backends used to store the
+results of the routes of a LogicLayer module.
+"""
+
+from __future__ import annotations
+
+import abc
+import dataclasses as dcls
+import hashlib
+import sys
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Iterable
+from typing import Any, Callable, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .common import Handler
+
+MISSING: Any = object()
+
+
+@dcls.dataclass(frozen=True)
+class CachePolicy:
+    """Defines how the results of a route are stored in the response cache.
+
+    Attributes:
+        ttl :float | None:
+            Seconds a stored result is considered valid. `None` means entries
+            are only evicted by the size bounds.
+        max_entries :int | None:
+            Maximum amount of results stored for the route.
+        max_bytes :int | None:
+            Maximum amount of bytes, approximated, used by the stored results.
+        vary_roles :bool:
+            Include the roles of the request in the cache key, so users with
+            different permissions don't share results.
+
+    """
+
+    ttl: Optional[float] = None
+    max_entries: Optional[int] = 1024
+    max_bytes: Optional[int] = None
+    vary_roles: bool = True
+
+
+@dcls.dataclass
+class CacheStats:
+    """Counters for the operations done on a cache backend."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class CacheBackend(abc.ABC):
+    """Base class for the storages used by the response cache.
+
+    Backends must keep their `stats` updated for each operation.
+    """
+
+    stats: CacheStats
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Any:
+        """Retrieve the value stored for `key`, or :data:`MISSING`."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store `value` under `key`, optionally for `ttl` seconds."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove the value stored under `key`, if present."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def clear(self) -> None:
+        """Remove all the values in the storage."""
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """In-process cache backend with LRU and byte-size eviction."""
+
+    def __init__(
+        self,
+        *,
+        max_entries: Optional[int] = 1024,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] | None = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or estimate_size
+        self.stats = CacheStats()
+        self._store: OrderedDict[str, tuple[Any, float, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    async def get(self, key: str) -> Any:
+        try:
+            value, expires, _ = self._store[key]
+        except KeyError:
+            self.stats.misses += 1
+            return MISSING
+
+        if expires < time.monotonic():
+            self._pop(key)
+            self.stats.misses += 1
+            return MISSING
+
+        self._store.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        nbytes = self.sizeof(value)
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return
+
+        self._pop(key)
+        expires = time.monotonic() + ttl if ttl is not None else float("inf")
+        self._store[key] = (value, expires, nbytes)
+        self.stats.entries += 1
+        self.stats.bytes += nbytes
+
+        while (self.max_entries is not None and self.stats.entries > self.max_entries) or (
+            self.max_bytes is not None and self.stats.bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._store))
+            self._pop(oldest)
+            self.stats.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._pop(key)
+
+    async def clear(self) -> None:
+        self._store.clear()
+        self.stats.entries = 0
+        self.stats.bytes = 0
+
+    def _pop(self, key: str) -> None:
+        item = self._store.pop(key, None)
+        if item is not None:
+            self.stats.entries -= 1
+            self.stats.bytes -= item[2]
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate the amount of memory in bytes used by a route result."""
+    if isinstance(value, Response):
+        return len(getattr(value, "body", b""))
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8", "surrogatepass"))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+async def request_key(
+    request: Request,
+    namespace: str = "",
+    roles: Optional[Iterable[str]] = None,
+) -> str:
+    """Calculate a key which identifies equivalent requests to the same route.
+
+    The key is built from the path params, the sorted query params, the body
+    of the request if any, and the roles of the user when provided.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{namespace}\n{request.method}\n".encode())
+    for key, value in sorted(request.path_params.items()):
+        digest.update(f"p:{key}={value}\n".encode())
+    for key, value in sorted(request.query_params.multi_items()):
+        digest.update(f"q:{key}={value}\n".encode())
+    if roles is not None:
+        digest.update(f"r:{','.join(sorted(roles))}\n".encode())
+    body = await request.body()
+    if body:
+        digest.update(b"b:")
+        digest.update(body)
+    return digest.hexdigest()
+
+
+def is_cacheable(value: Any) -> bool:
+    """Check if the result of a route can be stored and served again."""
+    if isinstance(value, Response):
+        # streaming and file responses don't keep their content in memory
+        return hasattr(value, "body") and value.status_code < 400
+    return True
+
+
+def cached_handler(
+    handler: Handler,
+    backend: CacheBackend,
+    policy: CachePolicy,
+    *,
+    namespace: str = "",
+    get_roles: Callable[[Request], Awaitable[Iterable[str]]] | None = None,
+) -> Handler:
+    """Wrap a route handler to store and reuse its results in a cache backend."""
+
+    async def cache_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+        roles = await get_roles(request) if get_roles and policy.vary_roles else None
+        key = await request_key(request, namespace, roles)
+
+        value = await backend.get(key)
+        if value is not MISSING:
+            return value
+
+        value = await handler(request, kwargs)
+        if is_cacheable(value):
+            await backend.set(key, value, policy.ttl)
+        return value
+
+    return cache_handler
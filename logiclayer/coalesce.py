@@ -0,0 +1,86 @@
+"""Request coalescing module.
+
+Contains the tools to share a single execution of a route handler between
+concurrent identical requests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses as dcls
+from collections.abc import Awaitable, Iterable
+from typing import Any, Callable, TypeVar
+
+from starlette.requests import Request
+
+from .cache import request_key
+from .common import Handler
+
+T = TypeVar("T")
+
+
+@dcls.dataclass
+class FlightStats:
+    """Counters for the calls done through a :class:`SingleFlight` instance."""
+
+    executions: int = 0
+    shared: int = 0
+
+
+class SingleFlight:
+    """Ensures only one call for each key is in progress at any time.
+
+    Callers requesting a key which is already being calculated wait for the
+    result of the call in progress instead of starting a new one. The results
+    are not kept after the call is completed.
+    """
+
+    def __init__(self) -> None:
+        self.stats = FlightStats()
+        self._calls: dict[str, asyncio.Future[Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of `func`, sharing it with concurrent calls for `key`."""
+        future = self._calls.get(key)
+
+        if future is None:
+            self.stats.executions += 1
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(lambda fut: self._forget(key, fut))
+        else:
+            self.stats.shared += 1
+
+        # a cancelled caller must not cancel the execution for the others
+        return await asyncio.shield(future)
+
+    def _forget(self, key: str, future: asyncio.Future[Any]) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # mark the exception as retrieved if all callers were cancelled
+            future.exception()
+
+
+def coalesced_handler(
+    handler: Handler,
+    flight: SingleFlight,
+    *,
+    namespace: str = "",
+    get_roles: Callable[[Request], Awaitable[Iterable[str]]] | None = None,
+) -> Handler:
+    """Wrap a route handler so identical concurrent requests share its execution.
+
+    Requests are considered identical using the same rules as the keys of the
+    response cache.
+    """
+
+    async def coalesce_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+        roles = await get_roles(request) if get_roles else None
+        key = await request_key(request, namespace, roles)
+        return await flight.do(key, lambda: handler(request, kwargs))
+
+    return coalesce_handler
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import asyncio
 import inspect
 from collections.abc import Awaitable, Coroutine
 from typing import Any, Callable, TypeVar, Union
 
+from fastapi.dependencies.utils import get_typed_return_annotation, get_typed_signature
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
 from typing_extensions import ParamSpec
 
 T = TypeVar("T")
@@ -15,6 +20,10 @@ CallableMayReturnAwaitable = Callable[P, Union[R_co, Awaitable[R_co]]]
 CallableMayReturnCoroutine = Callable[P, Union[R_co, Coroutine[Any, Any, R_co]]]
 
 LOGICLAYER_METHOD_ATTR = "_llmethod"
+REQUEST_PARAM = "_ll_request"
+RESPONSE_PARAM = "_ll_response"
+
+Handler = Callable[[Request, dict[str, Any]], Awaitable[Any]]
 
 
 class LogicLayerException(Exception):
@@ -39,3 +48,66 @@ async def _await_for_it(
     if inspect.isawaitable(result):
         return await result
     return result
+
+
+def _endpoint_from_handler(
+    func: Callable[..., Any],
+    handler: Handler,
+) -> Callable[..., Coroutine[Any, Any, Any]]:
+    """Build a FastAPI endpoint with the signature of `func` around a handler.
+
+    The resulting endpoint declares the same parameters (and return annotation)
+    as `func`, so FastAPI resolves them as usual, plus extra keyword-only
+    parameters to receive the current :class:`Request`, and the temporary
+    :class:`Response` whose headers FastAPI adds to the response built from the
+    result; the latter is kept in the scope of the request, under
+    `RESPONSE_PARAM`. The handler receives the request and the resolved
+    arguments, and is responsible for calling `func`.
+    """
+    signature = get_typed_signature(func)
+    params = list(signature.parameters.values())
+    extra_params = [
+        inspect.Parameter(REQUEST_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+        inspect.Parameter(RESPONSE_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+    ]
+    if params and params[-1].kind is inspect.Parameter.VAR_KEYWORD:
+        params[-1:-1] = extra_params
+    else:
+        params.extend(extra_params)
+
+    async def endpoint(**kwargs: Any) -> Any:
+        request = kwargs.pop(REQUEST_PARAM)
+        request.scope[RESPONSE_PARAM] = kwargs.pop(RESPONSE_PARAM)
+        return await handler(request, kwargs)
+
+    endpoint.__name__ = func.__name__
+    endpoint.__qualname__ = getattr(func, "__qualname__", func.__name__)
+    endpoint.__doc__ = func.__doc__
+    endpoint.__signature__ = inspect.Signature(  # type: ignore[attr-defined]
+        params,
+        return_annotation=get_typed_return_annotation(func) or inspect.Signature.empty,
+    )
+    return endpoint
+
+
+def _call_handler(
+    func: Callable[..., Any],
+    run_sync: Callable[..., Awaitable[Any]] = run_in_threadpool,
+) -> Handler:
+    """Wrap a route function, sync or async, into a LogicLayer handler.
+
+    Synchronous functions are run using `run_sync`, by default in the shared
+    threadpool the same way FastAPI does for sync endpoints, to avoid blocking
+    the event loop.
+    """
+    if asyncio.iscoroutinefunction(func):
+
+        async def async_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+            return await func(**kwargs)
+
+        return async_handler
+
+    async def sync_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+        return await run_sync(func, **kwargs)
+
+    return sync_handler
@@ -0,0 +1,201 @@
+"""Deadlines module.
+
+Contains the definitions to limit the time a route can take, and to stop the
+work of a route whose client disconnected. Async routes are cancelled; sync
+routes can't be interrupted, so they get a :class:`Deadline` they can check in
+their loops, and whose remaining time they can pass on to their own calls.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses as dcls
+import logging
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from starlette.requests import ClientDisconnect, Request
+from starlette.responses import Response
+
+from .common import Handler, LogicLayerException
+
+logger = logging.getLogger("logiclayer.deadline")
+
+#: Status of the responses to requests whose client disconnected, as nginx does.
+CLIENT_CLOSED_REQUEST = 499
+
+
+class DeadlineExceeded(LogicLayerException):
+    """A route didn't complete before its deadline."""
+
+    def __init__(self, name: str, timeout: Optional[float] = None) -> None:
+        if timeout is None:
+            super().__init__(f"'{name}' was cancelled.")
+        else:
+            super().__init__(f"'{name}' didn't complete in {timeout} seconds.")
+        self.name = name
+        self.timeout = timeout
+
+
+class Deadline:
+    """The time limit of a request, and whether its work was cancelled.
+
+    Available to the routes with :func:`current_deadline`, including sync
+    routes running in a thread.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, *, name: str = "") -> None:
+        self.name = name
+        self.timeout = timeout if timeout is not None and math.isfinite(timeout) else None
+        self.expires = time.monotonic() + self.timeout if self.timeout is not None else math.inf
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+
+    def remaining(self) -> Optional[float]:
+        """Return the seconds left until the deadline, or `None` if unlimited."""
+        if self.timeout is None:
+            return None
+        return max(self.expires - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    @property
+    def cancelled(self) -> bool:
+        """Check if the result of the work is not needed anymore."""
+        return self._event.is_set() or self.expired
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Flag the work as not needed anymore."""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def check(self) -> None:
+        """Raise :class:`DeadlineExceeded` if the work was cancelled or expired."""
+        if self.cancelled:
+            raise DeadlineExceeded(self.name, None if self.reason == "disconnect" else self.timeout)
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep for some seconds, waking up if the work is cancelled.
+
+        Returns `True` if the work was cancelled or expired.
+        """
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        return self._event.wait(seconds) or self.expired
+
+
+_UNLIMITED = Deadline()
+_current_deadline: ContextVar[Deadline] = ContextVar("logiclayer_deadline", default=_UNLIMITED)
+
+
+def current_deadline() -> Deadline:
+    """Return the deadline of the request being handled.
+
+    Outside of a route with a deadline, the returned deadline never expires.
+    """
+    return _current_deadline.get()
+
+
+@dcls.dataclass
+class DeadlineStats:
+    """Counters describing the requests handled by a route with a deadline."""
+
+    timeout: Optional[float]
+    completed: int = 0
+    timeouts: int = 0
+    disconnects: int = 0
+
+
+def deadline_handler(
+    handler: Handler,
+    timeout: Optional[float],
+    *,
+    name: str,
+    stats: DeadlineStats,
+    watch_disconnect: bool = True,
+) -> Handler:
+    """Wrap a route handler to cancel it after `timeout` seconds, or when the
+    client disconnects.
+
+    Requests over their deadline raise :class:`DeadlineExceeded`, and requests
+    whose client disconnected are answered with a `499` status nobody reads.
+    Sync functions keep running in their thread until they check their
+    deadline; their result is discarded.
+    """
+
+    async def deadline_wrapper(request: Request, kwargs: dict[str, Any]) -> Any:
+        deadline = Deadline(timeout, name=name)
+        if watch_disconnect:
+            await _read_body(request)
+        token = _current_deadline.set(deadline)
+        try:
+            # the task copies the context, so the handler sees its deadline
+            work = asyncio.ensure_future(handler(request, kwargs))
+        finally:
+            _current_deadline.reset(token)
+        waiters: set[asyncio.Future[Any]] = {work}
+        if watch_disconnect:
+            waiters.add(asyncio.ensure_future(_wait_disconnect(request)))
+
+        try:
+            done, _ = await asyncio.wait(
+                waiters,
+                timeout=deadline.remaining(),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        except asyncio.CancelledError:
+            deadline.cancel()
+            work.cancel()
+            raise
+        finally:
+            for waiter in waiters - {work}:
+                waiter.cancel()
+
+        if work in done:
+            stats.completed += 1
+            return work.result()
+
+        reason = "timeout" if not done else "disconnect"
+        deadline.cancel(reason)
+        work.cancel()
+        # sync functions can't be interrupted, their result is dropped when ready
+        work.add_done_callback(_discard_result)
+        if reason == "timeout":
+            stats.timeouts += 1
+            logger.debug("Route %s exceeded its deadline of %s seconds", name, timeout)
+            raise DeadlineExceeded(name, deadline.timeout)
+        stats.disconnects += 1
+        logger.debug("Route %s cancelled, the client disconnected", name)
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+    return deadline_wrapper
+
+
+async def _read_body(request: Request) -> None:
+    """Read the body of the request, so it's kept available to the handler
+    while the next messages are watched."""
+    try:
+        await request.body()
+    except (ClientDisconnect, RuntimeError):
+        # the stream was consumed, or the client is gone and the watcher knows
+        pass
+
+
+async def _wait_disconnect(request: Request) -> None:
+    """Wait until the client of the request disconnects."""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+def _discard_result(future: asyncio.Future[Any]) -> None:
+    if not future.cancelled():
+        future.exception()
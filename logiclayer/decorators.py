@@ -1,12 +1,16 @@
 from __future__ import annotations
 
-from collections.abc import Sequence
-from typing import Callable, Optional, TypeVar
+from collections.abc import Hashable, Sequence
+from typing import Callable, Literal, Optional, TypeVar
 
 from fastapi.params import Depends
 from fastapi.responses import Response
 
+from .admission import AdmissionPolicy
+from .cache import CachePolicy
 from .common import LOGICLAYER_METHOD_ATTR
+from .etag import ETagMode
+from .memo import MemoTags
 from .module import MethodType, ModuleMethod
 
 C = TypeVar("C", bound=Callable)
@@ -28,29 +32,120 @@ def exception_handler(exc: type[Exception], *, debug: bool = False) -> Callable[
     return exception_handler_decorator
 
 
-def healthcheck(func: C) -> C:
-    """Decorate a function to flag it as a healthcheck for the module."""
-    method = ModuleMethod(MethodType.HEALTHCHECK, func=func)
-    setattr(func, LOGICLAYER_METHOD_ATTR, method)
-    return func
+def healthcheck(
+    func: C | None = None,
+    *,
+    interval: Optional[float] = None,
+    timeout: Optional[float] = None,
+) -> Callable[[C], C]:
+    """Decorate a function to flag it as a healthcheck for the module.
+
+    The `interval` and `timeout` parameters, in seconds, override the defaults
+    of the LogicLayer instance for this check.
+    """
+
+    def healthcheck_decorator(fn: C) -> C:
+        method = ModuleMethod(
+            MethodType.HEALTHCHECK,
+            func=fn,
+            kwargs={"interval": interval, "timeout": timeout},
+        )
+        setattr(fn, LOGICLAYER_METHOD_ATTR, method)
+        return fn
+
+    return healthcheck_decorator if func is None else healthcheck_decorator(func)
+
+
+def memoize(
+    func: C | None = None,
+    *,
+    max_entries: Optional[int] = 128,
+    ttl: Optional[float] = None,
+    tags: MemoTags = (),
+    key: Optional[Callable[..., Hashable]] = None,
+) -> Callable[[C], C]:
+    """Decorate a method of the module to keep its results for the same arguments.
+
+    Works with sync and async methods. Concurrent calls with the same arguments
+    share a single execution. The results can be discarded with
+    `module.invalidate(tag)`; `tags` can be a callable which receives the
+    arguments of the call and returns the tags of its result.
+
+    Keyword Arguments:
+        max_entries :int | None:
+            Maximum amount of results kept for each module instance.
+        ttl :float | None:
+            Seconds a result is valid.
+        tags :Iterable[str] | Callable[..., Iterable[str]]:
+            Tags to invalidate the results.
+        key :Callable[..., Hashable] | None:
+            Builds the key of a call from its arguments, for methods which
+            receive unhashable arguments.
+
+    """
+
+    def memoize_decorator(fn: C) -> C:
+        method = ModuleMethod(
+            MethodType.MEMOIZED,
+            func=fn,
+            kwargs={"max_entries": max_entries, "ttl": ttl, "tags": tags, "key": key},
+        )
+        setattr(fn, LOGICLAYER_METHOD_ATTR, method)
+        return fn
+
+    return memoize_decorator if func is None else memoize_decorator(func)
+
+
+def on_startup(
+    func: C | None = None,
+    *,
+    debug: bool = False,
+    timeout: Optional[float] = None,
+) -> Callable[[C], C]:
+    """Decorate a function to flag it as a startup handler.
 
+    Keyword Arguments:
+        timeout :float | None:
+            Seconds the handler can take before being considered failed.
+            Defaults to the `startup_timeout` of the app.
 
-def on_startup(func: C | None, *, debug: bool = False) -> Callable[[C], C]:
-    """Decorate a function to flag it as a startup handler."""
+    """
 
     def startup_decorator(fn: C) -> C:
-        method = ModuleMethod(MethodType.EVENT_STARTUP, debug_only=debug, func=fn)
+        method = ModuleMethod(
+            MethodType.EVENT_STARTUP,
+            debug_only=debug,
+            func=fn,
+            kwargs={"timeout": timeout},
+        )
         setattr(fn, LOGICLAYER_METHOD_ATTR, method)
         return fn
 
     return startup_decorator if func is None else startup_decorator(func)
 
 
-def on_shutdown(func: C | None, *, debug: bool = False) -> Callable[[C], C]:
-    """Decorate a function to flag it as a shutdown handler."""
+def on_shutdown(
+    func: C | None = None,
+    *,
+    debug: bool = False,
+    timeout: Optional[float] = None,
+) -> Callable[[C], C]:
+    """Decorate a function to flag it as a shutdown handler.
+
+    Keyword Arguments:
+        timeout :float | None:
+            Seconds the handler can take before being considered failed.
+            Defaults to the `shutdown_timeout` of the app.
+
+    """
 
     def shutdown_decorator(fn: C) -> C:
-        method = ModuleMethod(MethodType.EVENT_SHUTDOWN, debug_only=debug, func=fn)
+        method = ModuleMethod(
+            MethodType.EVENT_SHUTDOWN,
+            debug_only=debug,
+            func=fn,
+            kwargs={"timeout": timeout},
+        )
         setattr(fn, LOGICLAYER_METHOD_ATTR, method)
         return fn
 
@@ -61,18 +156,78 @@ def route(
     methods: str | set[str] | Sequence[str],
     path: str,
     *,
+    admission: Optional[AdmissionPolicy] = None,
+    cache: Optional[CachePolicy] = None,
+    coalesce: bool = False,
+    deadline: Optional[float] = None,
     debug: bool = False,
     dependencies: Optional[Sequence[Depends]] = None,
+    executor: Literal["thread", "process"] = "thread",
     deprecated: Optional[bool] = None,
     description: Optional[str] = None,
+    etag: Optional[ETagMode] = None,
     include_in_schema: bool = True,
+    mode: Literal["request", "job"] = "request",
     name: Optional[str] = None,
+    raw: bool = False,
     response_class: Optional[type[Response]] = None,
     status_code: Optional[int] = None,
     summary: Optional[str] = None,
     **kwargs,
 ) -> Callable[[C], C]:
-    """Decorate a function to flag it as a route of the module."""
+    """Decorate a function to flag it as a route of the module.
+
+    Besides the parameters accepted by FastAPI's `add_api_route`, a
+    :class:`CachePolicy` can be passed as `cache` to store the results of the
+    route in the module's response cache, and `coalesce=True` makes concurrent
+    identical requests share a single execution of the route.
+
+    Setting `executor="process"` runs the route in the process pool of the
+    LogicLayer instance; the module instance and the parameters of the route
+    must be picklable.
+
+    An :class:`AdmissionPolicy` passed as `admission` limits the amount of
+    requests the route handles at the same time, besides the limit of the
+    module if set.
+
+    Setting `deadline` limits the seconds the route can take, overriding the
+    deadline of the module if set; requests over it get a `504` status. Async
+    routes are cancelled when over their deadline or when the client
+    disconnects; sync routes can check :func:`current_deadline` to stop early.
+
+    Setting `etag` tags the responses of the route with an `ETag` header, and
+    answers the requests with a matching `If-None-Match` header with a `304`
+    status. With "version", the tag is derived from the `data_version` of the
+    module and the request parameters, and matching requests don't run the
+    route; with "hash", the tag is the hash of the serialized response.
+
+    Setting `raw=True` serves the route as a plain Starlette endpoint, skipping
+    the dependency injection and validation of FastAPI. The parameters
+    annotated as `Request` receive the request, and the rest are read from the
+    path and the query string with a parser built when the route is registered;
+    only simple types are supported. Raw routes are not part of the OpenAPI
+    schema, and can't be cached, coalesced, tagged, or run as jobs or in the
+    process pool.
+
+    Setting `mode="job"` makes the route answer right away with the status of a
+    background job running it; the status, result and cancellation of the job
+    are available in the job endpoints of the module.
+    """
+    if executor not in ("thread", "process"):
+        msg = f"Invalid executor for route '{path}': {executor!r}"
+        raise ValueError(msg)
+    if mode not in ("request", "job"):
+        msg = f"Invalid mode for route '{path}': {mode!r}"
+        raise ValueError(msg)
+    if etag not in (None, "version", "hash") or (etag is not None and mode == "job"):
+        msg = f"Invalid ETag mode for route '{path}': {etag!r}"
+        raise ValueError(msg)
+    if raw and (
+        cache or coalesce or etag or dependencies or executor != "thread" or mode != "request"
+    ):
+        msg = f"Raw route '{path}' only supports the admission and executor options."
+        raise ValueError(msg)
+
     kwargs.update(
         methods={methods} if isinstance(methods, str) else set(methods),
         dependencies=dependencies,
@@ -88,7 +243,21 @@ def route(
         kwargs["response_class"] = response_class
 
     def route_decorator(fn: C) -> C:
-        method = ModuleMethod(MethodType.ROUTE, debug_only=debug, func=fn, kwargs=kwargs, path=path)
+        method = ModuleMethod(
+            MethodType.ROUTE,
+            debug_only=debug,
+            func=fn,
+            kwargs=kwargs,
+            path=path,
+            admission=admission,
+            cache=cache,
+            coalesce=coalesce,
+            deadline=deadline,
+            etag=etag,
+            executor=executor,
+            mode=mode,
+            raw=raw,
+        )
         setattr(fn, LOGICLAYER_METHOD_ATTR, method)
         return fn
 
@@ -0,0 +1,116 @@
+"""Conditional responses module.
+
+Contains the definitions to tag the responses of a route with an `ETag`, and
+answer the requests whose `If-None-Match` header matches it with a `304 Not
+Modified` response, saving the bandwidth of sending the body again and, when
+the tag comes from the data version of the module, the execution of the route.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Awaitable, Iterable
+from typing import Any, Callable, Literal, Optional
+
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+from .cache import request_key
+from .common import RESPONSE_PARAM, Handler
+
+ETagMode = Literal["version", "hash"]
+
+
+def etag_matches(header: str, etags: Iterable[Optional[str]]) -> bool:
+    """Check if an `If-None-Match` header matches any of the tags.
+
+    Uses the weak comparison, as required for this header.
+    """
+    if header.strip() == "*":
+        return True
+    candidates = {item.strip().removeprefix("W/") for item in header.split(",")}
+    return any(etag in candidates for etag in etags if etag is not None)
+
+
+def not_modified(etag: str) -> Response:
+    """Build the response for a request whose tag matched the current one."""
+    return Response(status_code=304, headers={"etag": etag})
+
+
+def etag_handler(
+    handler: Handler,
+    mode: ETagMode,
+    *,
+    namespace: str,
+    response_class: type[Response],
+    status_code: Optional[int] = None,
+    encode: Callable[[Any], Any] = jsonable_encoder,
+    get_version: Callable[[], Optional[str]],
+    get_roles: Optional[Callable[[Request], Awaitable[Iterable[str]]]] = None,
+) -> Handler:
+    """Wrap a route handler to tag its responses and answer conditional requests.
+
+    With the "version" mode, the tag is derived from the data version of the
+    module and the key of the request, so matching requests are answered
+    before the handler runs; without a data version, responses are not tagged.
+    Other results are left for FastAPI to render, and the tag is added to its
+    response. With the "hash" mode, the tag is the hash of the serialized body,
+    which saves only the transfer of the body; the results are converted by
+    `encode` and rendered with `response_class` to get it. Streaming responses
+    are only tagged in the "version" mode.
+    """
+    status = status_code or 200
+
+    def to_response(result: Any) -> Response:
+        if isinstance(result, Response):
+            return result
+        return response_class(encode(result), status_code=status)
+
+    async def version_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+        version = get_version()
+        if version is None:
+            return await handler(request, kwargs)
+
+        roles = await get_roles(request) if get_roles is not None else None
+        # the accepted media types can change the representation of the result
+        accept = request.headers.get("accept", "")
+        key = await request_key(request, f"{namespace}\n{version}\n{accept}", roles)
+        etag = f'"{key[:32]}"'
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, (etag,)):
+            return not_modified(etag)
+
+        result = await handler(request, kwargs)
+        sub_response: Optional[Response] = request.scope.get(RESPONSE_PARAM)
+        if not isinstance(result, Response) and sub_response is not None:
+            # FastAPI renders the result with the response model of the route
+            if status == 200:
+                sub_response.headers["etag"] = etag
+            return result
+
+        response = to_response(result)
+        if response.status_code == 200:
+            response.headers.setdefault("etag", etag)
+        return response
+
+    async def hash_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+        response = to_response(await handler(request, kwargs))
+        if response.status_code != 200 or isinstance(response, StreamingResponse):
+            return response
+
+        etag = response.headers.get("etag")
+        if etag is None:
+            digest = hashlib.blake2b(response.body, digest_size=16).hexdigest()
+            etag = response.headers["etag"] = f'"{digest}"'
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, (etag,)):
+            return not_modified(etag)
+        return response
+
+    if mode == "version":
+        return version_handler
+    if mode == "hash":
+        return hash_handler
+    msg = f"Invalid ETag mode: {mode!r}"
+    raise ValueError(msg)
@@ -0,0 +1,317 @@
+"""Executor module.
+
+Contains the definitions for the dedicated executors where the synchronous
+methods of a LogicLayer module can run, isolated from the other modules, and
+the process pool used to run CPU-bound methods.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import dataclasses as dcls
+import functools
+import inspect
+import logging
+import multiprocessing
+import threading
+import weakref
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Optional, TypeVar
+
+from .common import LogicLayerException
+
+logger = logging.getLogger("logiclayer.executor")
+
+T = TypeVar("T")
+
+
+class ExecutorSaturated(LogicLayerException):
+    """The executor of a module can't accept more work at the moment."""
+
+    def __init__(self, name: str) -> None:
+        super().__init__(f"The executor for '{name}' is saturated, try again later.")
+        self.name = name
+
+
+@dcls.dataclass(frozen=True)
+class ExecutorConfig:
+    """Defines the size of a dedicated executor.
+
+    Attributes:
+        max_workers :int:
+            Maximum amount of threads running tasks at the same time.
+        queue_size :int | None:
+            Maximum amount of tasks waiting for a free thread. Tasks submitted
+            beyond this limit are rejected with :class:`ExecutorSaturated`.
+            `None` means the queue is unbounded.
+
+    """
+
+    max_workers: int = 4
+    queue_size: Optional[int] = None
+
+
+@dcls.dataclass
+class ExecutorStats:
+    """Counters describing the load of a dedicated executor."""
+
+    max_workers: int
+    active: int = 0
+    queued: int = 0
+    completed: int = 0
+    rejected: int = 0
+
+    @property
+    def saturation(self) -> float:
+        """Ratio of busy threads over the total available."""
+        return self.active / self.max_workers
+
+
+class ModuleExecutor:
+    """A bounded threadpool dedicated to the synchronous work of a module."""
+
+    def __init__(self, config: ExecutorConfig, *, name: str) -> None:
+        self.config = config
+        self.name = name
+        self.stats = ExecutorStats(max_workers=config.max_workers)
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.config.max_workers,
+                thread_name_prefix=f"logiclayer-{self.name}",
+            )
+        return self._pool
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a synchronous function in the executor and wait for its result."""
+        stats = self.stats
+        queue_size = self.config.queue_size
+        with self._lock:
+            if queue_size is not None and stats.queued >= queue_size:
+                stats.rejected += 1
+                raise ExecutorSaturated(self.name)
+            stats.queued += 1
+
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+        future = self.pool.submit(self._track, call)
+        future.add_done_callback(self._untrack)
+        return await asyncio.wrap_future(future)
+
+    def _track(self, call: Callable[[], T]) -> T:
+        stats = self.stats
+        with self._lock:
+            stats.queued -= 1
+            stats.active += 1
+        try:
+            return call()
+        finally:
+            with self._lock:
+                stats.active -= 1
+                stats.completed += 1
+
+    def _untrack(self, future: Future[Any]) -> None:
+        # tasks cancelled while waiting in the queue never reach _track
+        if future.cancelled():
+            with self._lock:
+                self.stats.queued -= 1
+
+    def wrap(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Return an async version of `func` which runs in this executor.
+
+        Coroutine functions are returned unchanged.
+        """
+        if asyncio.iscoroutinefunction(func):
+            return func
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return await self.run(func, *args, **kwargs)
+
+        return wrapper
+
+    def shutdown(self, *, wait: bool = True) -> None:
+        """Stop the threads of the executor."""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            logger.debug("Shutting down executor for %s", self.name)
+            pool.shutdown(wait=wait)
+
+
+@dcls.dataclass(frozen=True)
+class _SharedBytes:
+    """Reference to a bytes result stored in a shared memory block."""
+
+    name: str
+    size: int
+    kind: type
+
+
+@dcls.dataclass(frozen=True)
+class _SharedArray:
+    """Reference to a numpy array result stored in a shared memory block."""
+
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+# Modules available in the current worker process, set by `_worker_init`.
+_worker_modules: dict[str, Any] = {}
+
+
+def _worker_init(modules: dict[str, Any]) -> None:
+    _worker_modules.update(modules)
+
+
+def _worker_call(key: str, name: str, kwargs: dict[str, Any], threshold: int) -> Any:
+    func = getattr(_worker_modules[key], name)
+    result = func(**kwargs)
+    if inspect.isawaitable(result):
+        result = asyncio.run(result)
+    return _export_result(result, threshold)
+
+
+def _to_shared_memory(data: memoryview) -> SharedMemory:
+    shm = SharedMemory(create=True, size=max(data.nbytes, 1))
+    shm.buf[: data.nbytes] = data.cast("B")
+    # the parent process takes ownership of the block and unlinks it
+    with contextlib.suppress(Exception):
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    shm.close()
+    return shm
+
+
+def _export_result(value: Any, threshold: int) -> Any:
+    """Move large bytes and numpy arrays in a result to shared memory blocks."""
+    if isinstance(value, (bytes, bytearray)):
+        if len(value) < threshold:
+            return value
+        shm = _to_shared_memory(memoryview(value))
+        return _SharedBytes(shm.name, len(value), type(value))
+
+    if type(value).__module__ == "numpy" and type(value).__name__ == "ndarray":
+        if value.nbytes < threshold or value.dtype.hasobject:
+            return value
+        data = value.ravel(order="C")
+        if value.dtype.kind in "mM":
+            # datetimes can't be exported as a buffer; their integers can, and
+            # the dtype is restored when importing
+            data = data.view("i8")
+        shm = _to_shared_memory(memoryview(data))
+        return _SharedArray(shm.name, value.shape, value.dtype.str)
+
+    if isinstance(value, dict):
+        return {k: _export_result(v, threshold) for k, v in value.items()}
+    if isinstance(value, (list, tuple)) and type(value) in (list, tuple):
+        return type(value)(_export_result(item, threshold) for item in value)
+    return value
+
+
+def _import_result(value: Any) -> Any:
+    """Restore the values moved to shared memory blocks by `_export_result`."""
+    if isinstance(value, _SharedBytes):
+        shm = SharedMemory(name=value.name)
+        try:
+            return value.kind(shm.buf[: value.size])
+        finally:
+            shm.close()
+            shm.unlink()
+
+    if isinstance(value, _SharedArray):
+        import numpy as np
+
+        shm = SharedMemory(name=value.name)
+        shm.unlink()
+        # the array uses the shared block directly; the mapping is released
+        # when the array is garbage-collected
+        array = np.ndarray(value.shape, dtype=np.dtype(value.dtype), buffer=shm.buf)
+        weakref.finalize(array, shm.close)
+        return array
+
+    if isinstance(value, dict):
+        return {k: _import_result(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)) and type(value) in (list, tuple):
+        return type(value)(_import_result(item) for item in value)
+    return value
+
+
+class ProcessPool:
+    """A pool of worker processes to run CPU-bound methods of modules.
+
+    The modules are sent to the workers once, when the pool starts, so their
+    instances must be picklable. Large bytes and numpy arrays in the results
+    are transferred through shared memory instead of being pickled.
+
+    Arguments:
+        max_workers :int | None:
+            Amount of worker processes. Defaults to the amount of CPUs.
+        shared_memory_threshold :int:
+            Minimum size in bytes for a value to be transferred through shared
+            memory.
+        mp_context :str | None:
+            The multiprocessing start method used to create the workers.
+
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        *,
+        shared_memory_threshold: int = 1 << 20,
+        mp_context: Optional[str] = None,
+    ) -> None:
+        self.max_workers = max_workers
+        self.shared_memory_threshold = shared_memory_threshold
+        self.mp_context = mp_context
+        self.modules: dict[str, Any] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def running(self) -> bool:
+        return self._pool is not None
+
+    def register(self, module: Any) -> str:
+        """Make a module available to the workers and return its key."""
+        if self.running:
+            msg = "Modules can't be registered in a process pool already started."
+            raise LogicLayerException(msg)
+        key = f"{type(module).__name__}:{id(module):x}"
+        self.modules[key] = module
+        return key
+
+    async def start(self) -> None:
+        """Create the worker processes, if any module was registered."""
+        if self.running or not self.modules:
+            return
+        context = multiprocessing.get_context(self.mp_context)
+        logger.debug("Starting process pool for %d modules", len(self.modules))
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=context,
+            initializer=_worker_init,
+            initargs=(self.modules,),
+        )
+
+    async def stop(self) -> None:
+        """Terminate the worker processes."""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            logger.debug("Shutting down process pool")
+            await asyncio.get_running_loop().run_in_executor(None, pool.shutdown)
+
+    async def run(self, key: str, name: str, kwargs: dict[str, Any]) -> Any:
+        """Call the method `name` of the module registered as `key` in a worker."""
+        if self._pool is None:
+            await self.start()
+        assert self._pool is not None
+        future = self._pool.submit(_worker_call, key, name, kwargs, self.shared_memory_threshold)
+        return _import_result(await asyncio.wrap_future(future))
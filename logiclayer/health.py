@@ -0,0 +1,168 @@
+"""Healthcheck module.
+
+Contains the definitions to run the healthchecks registered in a LogicLayer
+instance, either on demand or periodically in the background.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses as dcls
+import inspect
+import logging
+import time
+from typing import Any, Callable, Optional
+
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from .common import CallableMayReturnCoroutine
+
+logger = logging.getLogger("logiclayer.health")
+
+
+class CheckSkipped(Exception):
+    """Raised by a healthcheck which can't run yet, like the check of a module
+    not loaded. The check is reported as healthy, with the reason as detail."""
+
+
+class CheckStatus(BaseModel):
+    """Describes the result of the last execution of a healthcheck."""
+
+    name: str
+    healthy: Optional[bool] = None
+    degraded: bool = False
+    detail: Optional[str] = None
+    latency: Optional[float] = None
+    last_run: Optional[float] = None
+    last_failure: Optional[str] = None
+    last_failure_at: Optional[float] = None
+
+
+@dcls.dataclass
+class Healthcheck:
+    """A healthcheck function, with its execution parameters.
+
+    A check is considered failed if the function raises an exception or takes
+    longer than `timeout` seconds to complete. Synchronous functions are run in
+    the threadpool; on timeout the thread is left to finish on its own.
+    """
+
+    func: CallableMayReturnCoroutine[[], Any]
+    interval: Optional[float] = None
+    timeout: Optional[float] = None
+    status: CheckStatus = dcls.field(init=False)
+    listeners: list[Callable[[CheckStatus], None]] = dcls.field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        name = getattr(self.func, "__qualname__", None) or repr(self.func)
+        self.status = CheckStatus(name=name)
+
+    @property
+    def name(self) -> str:
+        return self.status.name
+
+    async def run(self) -> CheckStatus:
+        """Execute the check and update its status."""
+        start = time.perf_counter()
+        now = time.time()
+        detail = None
+        try:
+            await asyncio.wait_for(self._call(), self.timeout)
+        except CheckSkipped as exc:
+            failure = None
+            detail = str(exc)
+        except asyncio.TimeoutError:
+            logger.warning("Healthcheck timed out: %s", self.name)
+            failure = f"Timed out after {self.timeout} seconds"
+        except Exception as exc:
+            logger.exception("Healthcheck failure: %s", self.name, exc_info=exc)
+            failure = f"{type(exc).__name__}: {exc}"
+        else:
+            failure = None
+
+        update: dict[str, Any] = {
+            "healthy": failure is None,
+            "detail": detail,
+            "latency": time.perf_counter() - start,
+            "last_run": now,
+        }
+        if failure is not None:
+            update.update(last_failure=failure, last_failure_at=now)
+        self.status = status = self.status.model_copy(update=update)
+        for listener in self.listeners:
+            listener(status)
+        return status
+
+    async def _call(self) -> Any:
+        if asyncio.iscoroutinefunction(self.func):
+            return await self.func()
+        result = await run_in_threadpool(self.func)
+        if inspect.isawaitable(result):
+            return await result
+        return result
+
+
+class HealthcheckScheduler:
+    """Runs a group of healthchecks periodically in the background.
+
+    Each check runs on its own interval, or the default interval of the
+    scheduler; the statuses of the last executions are kept to answer queries
+    without running the checks again.
+    """
+
+    def __init__(self, checks: list[Healthcheck], *, interval: float) -> None:
+        self.checks = checks
+        self.interval = interval
+        self._tasks: list[asyncio.Task[None]] = []
+        self._ready: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def statuses(self) -> list[CheckStatus]:
+        return [check.status for check in self.checks]
+
+    async def start(self) -> None:
+        """Start a background task for each check."""
+        if self.running:
+            return
+        ready = self._ready = asyncio.Event()
+        pending = set(range(len(self.checks)))
+        if not pending:
+            ready.set()
+
+        async def loop(index: int, check: Healthcheck) -> None:
+            interval = check.interval or self.interval
+            while True:
+                await check.run()
+                pending.discard(index)
+                if not pending:
+                    ready.set()
+                await asyncio.sleep(interval)
+
+        self._tasks = [
+            asyncio.create_task(loop(index, check)) for index, check in enumerate(self.checks)
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the background tasks."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def wait_ready(self) -> None:
+        """Wait until all the checks have run at least once."""
+        if self._ready is not None:
+            await self._ready.wait()
+
+
+async def run_healthchecks(checks: list[Healthcheck]) -> list[CheckStatus]:
+    """Run all the checks concurrently and return their statuses."""
+    return list(await asyncio.gather(*(check.run() for check in checks)))
@@ -0,0 +1,559 @@
+"""Jobs module.
+
+Contains the definitions to run routes as background jobs: the request gets a
+job id right away, the route runs in a bounded pool of workers, and its result
+is stored, already serialized, to be fetched later from the job endpoints of
+the module.
+"""
+
+from __future__ import annotations
+
+import abc
+import asyncio
+import dataclasses as dcls
+import inspect
+import logging
+import os
+import secrets
+import time
+from collections.abc import AsyncIterable, AsyncIterator
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Literal, Optional, Union
+
+from fastapi import HTTPException
+from fastapi.dependencies.utils import get_dependant
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.status import HTTP_202_ACCEPTED, HTTP_404_NOT_FOUND, HTTP_409_CONFLICT
+
+from .cache import request_key
+from .common import Handler, LogicLayerException
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from fastapi import APIRouter
+    from fastapi.params import Depends
+
+logger = logging.getLogger("logiclayer.jobs")
+
+JobState = Literal["queued", "running", "done", "failed", "cancelled"]
+
+CHUNK_SIZE = 1 << 16
+
+
+class JobsSaturated(LogicLayerException):
+    """Too many jobs are waiting to run."""
+
+    def __init__(self) -> None:
+        super().__init__("Too many jobs are waiting to run, try again later.")
+
+
+class JobStatus(BaseModel):
+    """Describes the state of a job; times are UNIX timestamps."""
+
+    id: str
+    module: str
+    prefix: str
+    route: str
+    status: JobState
+    submitted: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    expires: Optional[float] = None
+    error: Optional[str] = None
+    media_type: Optional[str] = None
+    size: Optional[int] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+
+@dcls.dataclass
+class JobResult:
+    """The stored result of a job.
+
+    Stores keeping the result in a file set `path`, so it can be sent with
+    `sendfile`; otherwise the result is read from `chunks`.
+    """
+
+    media_type: str
+    chunks: Optional[AsyncIterable[bytes]] = None
+    path: Optional[Path] = None
+
+
+class JobStore(abc.ABC):
+    """Base class for the storages of the status and results of the jobs."""
+
+    @abc.abstractmethod
+    async def save_status(self, status: JobStatus) -> None:
+        """Store the current status of a job."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_status(self, job_id: str) -> Optional[JobStatus]:
+        """Retrieve the status of a job, or `None` if unknown or expired."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def write_result(self, job_id: str, chunks: AsyncIterable[bytes]) -> int:
+        """Store the result of a job, and return its size in bytes."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def read_result(self, job_id: str, media_type: str) -> Optional[JobResult]:
+        """Retrieve the result of a job, or `None` if not available."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def purge(self, now: float) -> int:
+        """Remove the jobs expired at `now`, and return how many were removed."""
+        raise NotImplementedError
+
+
+class MemoryJobStore(JobStore):
+    """Keeps the jobs in the memory of the process."""
+
+    def __init__(self) -> None:
+        self._statuses: dict[str, JobStatus] = {}
+        self._results: dict[str, bytes] = {}
+
+    async def save_status(self, status: JobStatus) -> None:
+        self._statuses[status.id] = status
+
+    async def get_status(self, job_id: str) -> Optional[JobStatus]:
+        status = self._statuses.get(job_id)
+        if status is None or _expired(status, time.time()):
+            return None
+        return status
+
+    async def write_result(self, job_id: str, chunks: AsyncIterable[bytes]) -> int:
+        data = bytearray()
+        async for chunk in chunks:
+            data += chunk
+        self._results[job_id] = bytes(data)
+        return len(data)
+
+    async def read_result(self, job_id: str, media_type: str) -> Optional[JobResult]:
+        data = self._results.get(job_id)
+        if data is None:
+            return None
+        return JobResult(media_type, chunks=_iter_bytes(data))
+
+    async def purge(self, now: float) -> int:
+        expired = [key for key, status in self._statuses.items() if _expired(status, now)]
+        for key in expired:
+            del self._statuses[key]
+            self._results.pop(key, None)
+        return len(expired)
+
+
+class DiskJobStore(JobStore):
+    """Keeps the jobs as files in a local directory.
+
+    The directory can be shared by all the workers of the server, so any of
+    them can answer for the status and results of the jobs.
+
+    Arguments:
+        directory :str | Path:
+            Where the files are stored; it's created if it doesn't exist.
+
+    """
+
+    def __init__(self, directory: Union[str, Path]) -> None:
+        self.directory = Path(directory)
+
+    def _path(self, job_id: str, suffix: str) -> Path:
+        if not job_id.replace("-", "").replace("_", "").isalnum():
+            msg = f"Invalid job id: {job_id!r}"
+            raise LogicLayerException(msg)
+        return self.directory / f"{job_id}{suffix}"
+
+    async def save_status(self, status: JobStatus) -> None:
+        await run_in_threadpool(
+            _write_atomic, self._path(status.id, ".json"), status.model_dump_json().encode()
+        )
+
+    async def get_status(self, job_id: str) -> Optional[JobStatus]:
+        try:
+            data = await run_in_threadpool(self._path(job_id, ".json").read_bytes)
+        except (FileNotFoundError, LogicLayerException):
+            return None
+        status = JobStatus.model_validate_json(data)
+        return None if _expired(status, time.time()) else status
+
+    async def write_result(self, job_id: str, chunks: AsyncIterable[bytes]) -> int:
+        path = self._path(job_id, ".result")
+        temp = path.with_suffix(".tmp")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        size = 0
+        file = await run_in_threadpool(open, temp, "wb")
+        try:
+            async for chunk in chunks:
+                await run_in_threadpool(file.write, chunk)
+                size += len(chunk)
+        except BaseException:
+            file.close()
+            temp.unlink()
+            raise
+        file.close()
+        os.replace(temp, path)
+        return size
+
+    async def read_result(self, job_id: str, media_type: str) -> Optional[JobResult]:
+        try:
+            path = self._path(job_id, ".result")
+        except LogicLayerException:
+            return None
+        return JobResult(media_type, path=path) if path.exists() else None
+
+    async def purge(self, now: float) -> int:
+        return await run_in_threadpool(self._purge, now)
+
+    def _purge(self, now: float) -> int:
+        count = 0
+        for path in self.directory.glob("*.json"):
+            try:
+                status = JobStatus.model_validate_json(path.read_bytes())
+            except (OSError, ValueError):
+                continue
+            if _expired(status, now):
+                for suffix in (".result", ".json"):
+                    path.with_suffix(suffix).unlink(missing_ok=True)
+                count += 1
+        return count
+
+
+@dcls.dataclass(frozen=True)
+class JobsConfig:
+    """Defines how the routes in job mode are run.
+
+    Attributes:
+        workers :int:
+            Maximum amount of jobs running at the same time, in each process.
+        max_pending :int:
+            Maximum amount of jobs waiting for a worker; further submissions are
+            answered with a `503` status.
+        ttl :float:
+            Seconds the status and result of a job are kept after it ends.
+        store :JobStore | None:
+            Where the status and results of the jobs are kept. Defaults to a
+            :class:`MemoryJobStore`.
+        path :str:
+            Path of the job endpoints, relative to the prefix of each module.
+
+    """
+
+    workers: int = 4
+    max_pending: int = 100
+    ttl: float = 3600.0
+    store: Optional[JobStore] = None
+    path: str = "/_jobs"
+
+
+@dcls.dataclass
+class _Job:
+    status: JobStatus
+    key: str
+    task: Optional[asyncio.Task[None]] = None
+
+
+class JobManager:
+    """Runs the jobs of a LogicLayer app and keeps track of their status.
+
+    Jobs with the same parameters and roles as one still queued or running in
+    the same process are not submitted again; the id of the existing job is
+    returned instead.
+    """
+
+    def __init__(self, config: JobsConfig) -> None:
+        self.config = config
+        self.store = config.store if config.store is not None else MemoryJobStore()
+        self.jobs: dict[str, _Job] = {}
+        self._active: dict[str, str] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._next_purge = 0.0
+
+    @property
+    def pending(self) -> int:
+        """Amount of jobs waiting for a worker."""
+        return sum(1 for job in self.jobs.values() if job.status.status == "queued")
+
+    def handler(
+        self,
+        handler: Handler,
+        *,
+        module: str,
+        prefix: str,
+        route: str,
+        response_class: type[Response],
+        encode: Callable[[Any], Any] = jsonable_encoder,
+        get_roles: Optional[Callable[[Request], Any]] = None,
+    ) -> Handler:
+        """Wrap a route handler to run it as a job, and answer with its status.
+
+        The jobs belong to the module mounted at `prefix`, and can only be
+        reached from its job endpoints. The results which are not a
+        :class:`Response` are converted by `encode` before being rendered with
+        `response_class`.
+        """
+        namespace = f"{prefix}:{route}"
+
+        async def job_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+            roles = await get_roles(request) if get_roles is not None else None
+            key = await request_key(request, namespace, roles)
+            status = await self.submit(
+                key,
+                lambda: handler(request, kwargs),
+                module=module,
+                prefix=prefix,
+                route=route,
+                response_class=response_class,
+                encode=encode,
+            )
+            location = request.url_for(f"{prefix}:job_status", job_id=status.id)
+            return JSONResponse(
+                status.model_dump(mode="json"),
+                status_code=HTTP_202_ACCEPTED,
+                headers={"Location": str(location)},
+            )
+
+        return job_handler
+
+    async def submit(
+        self,
+        key: str,
+        func: Callable[[], Any],
+        *,
+        module: str,
+        prefix: str,
+        route: str,
+        response_class: type[Response],
+        encode: Callable[[Any], Any] = jsonable_encoder,
+    ) -> JobStatus:
+        """Start a job which awaits `func`, unless an equivalent one is active."""
+        now = time.time()
+        if now >= self._next_purge:
+            self._next_purge = now + min(self.config.ttl, 60.0)
+            await self.purge()
+
+        job_id = self._active.get(key)
+        if job_id is not None:
+            return self.jobs[job_id].status
+        if self.pending >= self.config.max_pending:
+            raise JobsSaturated
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.config.workers)
+        status = JobStatus(
+            id=secrets.token_urlsafe(16),
+            module=module,
+            prefix=prefix,
+            route=route,
+            status="queued",
+            submitted=now,
+        )
+        job = self.jobs[status.id] = _Job(status, key)
+        self._active[key] = status.id
+        await self.store.save_status(status)
+        job.task = asyncio.create_task(self._run(job, func, response_class, encode))
+        logger.debug("Job %s submitted for %s:%s", status.id, module, route)
+        return status
+
+    async def _run(
+        self,
+        job: _Job,
+        func: Callable[[], Any],
+        response_class: type[Response],
+        encode: Callable[[Any], Any],
+    ) -> None:
+        status = job.status
+        assert self._semaphore is not None
+        try:
+            async with self._semaphore:
+                status.status, status.started = "running", time.time()
+                await self.store.save_status(status)
+                result = await func()
+                chunks, status.media_type = _serialize(result, response_class, encode)
+                status.size = await self.store.write_result(status.id, chunks)
+        except asyncio.CancelledError:
+            status.status = "cancelled"
+        except Exception as exc:
+            logger.exception("Job %s of %s:%s failed", status.id, status.module, status.route)
+            status.status, status.error = "failed", _describe(exc)
+        else:
+            status.status = "done"
+        finally:
+            self._active.pop(job.key, None)
+            status.finished = time.time()
+            status.expires = status.finished + self.config.ttl
+            job.task = None
+            await self.store.save_status(status)
+
+    async def status(self, job_id: str, prefix: str) -> JobStatus:
+        """Retrieve the status of a job of the module at `prefix`, or raise a 404 error."""
+        job = self.jobs.get(job_id)
+        status = job.status if job is not None else await self.store.get_status(job_id)
+        if status is None or status.prefix != prefix:
+            raise HTTPException(HTTP_404_NOT_FOUND, "Job not found")
+        return status
+
+    async def result(self, job_id: str, prefix: str) -> Response:
+        """Build a response streaming the stored result of a job."""
+        status = await self.status(job_id, prefix)
+        if status.status != "done":
+            raise HTTPException(HTTP_409_CONFLICT, f"Job is {status.status}")
+        result = await self.store.read_result(job_id, status.media_type or "")
+        if result is None:
+            raise HTTPException(HTTP_404_NOT_FOUND, "Job result expired")
+        if result.path is not None:
+            return FileResponse(result.path, media_type=result.media_type)
+        assert result.chunks is not None
+        return StreamingResponse(result.chunks, media_type=result.media_type)
+
+    async def cancel(self, job_id: str, prefix: str) -> JobStatus:
+        """Cancel a job queued or running in this process.
+
+        Routes already running in a thread or another process can't be
+        interrupted; they finish in the background, but their result is
+        discarded.
+        """
+        status = await self.status(job_id, prefix)
+        job = self.jobs.get(job_id)
+        if job is None or job.task is None:
+            if status.active:
+                raise HTTPException(HTTP_409_CONFLICT, "Job is running in another worker")
+            return status
+        task = job.task
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return job.status
+
+    async def purge(self) -> None:
+        """Forget the jobs which ended more than `ttl` seconds ago."""
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if _expired(job.status, now):
+                del self.jobs[job_id]
+        count = await self.store.purge(now)
+        if count:
+            logger.debug("Purged %d expired jobs", count)
+
+    async def stop(self) -> None:
+        """Cancel all the jobs still queued or running."""
+        tasks = [job.task for job in self.jobs.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._semaphore = None
+
+    def add_routes(self, router: APIRouter, prefix: str) -> None:
+        """Register the status, result and cancel endpoints of the module at `prefix`."""
+        path = self.config.path
+
+        async def job_status(job_id: str) -> JobStatus:
+            return await self.status(job_id, prefix)
+
+        async def job_result(job_id: str) -> Response:
+            return await self.result(job_id, prefix)
+
+        async def job_cancel(job_id: str) -> JobStatus:
+            return await self.cancel(job_id, prefix)
+
+        router.add_api_route(
+            f"{path}/{{job_id}}", job_status, methods=["GET"], name=f"{prefix}:job_status"
+        )
+        router.add_api_route(
+            f"{path}/{{job_id}}/result",
+            job_result,
+            methods=["GET"],
+            name=f"{prefix}:job_result",
+            response_class=StreamingResponse,
+        )
+        router.add_api_route(
+            f"{path}/{{job_id}}", job_cancel, methods=["DELETE"], name=f"{prefix}:job_cancel"
+        )
+
+
+def yield_dependencies(
+    func: Callable[..., Any],
+    path: str,
+    dependencies: Sequence[Depends] = (),
+) -> list[str]:
+    """Find the dependencies with `yield` used by a route, directly or not.
+
+    FastAPI runs their exit code when the request ends, so they can't be used
+    by routes which keep running after it, like the jobs.
+    """
+    pending = [get_dependant(path=path, call=func)]
+    pending.extend(
+        get_dependant(path=path, call=item.dependency)
+        for item in dependencies
+        if item.dependency is not None
+    )
+    names = []
+    while pending:
+        dependant = pending.pop()
+        if dependant.call is not func and _is_generator(dependant.call):
+            names.append(getattr(dependant.call, "__name__", repr(dependant.call)))
+        pending.extend(dependant.dependencies)
+    return names
+
+
+def _is_generator(call: Any) -> bool:
+    call = call if inspect.isroutine(call) else getattr(call, "__call__", None)
+    return inspect.isgeneratorfunction(call) or inspect.isasyncgenfunction(call)
+
+
+def _serialize(
+    result: Any,
+    response_class: type[Response],
+    encode: Callable[[Any], Any],
+) -> tuple[AsyncIterable[bytes], str]:
+    """Convert the result of a route into the chunks of its response body."""
+    if not isinstance(result, Response):
+        result = response_class(encode(result))
+    elif result.status_code >= 400:
+        msg = f"Route answered with status {result.status_code}"
+        raise LogicLayerException(msg)
+
+    media_type = result.media_type or "application/octet-stream"
+    if isinstance(result, StreamingResponse):
+        return _iter_stream(result.body_iterator), media_type
+    return _iter_bytes(result.body), media_type
+
+
+async def _iter_stream(
+    iterator: AsyncIterable[Union[str, bytes, memoryview]],
+) -> AsyncIterator[bytes]:
+    async for chunk in iterator:
+        yield chunk.encode("utf-8") if isinstance(chunk, str) else bytes(chunk)
+
+
+async def _iter_bytes(data: bytes) -> AsyncIterator[bytes]:
+    view = memoryview(data)
+    for start in range(0, len(view), CHUNK_SIZE):
+        yield bytes(view[start : start + CHUNK_SIZE])
+
+
+def _describe(exc: Exception) -> str:
+    if isinstance(exc, HTTPException):
+        return f"HTTP {exc.status_code}: {exc.detail}"
+    if isinstance(exc, LogicLayerException):
+        return exc.message
+    return f"{type(exc).__name__}: {exc}"
+
+
+def _expired(status: JobStatus, now: float) -> bool:
+    return status.expires is not None and status.expires < now
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_suffix(".tmp-status")
+    temp.write_bytes(data)
+    os.replace(temp, path)
@@ -0,0 +1,284 @@
+"""Lazy module loading.
+
+Contains the definitions to mount a LogicLayer module from an import string,
+registering its routes from the metadata of its class, and creating the
+instance only when it's first needed or in the background once the server is
+running.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses as dcls
+import functools
+import importlib
+import logging
+import time
+import types
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from .admission import AdmissionPolicy
+from .common import (
+    LogicLayerException,
+    _call_handler,
+    _endpoint_from_handler,
+)
+from .executor import ExecutorConfig
+from .health import CheckSkipped
+from .lifecycle import ModuleHooks, StartupFailed
+from .module import LogicLayerModule, ModuleMethod, _add_route, _first_response_class
+from .raw import raw_endpoint, raw_parser
+from .tracing import traced_exception_handler
+
+if TYPE_CHECKING:
+    from .logiclayer import LogicLayer
+
+logger = logging.getLogger("logiclayer.lazy")
+
+
+@dcls.dataclass(frozen=True)
+class LazyModule:
+    """Describes a module to be instantiated only when needed.
+
+    Attributes:
+        target :str:
+            The import string of the module class, as `package.module:ClassName`.
+        kwargs :dict[str, Any]:
+            The keyword arguments for the constructor of the class.
+        preload :bool:
+            Creates the instance in the background once the server started. If
+            `False`, it's created when it receives its first request.
+
+    The module where the class is defined is imported when the module is added
+    to the app, to register its routes, but the instance is created later. To
+    benefit from this, heavy dependencies and data files should be loaded in
+    the constructor, or in the startup handlers of the module.
+    """
+
+    target: str
+    kwargs: dict[str, Any] = dcls.field(default_factory=dict)
+    preload: bool = True
+
+
+def import_string(target: str) -> type[LogicLayerModule]:
+    """Import the module class referenced by an import string."""
+    module_name, sep, attr = target.partition(":")
+    if not sep:
+        module_name, _, attr = target.rpartition(".")
+    if not module_name or not attr:
+        msg = f"Invalid import string for a module class: '{target}'"
+        raise LogicLayerException(msg)
+
+    obj: Any = importlib.import_module(module_name)
+    for name in attr.split("."):
+        obj = getattr(obj, name)
+    if not (isinstance(obj, type) and issubclass(obj, LogicLayerModule)):
+        msg = f"'{target}' is not a subclass of LogicLayerModule"
+        raise LogicLayerException(msg)
+    return obj
+
+
+class ModuleLoader:
+    """Mounts a lazy module in a LogicLayer app and creates its instance on demand."""
+
+    def __init__(
+        self,
+        layer: LogicLayer,
+        spec: LazyModule,
+        *,
+        prefix: str,
+        admission: Optional[AdmissionPolicy] = None,
+        deadline: Optional[float] = None,
+        executor: Optional[ExecutorConfig] = None,
+    ) -> None:
+        start = time.perf_counter()
+        self.cls = import_string(spec.target)
+        self.import_time = time.perf_counter() - start
+        self.layer = layer
+        self.spec = spec
+        self.prefix = prefix
+        self.admission = admission
+        self.deadline = deadline
+        self.executor = executor
+        self.instance: Optional[LogicLayerModule] = None
+        self.handlers: dict[str, Callable[[Request, dict[str, Any]], Any]] = {}
+        self.hooks: Optional[ModuleHooks] = None
+        self._task: Optional[asyncio.Future[LogicLayerModule]] = None
+
+        if any(item.executor == "process" for item in self.cls._llroutes):
+            msg = f"Module '{self.name}' has routes run in a process, and can't be loaded lazily."
+            raise LogicLayerException(msg)
+
+    @property
+    def name(self) -> str:
+        return self.cls.__name__
+
+    @property
+    def loaded(self) -> bool:
+        return self.instance is not None
+
+    async def get(self) -> LogicLayerModule:
+        """Return the instance of the module, creating it if needed.
+
+        Concurrent callers wait for the same instance. If the creation fails,
+        the next call tries again.
+        """
+        if self.instance is not None:
+            return self.instance
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._load())
+        return await asyncio.shield(self._task)
+
+    async def _load(self) -> LogicLayerModule:
+        layer = self.layer
+        start = time.perf_counter()
+        try:
+            kwargs = {
+                key: layer.resources.resolve(value) for key, value in self.spec.kwargs.items()
+            }
+            instance = await run_in_threadpool(functools.partial(self.cls, **kwargs))
+            if self.admission is not None:
+                instance.set_admission(self.admission)
+            if self.deadline is not None:
+                instance.set_deadline(self.deadline)
+            if self.executor is not None:
+                instance.set_executor(self.executor)
+            instance.prefix = self.prefix
+            init_time = time.perf_counter() - start
+
+            handlers = {}
+            for item in self.cls._llroutes:
+                handler = instance._route_handler(layer, item)
+                if handler is None:
+                    handler = _call_handler(item.bound_to(instance))
+                handlers[item.func.__name__] = handler
+
+            self.hooks = ModuleHooks(
+                self.name,
+                startup=[instance._hook(item) for item in self.cls._llstartup],
+                shutdown=instance._shutdown_hooks(),
+            )
+            failure = await layer.lifecycle.run_hooks(self.hooks, "startup")
+            if failure is not None:
+                raise StartupFailed(failure)
+        except BaseException:
+            self._task = None
+            raise
+
+        self.handlers = handlers
+        self.instance = layer.modules[self.prefix] = instance
+        logger.info(
+            "Module %s loaded in %.3f seconds (import %.3f, init %.3f, startup %.3f)",
+            self.name,
+            self.import_time + time.perf_counter() - start,
+            self.import_time,
+            init_time,
+            time.perf_counter() - start - init_time,
+        )
+        return instance
+
+    async def preload(self) -> None:
+        """Start creating the instance in the background."""
+        if self._task is not None or self.instance is not None:
+            return
+        self._task = task = asyncio.ensure_future(self._load())
+        task.add_done_callback(self._log_failure)
+
+    def _log_failure(self, task: asyncio.Future[Any]) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Module %s failed to load", self.name, exc_info=task.exception())
+
+    async def shutdown(self) -> None:
+        """Run the shutdown handlers of the instance, if it was created."""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            with contextlib.suppress(BaseException):
+                await task
+
+        if self.instance is not None and self.hooks is not None:
+            await self.layer.lifecycle.run_hooks(self.hooks, "shutdown")
+
+    def include(self, **kwargs: Any) -> None:
+        """Register the routes, handlers and checks of the module class in the app."""
+        layer = self.layer
+        app = layer.app
+        router = APIRouter(tags=[self.name])
+        debug = self.spec.kwargs.get("debug", False)
+
+        for exc_cls, method in self.cls._llexceptions.items():
+            handler = self._exception_handler(method)
+            if layer.tracer is not None:
+                handler = traced_exception_handler(handler)
+            app.add_exception_handler(exc_cls, handler)
+
+        for item in self.cls._llhealthchecks:
+            layer.add_check(self._healthcheck(item), **item.kwargs)
+
+        if self.spec.preload:
+            router.on_startup.append(self.preload)
+        router.on_shutdown.append(self.shutdown)
+
+        routes = [item for item in self.cls._llroutes if debug or not item.debug_only]
+        for item in routes:
+            endpoint = self._route_endpoint(item)
+            _add_route(router, item, endpoint)
+            if layer.metrics is not None:
+                path = kwargs.get("prefix", "") + item.path
+                layer.metrics.add_route(endpoint, self.name, path)
+
+        if any(item.mode == "job" for item in routes):
+            layer.jobs.add_routes(router, self.prefix)
+
+        app.include_router(router, **kwargs)
+        logger.debug("Module %s registered in %.3f seconds", self.name, self.import_time)
+
+    def _route_endpoint(self, item: ModuleMethod) -> Callable[..., Any]:
+        name = item.func.__name__
+
+        async def lazy_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+            if self.instance is None:
+                await self.get()
+            return await self.handlers[name](request, kwargs)
+
+        # binding the function to the class gives the signature without `self`
+        func = types.MethodType(item.func, self.cls)
+        if item.raw:
+            return raw_endpoint(
+                lazy_handler,
+                raw_parser(func, item.path),
+                response_class=_first_response_class(
+                    item.kwargs.get("response_class"),
+                    self.layer.app.router.default_response_class,
+                ),
+                status_code=item.kwargs.get("status_code"),
+            )
+        return _endpoint_from_handler(func, lazy_handler)
+
+    def _exception_handler(self, method: ModuleMethod) -> Callable[..., Any]:
+        async def lazy_exception_handler(request: Request, exc: Exception) -> Any:
+            func = method.bound_to(await self.get())
+            if asyncio.iscoroutinefunction(func):
+                return await func(request, exc)
+            return await run_in_threadpool(func, request, exc)
+
+        return lazy_exception_handler
+
+    def _healthcheck(self, item: ModuleMethod) -> Callable[[], Any]:
+        @functools.wraps(item.func)
+        async def lazy_healthcheck() -> Any:
+            # the check must not load the module, nor wait for it to load
+            if self.instance is None:
+                msg = f"Module {self.name} is not loaded"
+                raise CheckSkipped(msg)
+            func = self.instance._bound_method(item)
+            if asyncio.iscoroutinefunction(func):
+                return await func()
+            return await run_in_threadpool(func)
+
+        return lazy_healthcheck
@@ -0,0 +1,374 @@
+"""Lifecycle module.
+
+Contains the definitions to run the startup and shutdown handlers of the
+modules in a LogicLayer app concurrently, respecting the dependencies declared
+between modules.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses as dcls
+import inspect
+import logging
+import time
+from collections.abc import Sequence
+from typing import Any, Callable, Literal, Optional
+
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from .common import Handler, LogicLayerException
+from .health import CheckStatus
+
+logger = logging.getLogger("logiclayer.lifecycle")
+
+Event = Literal["startup", "shutdown"]
+
+
+class HookResult(BaseModel):
+    """Describes the execution of a startup/shutdown handler of a module."""
+
+    module: str
+    hook: str
+    event: Event
+    status: Literal["ok", "failed", "timeout", "skipped"]
+    duration: float = 0.0
+    error: Optional[str] = None
+
+
+class StartupFailed(LogicLayerException):
+    """A startup handler of a module failed, and the app can't start."""
+
+    def __init__(self, result: HookResult) -> None:
+        super().__init__(
+            f"Startup handler '{result.hook}' of module '{result.module}' "
+            f"failed: {result.error}"
+        )
+        self.result = result
+
+
+class ModuleUnavailable(LogicLayerException):
+    """A request was sent to a module which failed to start."""
+
+    def __init__(self, result: HookResult) -> None:
+        super().__init__(f"Module '{result.module}' failed to start: {result.error}")
+        self.result = result
+
+
+@dcls.dataclass
+class Hook:
+    """A startup/shutdown handler, with its maximum duration."""
+
+    func: Callable[[], Any]
+    name: str
+    timeout: Optional[float] = None
+
+
+@dcls.dataclass
+class ModuleHooks:
+    """The startup and shutdown handlers of a module, and its dependencies."""
+
+    name: str
+    depends_on: tuple[str, ...] = ()
+    startup: list[Hook] = dcls.field(default_factory=list)
+    shutdown: list[Hook] = dcls.field(default_factory=list)
+    #: The result which prevented the module from starting, if any.
+    failure: Optional[HookResult] = dcls.field(default=None, init=False)
+
+
+class Lifecycle:
+    """Runs the startup and shutdown handlers of the modules of an app.
+
+    The handlers of each module run in order, but the modules run concurrently,
+    except when a module depends on others: on startup it waits for its
+    dependencies to start, and on shutdown they wait for it to stop.
+    Synchronous handlers run in the threadpool.
+
+    Arguments:
+        startup_timeout :float | None:
+            Default amount of seconds a startup handler can take.
+        shutdown_timeout :float | None:
+            Default amount of seconds a shutdown handler can take.
+        policy :"fail" | "degrade":
+            What to do when a startup handler fails or times out. With "fail",
+            the other handlers are cancelled, the modules already started are
+            shut down, and the app fails to start. With "degrade", the app
+            starts without the failed module and the modules depending on it:
+            their routes answer with a `503` status, their shutdown handlers
+            don't run, and they are reported as degraded, which doesn't fail
+            the healthchecks of the app.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        startup_timeout: Optional[float] = None,
+        shutdown_timeout: Optional[float] = None,
+        policy: Literal["fail", "degrade"] = "fail",
+    ) -> None:
+        if policy not in ("fail", "degrade"):
+            msg = f"Invalid startup policy: {policy!r}"
+            raise ValueError(msg)
+        self.startup_timeout = startup_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.policy = policy
+        self.modules: list[ModuleHooks] = []
+        self.results: list[HookResult] = []
+        self.listeners: list[Callable[[HookResult], None]] = []
+        self._skipped: set[int] = set()
+        self._failures: dict[str, HookResult] = {}
+
+    def add(
+        self,
+        name: str,
+        *,
+        depends_on: Sequence[str] = (),
+        startup: Sequence[Hook] = (),
+        shutdown: Sequence[Hook] = (),
+    ) -> ModuleHooks:
+        """Register the handlers of a module."""
+        item = ModuleHooks(name, tuple(depends_on), list(startup), list(shutdown))
+        self.modules.append(item)
+        return item
+
+    def statuses(self) -> list[CheckStatus]:
+        """Describe the modules which failed to start as degraded healthchecks."""
+        return [
+            CheckStatus(
+                name=f"{name}.startup",
+                healthy=False,
+                degraded=True,
+                latency=result.duration,
+                last_failure=result.error,
+            )
+            for name, result in self._failures.items()
+        ]
+
+    def _dependencies(self) -> list[set[int]]:
+        """Resolve the dependencies of each module to their indexes."""
+        indexes: dict[str, list[int]] = {}
+        for index, item in enumerate(self.modules):
+            indexes.setdefault(item.name, []).append(index)
+
+        graph = []
+        for item in self.modules:
+            deps: set[int] = set()
+            for name in item.depends_on:
+                if name not in indexes:
+                    msg = f"Module '{item.name}' depends on unknown module '{name}'"
+                    raise LogicLayerException(msg)
+                deps.update(indexes[name])
+            graph.append(deps)
+
+        # detect cycles with a depth-first traversal
+        state = [0] * len(graph)
+
+        def visit(index: int) -> None:
+            if state[index] == 1:
+                msg = f"Circular dependency between modules involving '{self.modules[index].name}'"
+                raise LogicLayerException(msg)
+            if state[index] == 0:
+                state[index] = 1
+                for dep in graph[index]:
+                    visit(dep)
+                state[index] = 2
+
+        for index in range(len(graph)):
+            visit(index)
+        return graph
+
+    async def startup(self) -> None:
+        """Run the startup handlers of all modules."""
+        graph = self._dependencies()
+        self._skipped.clear()
+        self._failures.clear()
+        for item in self.modules:
+            item.failure = None
+        start = time.perf_counter()
+        tasks: dict[int, asyncio.Task[bool]] = {}
+
+        async def run_module(index: int) -> bool:
+            item = self.modules[index]
+            deps_ok = await asyncio.gather(*(tasks[dep] for dep in graph[index]))
+            if not all(deps_ok):
+                self._skip(index, "A dependency failed to start")
+                return False
+            failure = await self.run_hooks(item, "startup")
+            if failure is not None:
+                self._failures[item.name] = failure
+                if self.policy == "fail":
+                    raise StartupFailed(failure)
+                item.failure = failure
+                self._skipped.add(index)
+                return False
+            return True
+
+        # tasks are created once their dependencies exist
+        pending = set(range(len(self.modules)))
+        while pending:
+            ready = [index for index in sorted(pending) if graph[index].issubset(tasks)]
+            for index in ready:
+                tasks[index] = asyncio.create_task(run_module(index))
+                pending.discard(index)
+
+        if tasks:
+            done, running = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            errors = [task.exception() for task in done if not task.cancelled()]
+            error = next((exc for exc in errors if exc is not None), None)
+            if error is not None:
+                logger.error("Startup failed, stopping the modules already started")
+                for index, task in tasks.items():
+                    if task.cancelled() or task.exception() is not None:
+                        self._skipped.add(index)
+                await self.shutdown()
+                raise error
+
+        logger.info("Modules started in %.3f seconds", time.perf_counter() - start)
+
+    def _skip(self, index: int, reason: str) -> None:
+        item = self.modules[index]
+        self._skipped.add(index)
+        item.failure = HookResult(
+            module=item.name, hook="", event="startup", status="skipped", error=reason
+        )
+        self._failures.setdefault(item.name, item.failure)
+        for hook in item.startup:
+            self._report(
+                HookResult(
+                    module=item.name,
+                    hook=hook.name,
+                    event="startup",
+                    status="skipped",
+                    error=reason,
+                )
+            )
+
+    async def shutdown(self) -> None:
+        """Run the shutdown handlers of the modules which were not skipped on startup.
+
+        Failures are logged, and don't prevent other handlers from running.
+        """
+        graph = self._dependencies()
+        dependents: list[set[int]] = [set() for _ in graph]
+        for index, deps in enumerate(graph):
+            for dep in deps:
+                dependents[dep].add(index)
+
+        start = time.perf_counter()
+        tasks: dict[int, asyncio.Task[None]] = {}
+
+        async def run_module(index: int) -> None:
+            await asyncio.gather(*(tasks[dep] for dep in dependents[index]))
+            if index in self._skipped:
+                return
+            await self.run_hooks(self.modules[index], "shutdown")
+
+        pending = set(range(len(self.modules)))
+        while pending:
+            ready = [index for index in sorted(pending) if dependents[index].issubset(tasks)]
+            for index in ready:
+                tasks[index] = asyncio.create_task(run_module(index))
+                pending.discard(index)
+
+        await asyncio.gather(*tasks.values())
+        logger.info("Modules stopped in %.3f seconds", time.perf_counter() - start)
+
+    async def run_hooks(self, item: ModuleHooks, event: Event) -> Optional[HookResult]:
+        """Run the handlers of a module for an event, in order.
+
+        Returns the result of the first handler which didn't succeed, if any.
+        Startup stops at the first failure; shutdown runs all the handlers.
+        """
+        failure = None
+        if event == "startup":
+            hooks, timeout = item.startup, self.startup_timeout
+        else:
+            hooks, timeout = item.shutdown, self.shutdown_timeout
+        for hook in hooks:
+            result = await self._run(item, hook, event, timeout)
+            if result.status != "ok" and failure is None:
+                failure = result
+                if event == "startup":
+                    break
+        return failure
+
+    async def _run(
+        self,
+        item: ModuleHooks,
+        hook: Hook,
+        event: Event,
+        default_timeout: Optional[float],
+    ) -> HookResult:
+        timeout = default_timeout if hook.timeout is None else hook.timeout
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(_call(hook.func), timeout)
+        except asyncio.TimeoutError:
+            status, error = "timeout", f"Timed out after {timeout} seconds"
+        except Exception as exc:
+            logger.exception("Error in %s handler %s.%s", event, item.name, hook.name)
+            status, error = "failed", f"{type(exc).__name__}: {exc}"
+        else:
+            status, error = "ok", None
+
+        result = HookResult(
+            module=item.name,
+            hook=hook.name,
+            event=event,
+            status=status,
+            duration=time.perf_counter() - start,
+            error=error,
+        )
+        self._report(result)
+        return result
+
+    def _report(self, result: HookResult) -> None:
+        self.results.append(result)
+        if result.status in ("ok", "skipped"):
+            logger.info(
+                "%s handler %s.%s: %s in %.3f seconds",
+                result.event.capitalize(),
+                result.module,
+                result.hook,
+                result.status,
+                result.duration,
+            )
+        else:
+            logger.error(
+                "%s handler %s.%s: %s in %.3f seconds (%s)",
+                result.event.capitalize(),
+                result.module,
+                result.hook,
+                result.status,
+                result.duration,
+                result.error,
+            )
+        for listener in self.listeners:
+            listener(result)
+
+
+def available_handler(handler: Handler, hooks: ModuleHooks) -> Handler:
+    """Wrap a route handler to reject the requests while its module is not
+    running, because it failed to start."""
+
+    async def available_wrapper(request: Request, kwargs: dict[str, Any]) -> Any:
+        if hooks.failure is not None:
+            raise ModuleUnavailable(hooks.failure)
+        return await handler(request, kwargs)
+
+    return available_wrapper
+
+
+async def _call(func: Callable[[], Any]) -> Any:
+    if asyncio.iscoroutinefunction(func):
+        return await func()
+    result = await run_in_threadpool(func)
+    if inspect.isawaitable(result):
+        return await result
+    return result
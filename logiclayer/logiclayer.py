@@ -5,24 +5,56 @@ Contains the main definitions for the LogicLayer class.
 
 from __future__ import annotations
 
-import asyncio
+import dataclasses as dcls
 import logging
+import time
+from collections.abc import Sequence
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Callable
+from typing import TYPE_CHECKING, Any, Callable, Literal, Optional, TypeVar
 
 from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
-from starlette.responses import RedirectResponse, Response
-from starlette.status import HTTP_204_NO_CONTENT
-from starlette.types import Receive, Scope, Send
-
-from .common import P, R_co, _await_for_it
+from starlette.requests import Request
+from starlette.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    Response,
+)
+from starlette.routing import Route
+from starlette.status import (
+    HTTP_204_NO_CONTENT,
+    HTTP_500_INTERNAL_SERVER_ERROR,
+    HTTP_503_SERVICE_UNAVAILABLE,
+    HTTP_504_GATEWAY_TIMEOUT,
+)
+from starlette.types import Message, Receive, Scope, Send
+
+from .admission import AdmissionPolicy, AdmissionStats, Overloaded
+from .batch import BatchConfig, BatchItem, BatchRunner
+from .cache import CacheStats
+from .coalesce import SingleFlight, coalesced_handler
+from .deadline import DeadlineExceeded, DeadlineStats
+from .common import LogicLayerException, P, R_co, _call_handler, _endpoint_from_handler
+from .executor import ExecutorConfig, ExecutorSaturated, ExecutorStats, ProcessPool
+from .health import CheckStatus, Healthcheck, HealthcheckScheduler, run_healthchecks
+from .jobs import JobManager, JobsConfig, JobsSaturated
+from .lazy import LazyModule, ModuleLoader
+from .lifecycle import Lifecycle, ModuleUnavailable
+from .metrics import MetricsRegistry
+from .openapi import OpenAPICache, OpenAPIConfig
+from .profiling import Profiler, ProfilerBusy, ProfileReport
+from .resources import BasePool, PoolTimeout, ResourceRegistry
+from .static import IndexedStaticFiles, StaticConfig
+from .tracing import Tracer, TracingConfig
 
 if TYPE_CHECKING:
     from .module import CallableMayReturnCoroutine, LogicLayerModule
 
 logger = logging.getLogger("logiclayer")
 
+T_Pool = TypeVar("T_Pool", bound=BasePool)
+
 
 class LogicLayer:
     """Main LogicLayer app handler.
@@ -31,13 +63,223 @@ class LogicLayer:
     """
 
     app: FastAPI
+    batch: BatchRunner | None
     debug: bool
-    healthchecks: list[CallableMayReturnCoroutine[[], bool]]
+    flight: SingleFlight
+    healthchecks: list[Healthcheck]
+    jobs: JobManager
+    lifecycle: Lifecycle
+    loaders: dict[str, ModuleLoader]
+    metrics: MetricsRegistry | None
+    modules: dict[str, LogicLayerModule]
+    openapi: OpenAPICache | None
+    process_pool: ProcessPool
+    profiler: Profiler | None
+    resources: ResourceRegistry
+    scheduler: HealthcheckScheduler | None
+    tracer: Tracer | None
+
+    def __init__(
+        self,
+        *,
+        batch: BatchConfig | None = None,
+        debug: bool = False,
+        healthchecks: bool = True,
+        healthcheck_interval: float | None = None,
+        healthcheck_timeout: float | None = 10.0,
+        jobs: JobsConfig | None = None,
+        metrics_path: str | None = None,
+        metrics_dir: str | Path | None = None,
+        openapi: OpenAPIConfig | None = None,
+        process_workers: int | None = None,
+        shutdown_timeout: float | None = None,
+        startup_policy: Literal["fail", "degrade"] = "fail",
+        startup_timeout: float | None = None,
+        tracing: TracingConfig | None = None,
+        **kwargs,
+    ) -> None:
+        """Create a new LogicLayer app.
+
+        Keyword Arguments:
+            batch :logiclayer.BatchConfig | None:
+                If set, a route is configured to receive a list of requests to
+                other routes of the app, which are handled concurrently in the
+                same process, and whose results are streamed as they complete.
+            debug :bool:
+                Enables the routes and handlers flagged as debug-only, the
+                `/_debug/profile` route to profile the modules in debug mode,
+                and the `/_debug/memoize` routes to inspect and invalidate the
+                results of the memoized methods of the modules.
+            healthchecks :bool:
+                Configures the `/_health` and `/_health/details` routes.
+            healthcheck_interval :float | None:
+                If set, the healthchecks run periodically in the background
+                every this amount of seconds, and `/_health` answers from the
+                result of the last run. Otherwise, the healthchecks run on
+                each request to `/_health`.
+            healthcheck_timeout :float | None:
+                The default amount of seconds a healthcheck can take before
+                being considered failed.
+            jobs :logiclayer.JobsConfig | None:
+                Defines the workers, expiration and storage of the routes set
+                with `mode="job"`. By default, up to 4 jobs run at the same
+                time, and their results are kept in memory for an hour.
+            metrics_path :str | None:
+                If set, the requests, healthchecks and event handlers are
+                instrumented, and the metrics are served in this path in the
+                Prometheus text format.
+            metrics_dir :str | Path | None:
+                A directory shared by all the workers of the server, used to
+                aggregate the metrics of all of them.
+            openapi :logiclayer.OpenAPIConfig | None:
+                If set, the OpenAPI schema is built once, optionally when the
+                app starts and stored in a directory, and served serialized
+                with an `ETag`, also split by module prefix.
+            process_workers :int | None:
+                The amount of worker processes used to run the routes set
+                with `executor="process"`. Defaults to the amount of CPUs.
+            shutdown_timeout :float | None:
+                The default amount of seconds a shutdown handler of a module
+                can take.
+            startup_policy :"fail" | "degrade":
+                If "fail", the app doesn't start when a startup handler of a
+                module fails or times out. If "degrade", the app starts anyway;
+                the routes of the module and the modules depending on it answer
+                with a `503` status, and they are reported as degraded in
+                `/_health/details`, without failing `/_health`.
+            startup_timeout :float | None:
+                The default amount of seconds a startup handler of a module can
+                take.
+            tracing :logiclayer.TracingConfig | None:
+                If set, the time spent in each phase of the requests is
+                reported in the `Server-Timing` header, and a sample of the
+                traces is kept. In debug mode, the traces can be queried in
+                the path set in the config.
+            {any from :class:`FastAPI` constructor}
 
-    def __init__(self, *, debug: bool = False, healthchecks: bool = True, **kwargs) -> None:
+        """
         self.app = FastAPI(**kwargs)
+        self.batch = None
         self.debug = debug
+        self.flight = SingleFlight()
         self.healthchecks = []
+        self.healthcheck_timeout = healthcheck_timeout
+        self.jobs = JobManager(jobs or JobsConfig())
+        self.lifecycle = Lifecycle(
+            startup_timeout=startup_timeout,
+            shutdown_timeout=shutdown_timeout,
+            policy=startup_policy,
+        )
+        self.loaders = {}
+        self.metrics = None
+        self.modules = {}
+        self.openapi = None
+        self.process_pool = ProcessPool(process_workers)
+        self.profiler = None
+        self.resources = ResourceRegistry()
+        self.scheduler = None
+        self.tracer = None
+
+        self.app.state.resources = self.resources
+        self.app.add_exception_handler(ExecutorSaturated, _saturated_handler)
+        self.app.add_exception_handler(PoolTimeout, _saturated_handler)
+        self.app.add_exception_handler(JobsSaturated, _saturated_handler)
+        self.app.add_exception_handler(Overloaded, _saturated_handler)
+        self.app.add_exception_handler(DeadlineExceeded, _deadline_handler)
+        self.app.add_exception_handler(ModuleUnavailable, _unavailable_handler)
+        self.app.router.on_startup.append(self.process_pool.start)
+        self.app.router.on_startup.append(self.resources.open)
+        self.app.router.on_startup.append(self.lifecycle.startup)
+        self.app.router.on_shutdown.append(self.jobs.stop)
+        self.app.router.on_shutdown.append(self.lifecycle.shutdown)
+        self.app.router.on_shutdown.append(self.resources.close)
+        self.app.router.on_shutdown.append(self.process_pool.stop)
+
+        if metrics_path is not None:
+            self.metrics = metrics = MetricsRegistry(directory=metrics_dir)
+            self.lifecycle.listeners.append(
+                lambda result: metrics.observe_hook(
+                    result.module,
+                    result.hook,
+                    result.event,
+                    result.duration,
+                    failed=result.status in ("failed", "timeout"),
+                )
+            )
+            metrics.collectors.append(self._collect_pool_metrics)
+            metrics.collectors.append(self._collect_admission_metrics)
+            metrics.collectors.append(self._collect_deadline_metrics)
+            self.app.router.on_startup.append(self.metrics.start)
+            self.app.router.on_shutdown.append(self.metrics.stop)
+            self.app.add_api_route(
+                metrics_path,
+                endpoint=self.call_metrics,
+                name="LogicLayer metrics",
+                include_in_schema=False,
+                response_class=PlainTextResponse,
+            )
+
+        if openapi is not None and self.app.openapi_url:
+            self.openapi = OpenAPICache(self, openapi)
+            route = Route(self.app.openapi_url, self.openapi.endpoint, include_in_schema=False)
+            routes = self.app.router.routes
+            for index, item in enumerate(routes):
+                if isinstance(item, Route) and item.path == self.app.openapi_url:
+                    routes[index] = route
+                    break
+            else:
+                routes.append(route)
+            if openapi.eager:
+                self.app.router.on_startup.append(self.openapi.startup)
+
+        if batch is not None:
+            self.batch = BatchRunner(self, batch)
+            self.app.add_api_route(
+                batch.path,
+                endpoint=self.call_batch,
+                methods=["POST"],
+                name="LogicLayer batch",
+                include_in_schema=False,
+            )
+
+        if debug:
+            self.profiler = Profiler()
+            self.app.add_api_route(
+                "/_debug/profile",
+                endpoint=self.call_profiler,
+                name="LogicLayer profiler",
+                include_in_schema=False,
+                response_model=ProfileReport,
+            )
+            self.app.add_api_route(
+                "/_debug/memoize",
+                endpoint=self.call_memo_stats,
+                name="LogicLayer memoize stats",
+                include_in_schema=False,
+            )
+            self.app.add_api_route(
+                "/_debug/memoize/invalidate",
+                endpoint=self.call_memo_invalidate,
+                methods=["POST"],
+                name="LogicLayer memoize invalidate",
+                include_in_schema=False,
+            )
+
+        if tracing is not None:
+            self.tracer = Tracer(tracing)
+            self.app.router.on_shutdown.append(self.tracer.close)
+            if debug:
+                self.app.add_api_route(
+                    tracing.path,
+                    endpoint=self.call_traces,
+                    name="LogicLayer traces",
+                    include_in_schema=False,
+                )
+
+        if healthcheck_interval is not None:
+            self.scheduler = HealthcheckScheduler(self.healthchecks, interval=healthcheck_interval)
+            self.app.router.on_startup.append(self.scheduler.start)
+            self.app.router.on_shutdown.append(self.scheduler.stop)
 
         if healthchecks:
             self.app.add_api_route(
@@ -46,44 +288,186 @@ class LogicLayer:
                 name="LogicLayer healthcheck",
                 status_code=HTTP_204_NO_CONTENT,
             )
+            self.app.add_api_route(
+                "/_health/details",
+                endpoint=self.healthcheck_details,
+                name="LogicLayer healthcheck details",
+                response_model=list[CheckStatus],
+            )
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Enable the :class:`LogicLayer` instance into an ASGI-compatible callable."""
-        await self.app(scope, receive, send)
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+        elif self.tracer is not None:
+            await self.tracer.handle(self._call_app, scope, receive, send)
+        else:
+            await self._call_app(scope, receive, send)
+
+    async def _call_app(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Call the app for an HTTP request, recording its metrics if enabled."""
+        metrics = self.metrics
+        if metrics is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
 
-    def add_check(self, func: CallableMayReturnCoroutine[[], bool]) -> None:
+        metrics.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.in_flight.dec()
+            metrics.observe_request(scope, status, elapsed)
+
+    def add_check(
+        self,
+        func: CallableMayReturnCoroutine[[], bool],
+        *,
+        interval: float | None = None,
+        timeout: float | None = None,
+    ) -> None:
         """Store a function to be constantly run as a healthcheck for the app.
 
         Arguments:
             func :Callable[..., Coroutine[Any, Any, Response]]:
 
+        Keyword Arguments:
+            interval :float | None:
+                Seconds between runs of this check, when the healthchecks are
+                scheduled to run in the background.
+            timeout :float | None:
+                Seconds the check can take before being considered failed.
+                Defaults to the `healthcheck_timeout` of the app.
+
         """
         logger.debug("Check added: %s", func.__name__)
-        self.healthchecks.append(func)
+        check = Healthcheck(
+            func,
+            interval=interval,
+            timeout=self.healthcheck_timeout if timeout is None else timeout,
+        )
+        if self.metrics is not None:
+            metrics = self.metrics
+            check.listeners.append(
+                lambda status: metrics.observe_check(
+                    status.name, bool(status.healthy), status.latency or 0
+                )
+            )
+        self.healthchecks.append(check)
 
-    def add_module(self, prefix: str, module: LogicLayerModule, **kwargs) -> None:
+    def add_module(
+        self,
+        prefix: str,
+        module: LogicLayerModule | LazyModule,
+        *,
+        admission: AdmissionPolicy | None = None,
+        deadline: float | None = None,
+        depends_on: Sequence[str] = (),
+        executor: ExecutorConfig | None = None,
+        **kwargs,
+    ) -> None:
         """Configure a module instance in the current LogicLayer instance.
 
         Arguments:
             prefix :str:
                 The prefix path to all routes in the module.
                 Must start, and not end, with `/`.
-            module :logiclayer.LogicLayerModule:
-                An instance of a subclass of :class:`logiclayer.LogicLayerModule`.
+            module :logiclayer.LogicLayerModule | logiclayer.LazyModule:
+                An instance of a subclass of :class:`logiclayer.LogicLayerModule`,
+                or the description of a module to be instantiated when needed.
 
         Keyword Arguments:
+            admission :logiclayer.AdmissionPolicy | None:
+                Limits the amount of requests handled at the same time by all
+                the routes of the module.
+            deadline :float | None:
+                Limits the seconds each route of the module can take, unless the
+                route sets its own deadline. Async routes are also cancelled
+                when the client disconnects.
+            depends_on :Sequence[str]:
+                Names of the modules whose startup handlers must complete
+                before the ones of this module run. On shutdown, the order is
+                reversed. Modules without dependencies start concurrently.
+                Not supported for lazy modules.
+            executor :logiclayer.ExecutorConfig | None:
+                Configures a dedicated executor for the synchronous routes,
+                event handlers and healthchecks of the module.
             {any from :func:`FastAPI.include_router` function}
 
         """
+        if self.openapi is not None:
+            self.openapi.invalidate()
+
+        if isinstance(module, LazyModule):
+            if depends_on:
+                msg = "Lazy modules can't declare dependencies on other modules."
+                raise LogicLayerException(msg)
+            loader = ModuleLoader(
+                self,
+                module,
+                prefix=prefix,
+                admission=admission,
+                deadline=deadline,
+                executor=executor,
+            )
+            logger.debug("Lazy module added on path %s: %s", prefix, loader.name)
+            self.loaders[prefix] = loader
+            loader.include(prefix=prefix, **kwargs)
+            return
+
         logger.debug("Module added on path %s: %s", prefix, module.name)
-        module.include_into(self, prefix=prefix, **kwargs)
+        if admission is not None:
+            module.set_admission(admission)
+        if deadline is not None:
+            module.set_deadline(deadline)
+        if executor is not None:
+            module.set_executor(executor)
+        self.modules[prefix] = module
+        module.include_into(self, depends_on=depends_on, prefix=prefix, **kwargs)
+
+    def add_resource(self, name: str, pool: T_Pool) -> T_Pool:
+        """Declare a pool of resources shared by the modules of the app.
+
+        The pool is opened when the app starts and closed when it stops. Modules
+        can receive it in their constructors, with `layer.resources[name]` or a
+        :class:`logiclayer.ResourceRef` for lazy modules, or check out a
+        resource in their routes with :func:`logiclayer.resource`.
+
+        Arguments:
+            name :str:
+                The name to refer to the pool.
+            pool :logiclayer.ResourcePool | logiclayer.SharedResource:
+                The pool.
+
+        """
+        logger.debug("Resource pool added: %s", name)
+        self.resources.add(name, pool)
+        if self.metrics is not None:
+            pool.listeners.append(self.metrics.observe_checkout)
+        return pool
 
     def add_redirect(self, path: str, url: str, **kwargs) -> None:
         """Configure a route with the sole purpose of redirecting the user to another location."""
         logger.debug("Redirect added on path %s", path)
         self.app.add_api_route(path, lambda: url, response_class=RedirectResponse, **kwargs)
 
-    def add_route(self, path: str, endpoint: CallableMayReturnCoroutine[[], Any], **kwargs) -> None:
+    def add_route(
+        self,
+        path: str,
+        endpoint: CallableMayReturnCoroutine[[], Any],
+        *,
+        coalesce: bool = False,
+        **kwargs,
+    ) -> None:
         """Configure a path function to be used directly in the root app.
 
         Arguments:
@@ -92,11 +476,29 @@ class LogicLayer:
             func :Callable[..., Response] | Callable[..., Coroutine[Any, Any, Response]]:
                 The function which will serve the content for the route.
 
+        Keyword Arguments:
+            coalesce :bool:
+                Makes concurrent identical requests to this route share a single
+                execution of the function.
+            {any from :func:`FastAPI.add_api_route` function}
+
         """
         logger.debug("Route added on path %s: %s", path, endpoint.__name__)
+        if self.openapi is not None:
+            self.openapi.invalidate()
+        if coalesce:
+            handler = coalesced_handler(_call_handler(endpoint), self.flight, namespace=path)
+            endpoint = _endpoint_from_handler(endpoint, handler)
         self.app.add_api_route(path, endpoint, **kwargs)
 
-    def add_static(self, path: str, target: str | Path, *, html: bool = False) -> None:
+    def add_static(
+        self,
+        path: str,
+        target: str | Path,
+        *,
+        html: bool = False,
+        config: StaticConfig | None = None,
+    ) -> None:
         """Configure a static folder to serve the files inside it.
 
         Arguments:
@@ -109,11 +511,100 @@ class LogicLayer:
             html :bool:
                 HTML mode. Looks for an index.html file when the requested path
                 is a directory, and serves it automatically.
+            config :logiclayer.StaticConfig | None:
+                If set, the folder is indexed when the app starts: the files
+                get strong ETags and gzip variants, and the small ones are
+                served from memory.
 
         """
         target = (Path(target) if isinstance(target, str) else target).resolve()
-        logger.debug("Static folder added on path %s")
-        self.app.mount(path, StaticFiles(directory=target, html=html))
+        logger.debug("Static folder added on path %s", path)
+        if config is None:
+            self.app.mount(path, StaticFiles(directory=target, html=html))
+            return
+
+        static = IndexedStaticFiles(directory=target, html=html, config=config)
+        self.app.router.on_startup.append(static.startup)
+        self.app.router.on_shutdown.append(static.shutdown)
+        self.app.mount(path, static)
+
+    def admission_stats(self) -> dict[str, AdmissionStats]:
+        """Return the admission counters of the modules and routes with limits."""
+        stats = {}
+        for module in self.modules.values():
+            stats.update(module.admission_stats())
+        return stats
+
+    def deadline_stats(self) -> dict[str, DeadlineStats]:
+        """Return the counters of the routes with a deadline, including the
+        requests aborted by timeout or disconnection."""
+        stats = {}
+        for module in self.modules.values():
+            stats.update(module.deadline_stats())
+        return stats
+
+    def memo_stats(self) -> dict[str, CacheStats]:
+        """Return the counters of the memoized methods of the modules, keyed by
+        module name and method name."""
+        return {
+            f"{module.name}:{method}": stats
+            for module in self.modules.values()
+            for method, stats in module.memo_stats().items()
+        }
+
+    def invalidate(self, tag: str | None = None, *, module: str | None = None) -> int:
+        """Discard the results of the memoized methods with `tag`, or all of
+        them if `tag` is `None`, optionally only for the module with prefix or
+        name `module`.
+
+        Only affects the current process. Returns the amount of results
+        discarded.
+        """
+        return sum(
+            item.invalidate(tag)
+            for prefix, item in self.modules.items()
+            if module is None or module in (prefix, item.name)
+        )
+
+    def executor_stats(self) -> dict[str, ExecutorStats]:
+        """Return the load counters of the dedicated executor of each module."""
+        return {
+            prefix: module.executor.stats
+            for prefix, module in self.modules.items()
+            if module.executor is not None
+        }
+
+    def _collect_pool_metrics(self) -> None:
+        assert self.metrics is not None
+        for name, stats in self.resources.stats().items():
+            self.metrics.observe_pool(
+                name,
+                in_use=stats.in_use,
+                idle=stats.idle,
+                waiting=stats.waiting,
+                timeouts=stats.timeouts,
+            )
+
+    def _collect_admission_metrics(self) -> None:
+        assert self.metrics is not None
+        for scope, stats in self.admission_stats().items():
+            self.metrics.observe_admission(
+                scope,
+                active=stats.active,
+                queued=stats.queued,
+                admitted=stats.admitted,
+                bypassed=stats.bypassed,
+                rejected=stats.rejected,
+            )
+
+    def _collect_deadline_metrics(self) -> None:
+        assert self.metrics is not None
+        for scope, stats in self.deadline_stats().items():
+            self.metrics.observe_aborted(
+                scope,
+                timeouts=stats.timeouts,
+                disconnects=stats.disconnects,
+            )
 
     async def call_startup(self) -> None:
         """Force a call to all handlers registered for the 'startup' event."""
@@ -123,16 +614,115 @@ class LogicLayer:
         """Force a call to all handlers registered for the 'shutdown' event."""
         await self.app.router.shutdown()
 
+    async def call_batch(self, request: Request, items: list[BatchItem]) -> Response:
+        """Handle a list of requests to the routes of the app concurrently.
+
+        Each request is authorized with its own headers, or the credentials of
+        the batch request, and the results are sent as NDJSON lines, in the
+        order they complete, each one with the `index` of its request.
+        """
+        assert self.batch is not None
+        return await self.batch(request, items)
+
     async def call_healthchecks(self) -> Response:
-        """Force a call to all healthchecks registered."""
+        """Retrieve the status of all healthchecks registered.
+
+        If the healthchecks are scheduled in the background, the result of their
+        last run is used. Otherwise, all the healthchecks are run at this point.
+        """
+        statuses = await self._healthcheck_statuses()
+        if not all(item.healthy or item.degraded for item in statuses):
+            raise HTTPException(500, "One of the healthchecks failed.")
+        return Response(status_code=HTTP_204_NO_CONTENT)
+
+    async def call_metrics(self) -> Response:
+        """Render the metrics of the app in the Prometheus text format."""
+        assert self.metrics is not None
+        return PlainTextResponse(
+            self.metrics.render(),
+            media_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+    async def call_profiler(
+        self,
+        module: Optional[str] = None,
+        route: Optional[str] = None,
+        seconds: float = 10.0,
+        requests: Optional[int] = None,
+        interval: float = 0.005,
+        memory: bool = True,
+        format: Literal["json", "collapsed"] = "json",
+    ) -> Any:
+        """Profile the routes of the modules in debug mode while they handle requests.
+
+        The response is sent when the session ends, after `seconds`, or after
+        the amount of `requests` to the selected routes.
+        """
+        assert self.profiler is not None
         try:
-            gen = (_await_for_it(item) for item in self.healthchecks)
-            await asyncio.gather(*gen)
-        except Exception as exc:
-            logger.exception("Healthcheck failure", exc_info=exc)
-            raise HTTPException(500, "One of the healthchecks failed.") from exc
+            report = await self.profiler.profile(
+                module=module,
+                route=route,
+                seconds=seconds,
+                requests=requests,
+                interval=interval,
+                memory=memory,
+            )
+        except ProfilerBusy as exc:
+            raise HTTPException(409, exc.message) from exc
+        except LogicLayerException as exc:
+            raise HTTPException(404, exc.message) from exc
+        if format == "collapsed":
+            return PlainTextResponse(report.collapsed())
+        return report
+
+    async def call_memo_stats(self) -> dict[str, dict[str, Any]]:
+        """Retrieve the counters and hit ratio of each memoized method called."""
+        return {
+            scope: {**dcls.asdict(stats), "hit_ratio": stats.hit_ratio}
+            for scope, stats in self.memo_stats().items()
+        }
+
+    async def call_memo_invalidate(
+        self,
+        tag: Optional[str] = None,
+        module: Optional[str] = None,
+    ) -> dict[str, int]:
+        """Discard the results of the memoized methods with `tag`, or all of
+        them, for example after the data of the modules is updated."""
+        if module is not None and not any(
+            module in (prefix, item.name) for prefix, item in self.modules.items()
+        ):
+            raise HTTPException(404, f"Module '{module}' not found")
+        return {"invalidated": self.invalidate(tag, module=module)}
+
+    async def call_traces(
+        self,
+        limit: int = 50,
+        path: Optional[str] = None,
+        min_duration: Optional[float] = None,
+    ) -> list[dict[str, Any]]:
+        """Retrieve the most recent traces kept, optionally filtered.
+
+        Durations are expressed in milliseconds.
+        """
+        assert self.tracer is not None
+        return self.tracer.traces(limit=limit, path=path, min_duration=min_duration)
+
+    async def healthcheck_details(self, response: Response) -> list[CheckStatus]:
+        """Retrieve the status, latency and last failure of each healthcheck."""
+        statuses = await self._healthcheck_statuses()
+        if not all(item.healthy or item.degraded for item in statuses):
+            response.status_code = HTTP_500_INTERNAL_SERVER_ERROR
+        return statuses
+
+    async def _healthcheck_statuses(self) -> list[CheckStatus]:
+        if self.scheduler is not None and self.scheduler.running:
+            await self.scheduler.wait_ready()
+            statuses = self.scheduler.statuses
         else:
-            return Response(status_code=HTTP_204_NO_CONTENT)
+            statuses = await run_healthchecks(self.healthchecks)
+        return [*statuses, *self.lifecycle.statuses()]
 
     def healthcheck(
         self,
@@ -150,3 +740,23 @@ class LogicLayer:
             return fn
 
         return route_decorator
+
+
+def _saturated_handler(request: Request, exc: Exception) -> Response:
+    """Answer requests rejected due to an overloaded module, executor, resource
+    pool or job queue."""
+    return JSONResponse(
+        {"detail": str(exc)},
+        status_code=HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(getattr(exc, "retry_after", 1))},
+    )
+
+
+def _unavailable_handler(request: Request, exc: Exception) -> Response:
+    """Answer requests to a module which failed to start."""
+    return JSONResponse({"detail": str(exc)}, status_code=HTTP_503_SERVICE_UNAVAILABLE)
+
+
+def _deadline_handler(request: Request, exc: Exception) -> Response:
+    """Answer requests which didn't complete before their deadline."""
+    return JSONResponse({"detail": str(exc)}, status_code=HTTP_504_GATEWAY_TIMEOUT)
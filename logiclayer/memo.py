@@ -0,0 +1,243 @@
+"""Memoization module.
+
+Contains the definitions to keep the results of the helper methods of a module,
+like loading a schema or building a lookup table, instead of computing them on
+each call. Results are bounded by amount and age, concurrent calls with the
+same arguments share a single execution, and the results can be invalidated
+by tag, for example after the data of the module is updated.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import threading
+import time
+import types
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
+
+from .cache import MISSING, CacheStats
+
+if TYPE_CHECKING:
+    from .module import ModuleMethod
+
+MemoTags = Union[Iterable[str], Callable[..., Iterable[str]]]
+
+
+class Memo:
+    """Keeps the results of a method of a module instance.
+
+    Arguments:
+        func :Callable[..., Any]:
+            The bound method, sync or async.
+
+    Keyword Arguments:
+        name :str:
+            Name of the method, used in the stats.
+        max_entries :int | None:
+            Maximum amount of results kept; the least recently used is
+            discarded first.
+        ttl :float | None:
+            Seconds a result is valid.
+        tags :Iterable[str] | Callable[..., Iterable[str]]:
+            Tags of the results, to invalidate them with :meth:`invalidate`. A
+            callable receives the arguments of the call and returns the tags of
+            its result.
+        key :Callable[..., Hashable] | None:
+            Builds the key of a call from its arguments. By default, the
+            arguments themselves are the key, bound to the signature of `func`
+            so passing them by position or by name gives the same key; calls
+            with unhashable arguments are not memoized.
+
+    """
+
+    def __init__(
+        self,
+        func: Callable[..., Any],
+        *,
+        name: str,
+        max_entries: Optional[int] = 128,
+        ttl: Optional[float] = None,
+        tags: MemoTags = (),
+        key: Optional[Callable[..., Hashable]] = None,
+    ) -> None:
+        self.func = func
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.tags = tags if callable(tags) else frozenset(tags)
+        self.key = key
+        self.is_async = asyncio.iscoroutinefunction(func)
+        self.signature = inspect.signature(func)
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._store: OrderedDict[Hashable, tuple[Any, float, frozenset[str]]] = OrderedDict()
+        self._generation = 0
+        self._calls: dict[Hashable, asyncio.Future[Any]] = {}
+        self._pending: dict[Hashable, threading.Event] = {}
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def _make_key(self, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Optional[Hashable]:
+        if self.key is not None:
+            key = self.key(*args, **kwargs)
+        else:
+            try:
+                bound = self.signature.bind(*args, **kwargs)
+            except TypeError:
+                # the call itself will raise the error
+                return None
+            bound.apply_defaults()
+            key = (bound.args, tuple(bound.kwargs.items()))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _entry_tags(self, args: tuple[Any, ...], kwargs: dict[str, Any]) -> frozenset[str]:
+        if callable(self.tags):
+            return frozenset(self.tags(*args, **kwargs))
+        return self.tags
+
+    def _lookup(self, key: Hashable, *, count: bool = True) -> Any:
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._store[key]
+                self.stats.entries = len(self._store)
+                entry = None
+            if entry is None:
+                if count:
+                    self.stats.misses += 1
+                return MISSING
+            self._store.move_to_end(key)
+            self.stats.hits += 1
+            return entry[0]
+
+    def _save(self, key: Hashable, value: Any, tags: frozenset[str], generation: int) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        with self._lock:
+            # the results computed before an invalidation are outdated
+            if generation != self._generation:
+                return
+            self._store[key] = (value, expires, tags)
+            self._store.move_to_end(key)
+            while self.max_entries is not None and len(self._store) > self.max_entries:
+                self._store.popitem(last=False)
+                self.stats.evictions += 1
+            self.stats.entries = len(self._store)
+
+    def call(self, *args: Any, **kwargs: Any) -> Any:
+        """Call a sync method, or return its result for the same arguments."""
+        key = self._make_key(args, kwargs)
+        if key is None:
+            self.stats.misses += 1
+            return self.func(*args, **kwargs)
+        value = self._lookup(key)
+        if value is not MISSING:
+            return value
+
+        with self._lock:
+            event = self._pending.get(key)
+            owner = event is None
+            if owner:
+                event = self._pending[key] = threading.Event()
+        if not owner:
+            # another thread is computing the same result
+            event.wait()
+            value = self._lookup(key, count=False)
+            if value is not MISSING:
+                return value
+
+        try:
+            generation = self._generation
+            value = self.func(*args, **kwargs)
+            self._save(key, value, self._entry_tags(args, kwargs), generation)
+            return value
+        finally:
+            if owner:
+                with self._lock:
+                    self._pending.pop(key, None)
+                event.set()
+
+    async def acall(self, *args: Any, **kwargs: Any) -> Any:
+        """Call an async method, or return its result for the same arguments."""
+        key = self._make_key(args, kwargs)
+        if key is None:
+            self.stats.misses += 1
+            return await self.func(*args, **kwargs)
+        value = self._lookup(key)
+        if value is not MISSING:
+            return value
+
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._compute(key, args, kwargs))
+            self._calls[key] = future
+            future.add_done_callback(functools.partial(self._forget, key))
+        # a cancelled caller must not cancel the execution for the others
+        return await asyncio.shield(future)
+
+    async def _compute(self, key: Hashable, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+        generation = self._generation
+        value = await self.func(*args, **kwargs)
+        self._save(key, value, self._entry_tags(args, kwargs), generation)
+        return value
+
+    def _forget(self, key: Hashable, future: asyncio.Future[Any]) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.cancelled():
+            # mark the exception as retrieved if all callers were cancelled
+            future.exception()
+
+    def invalidate(self, tag: Optional[str] = None) -> int:
+        """Discard the results with `tag`, or all of them if `tag` is `None`.
+
+        Returns the amount of results discarded.
+        """
+        with self._lock:
+            self._generation += 1
+            if tag is None:
+                count = len(self._store)
+                self._store.clear()
+            else:
+                keys = [key for key, entry in self._store.items() if tag in entry[2]]
+                for key in keys:
+                    del self._store[key]
+                count = len(keys)
+            self.stats.entries = len(self._store)
+            return count
+
+
+class MemoizedMethod:
+    """Descriptor which replaces a memoized method in the class of a module.
+
+    Each instance of the module gets its own :class:`Memo`, kept in its `memos`
+    attribute.
+    """
+
+    def __init__(self, method: ModuleMethod) -> None:
+        self.method = method
+        self.name = method.func.__name__
+        functools.update_wrapper(self, method.func)
+
+    def __get__(self, instance: Any, owner: Optional[type] = None) -> Any:
+        if instance is None:
+            return self
+        memo = self.memo(instance)
+        return memo.acall if memo.is_async else memo.call
+
+    def memo(self, instance: Any) -> Memo:
+        """Retrieve the :class:`Memo` of this method for a module instance."""
+        memos: dict[str, Memo] = vars(instance).setdefault("memos", {})
+        memo = memos.get(self.name)
+        if memo is None:
+            func = types.MethodType(self.method.func, instance)
+            memo = memos.setdefault(self.name, Memo(func, name=self.name, **self.method.kwargs))
+        return memo
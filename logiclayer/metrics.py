@@ -0,0 +1,512 @@
+"""Metrics module.
+
+Contains a small, low-overhead metrics registry for LogicLayer instances, and
+its rendering in the Prometheus text exposition format.
+
+When a directory is provided, each worker process periodically writes a
+snapshot of its metrics in it, and the exposition aggregates the snapshots of
+all the workers, so any worker can answer for the whole server. The snapshots
+of workers which are not running anymore are removed, and their counters and
+histograms are carried on by the worker which found them; their gauges are
+discarded.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+from bisect import bisect_left
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+logger = logging.getLogger("logiclayer.metrics")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = tuple[str, ...]
+
+_STATUS_CODES = {code: str(code) for code in range(100, 600)}
+
+
+class Metric:
+    """Base class for a metric family with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: dict[LabelValues, Any] = {}
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "documentation": self.documentation,
+            "labelnames": list(self.labelnames),
+            "values": [[list(labels), value] for labels, value in self.values.items()],
+        }
+
+    def merge(self, values: Iterable[tuple[Sequence[str], Any]]) -> None:
+        """Add the values of the same metric from another process."""
+        for labels, value in values:
+            key = tuple(labels)
+            self.values[key] = self.values.get(key, 0.0) + value
+
+    def samples(self) -> Iterable[tuple[str, LabelValues, tuple[tuple[str, str], ...], float]]:
+        for labels, value in self.values.items():
+            yield self.name, labels, (), value
+
+
+class Counter(Metric):
+    """A value which only increases."""
+
+    kind = "counter"
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        values = self.values
+        values[labels] = values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    """A value which can increase and decrease."""
+
+    kind = "gauge"
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        values = self.values
+        values[labels] = values.get(labels, 0.0) + amount
+
+    def dec(self, labels: LabelValues = (), amount: float = 1.0) -> None:
+        values = self.values
+        values[labels] = values.get(labels, 0.0) - amount
+
+    def set(self, labels: LabelValues = (), value: float = 0.0) -> None:
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    """Counts observations in fixed buckets, and keeps their sum and count.
+
+    For each set of labels, the values are stored as a list with the count of
+    each bucket (not cumulative, the last one being +Inf), the sum, and the
+    count of observations.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels: LabelValues, value: float) -> None:
+        data = self.values.get(labels)
+        if data is None:
+            data = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        data[bisect_left(self.buckets, value)] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+    def merge(self, values: Iterable[tuple[Sequence[str], Any]]) -> None:
+        size = len(self.buckets) + 3
+        for labels, data in values:
+            if len(data) != size:
+                continue
+            current = self.values.setdefault(tuple(labels), [0] * size)
+            for index, value in enumerate(data):
+                current[index] += value
+
+    def samples(self) -> Iterable[tuple[str, LabelValues, tuple[tuple[str, str], ...], float]]:
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, data in self.values.items():
+            cumulative = 0
+            for bound, count in zip(bounds, data):
+                cumulative += count
+                yield f"{self.name}_bucket", labels, (("le", bound),), cumulative
+            yield f"{self.name}_sum", labels, (), data[-2]
+            yield f"{self.name}_count", labels, (), data[-1]
+
+
+class MetricsRegistry:
+    """Keeps the metrics of a LogicLayer instance.
+
+    Arguments:
+        directory :str | Path | None:
+            A directory shared by all the worker processes of the server on the
+            same host, where each worker stores the snapshots of its metrics.
+            The workers must see each other's process ids, to tell which
+            snapshots belong to workers not running anymore.
+        interval :float:
+            Seconds between each snapshot written to the directory.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        directory: Union[str, Path, None] = None,
+        interval: float = 5.0,
+    ) -> None:
+        self.directory = None if directory is None else Path(directory)
+        self.interval = interval
+        self.metrics: dict[str, Metric] = {}
+        self.route_labels: dict[Callable[..., Any], tuple[str, str]] = {}
+        self.collectors: list[Callable[[], None]] = []
+        self._inherited: dict[str, Metric] = {}
+        self._task: Optional[asyncio.Task[None]] = None
+
+        self.requests = self.counter(
+            "logiclayer_requests_total",
+            "Total requests handled, by module, route and status code.",
+            ("module", "route", "status"),
+        )
+        self.latency = self.histogram(
+            "logiclayer_request_duration_seconds",
+            "Time spent handling requests, by module and route.",
+            ("module", "route"),
+        )
+        self.in_flight = self.gauge(
+            "logiclayer_requests_in_flight",
+            "Requests currently being handled.",
+        )
+        self.checks = self.histogram(
+            "logiclayer_healthcheck_duration_seconds",
+            "Time spent running healthchecks, by check and result.",
+            ("check", "healthy"),
+        )
+        self.hooks = self.histogram(
+            "logiclayer_hook_duration_seconds",
+            "Time spent running startup/shutdown handlers.",
+            ("module", "hook", "event"),
+            buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0),
+        )
+        self.hook_failures = self.counter(
+            "logiclayer_hook_failures_total",
+            "Startup/shutdown handlers which raised an exception.",
+            ("module", "hook", "event"),
+        )
+        self.pool_wait = self.histogram(
+            "logiclayer_pool_wait_seconds",
+            "Time spent waiting to check out a resource from a pool.",
+            ("pool",),
+            buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+        )
+        self.pool_size = self.gauge(
+            "logiclayer_pool_resources",
+            "Resources currently open in a pool, by state.",
+            ("pool", "state"),
+        )
+        self.pool_timeouts = self.counter(
+            "logiclayer_pool_timeouts_total",
+            "Checkouts from a pool which timed out.",
+            ("pool",),
+        )
+        self.admission = self.gauge(
+            "logiclayer_admission_requests",
+            "Requests currently admitted or waiting, by module or route.",
+            ("scope", "state"),
+        )
+        self.admission_total = self.counter(
+            "logiclayer_admission_total",
+            "Requests checked by an admission limit, by module or route and outcome.",
+            ("scope", "outcome"),
+        )
+        self.aborted = self.counter(
+            "logiclayer_aborted_total",
+            "Requests whose work was aborted, by route and reason.",
+            ("scope", "reason"),
+        )
+
+    @property
+    def filename(self) -> Optional[Path]:
+        if self.directory is None:
+            return None
+        return self.directory / f"logiclayer-metrics-{os.getpid()}.json"
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create and register a new counter."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Create and register a new gauge."""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Create and register a new histogram."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric: Any) -> Any:
+        if metric.name in self.metrics:
+            msg = f"Metric '{metric.name}' is already registered"
+            raise ValueError(msg)
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add_route(self, endpoint: Callable[..., Any], module: str, path: str) -> None:
+        """Register the labels for the endpoint of a module route.
+
+        The route is reported in the metrics before receiving any request.
+        """
+        self.route_labels[endpoint] = (module, path)
+        size = len(self.latency.buckets) + 1
+        self.latency.values.setdefault((module, path), [0] * size + [0.0, 0])
+
+    def observe_request(self, scope: dict[str, Any], status: int, elapsed: float) -> None:
+        """Record a request handled by the app, using the route matched in the scope."""
+        labels = self.route_labels.get(scope.get("endpoint"))  # type: ignore[arg-type]
+        if labels is None:
+            route = scope.get("route")
+            labels = ("", getattr(route, "path", "<unmatched>"))
+        code = _STATUS_CODES.get(status) or str(status)
+        self.requests.inc((*labels, code))
+        self.latency.observe(labels, elapsed)
+
+    def observe_check(self, name: str, healthy: bool, elapsed: float) -> None:
+        """Record the run of a healthcheck."""
+        self.checks.observe((name, "true" if healthy else "false"), elapsed)
+
+    def observe_hook(
+        self,
+        module: str,
+        hook: str,
+        event: str,
+        elapsed: float,
+        failed: bool = False,
+    ) -> None:
+        """Record the run of a startup/shutdown handler."""
+        labels = (module, hook, event)
+        self.hooks.observe(labels, elapsed)
+        if failed:
+            self.hook_failures.inc(labels)
+
+    def observe_checkout(self, pool: str, elapsed: float) -> None:
+        """Record the time waited to check out a resource from a pool."""
+        self.pool_wait.observe((pool,), elapsed)
+
+    def observe_pool(
+        self,
+        pool: str,
+        *,
+        in_use: int,
+        idle: int,
+        waiting: int,
+        timeouts: int,
+    ) -> None:
+        """Update the current state of a pool."""
+        self.pool_size.set((pool, "in_use"), in_use)
+        self.pool_size.set((pool, "idle"), idle)
+        self.pool_size.set((pool, "waiting"), waiting)
+        self.pool_timeouts.values[(pool,)] = timeouts
+
+    def observe_admission(
+        self,
+        scope: str,
+        *,
+        active: int,
+        queued: int,
+        admitted: int,
+        bypassed: int,
+        rejected: int,
+    ) -> None:
+        """Update the state and counters of an admission limit."""
+        self.admission.set((scope, "active"), active)
+        self.admission.set((scope, "queued"), queued)
+        values = self.admission_total.values
+        values[(scope, "admitted")] = admitted
+        values[(scope, "bypassed")] = bypassed
+        values[(scope, "rejected")] = rejected
+
+    def observe_aborted(self, scope: str, *, timeouts: int, disconnects: int) -> None:
+        """Update the counters of the requests aborted in a route with a deadline."""
+        values = self.aborted.values
+        values[(scope, "timeout")] = timeouts
+        values[(scope, "disconnect")] = disconnects
+
+    def _run_collectors(self) -> None:
+        for collector in self.collectors:
+            collector()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the current values of all metrics in a serializable object."""
+        self._run_collectors()
+        snapshot = {name: metric.snapshot() for name, metric in self.metrics.items()}
+        for name, metric in self._inherited.items():
+            item = metric.snapshot()
+            if name in snapshot:
+                # merging the values of a snapshot adds the repeated labels
+                snapshot[name]["values"].extend(item["values"])
+            else:
+                snapshot[name] = item
+        return snapshot
+
+    def dump(self) -> None:
+        """Write the snapshot of this process to the shared directory."""
+        filename = self.filename
+        if filename is None:
+            return
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        temp = filename.with_suffix(".tmp")
+        temp.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+        os.replace(temp, filename)
+
+    def collect(self) -> dict[str, Metric]:
+        """Return the metrics of this process, merged with the other workers."""
+        if self.directory is None:
+            self._run_collectors()
+            return self.metrics
+
+        self._adopt_snapshots()
+        self.dump()
+        merged: dict[str, Metric] = {}
+        for path in sorted(self.directory.glob("logiclayer-metrics-*.json")):
+            try:
+                snapshot = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            for name, item in snapshot.items():
+                metric = merged.get(name)
+                if metric is None:
+                    metric = merged[name] = _metric_from_snapshot(name, item)
+                metric.merge(item["values"])
+        return merged
+
+    def _adopt_snapshots(self) -> None:
+        """Take the counters and histograms of the snapshots of the workers not
+        running anymore, and remove their files."""
+        assert self.directory is not None
+        pid = os.getpid()
+        for path in self.directory.glob("logiclayer-metrics-*.json"):
+            owner = _snapshot_pid(path)
+            if owner is None or owner == pid or _pid_alive(owner):
+                continue
+            # renaming the file ensures a single worker takes its values
+            claimed = path.with_name(f"{path.name}.{pid}.claimed")
+            try:
+                path.rename(claimed)
+            except OSError:
+                continue
+            try:
+                snapshot = json.loads(claimed.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                snapshot = {}
+            finally:
+                claimed.unlink(missing_ok=True)
+
+            logger.debug("Metrics of finished worker %d adopted by worker %d", owner, pid)
+            for name, item in snapshot.items():
+                if item["kind"] == "gauge":
+                    continue
+                metric = self._inherited.get(name)
+                if metric is None:
+                    metric = self._inherited[name] = _metric_from_snapshot(name, item)
+                metric.merge(item["values"])
+
+    def render(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        lines: list[str] = []
+        for metric in self.collect().values():
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            labelnames = metric.labelnames
+            for name, labels, extra, value in metric.samples():
+                pairs = [*zip(labelnames, labels), *extra]
+                if pairs:
+                    text = ",".join(f'{key}="{_escape_label(val)}"' for key, val in pairs)
+                    lines.append(f"{name}{{{text}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{name} {_format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+    async def start(self) -> None:
+        """Start writing snapshots periodically, if a directory was provided."""
+        if self.directory is None or self._task is not None:
+            return
+
+        async def loop() -> None:
+            while True:
+                await asyncio.sleep(self.interval)
+                try:
+                    self.dump()
+                except OSError:
+                    logger.exception("Failed to write metrics snapshot")
+
+        self._task = asyncio.create_task(loop())
+
+    async def stop(self) -> None:
+        """Stop the periodic snapshots and write a last one."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        with contextlib.suppress(OSError):
+            self.dump()
+
+
+def _metric_from_snapshot(name: str, item: dict[str, Any]) -> Metric:
+    kind = item["kind"]
+    args = (name, item["documentation"], item["labelnames"])
+    if kind == "histogram":
+        return Histogram(*args, buckets=item["buckets"])
+    if kind == "gauge":
+        return Gauge(*args)
+    return Counter(*args)
+
+
+def _snapshot_pid(path: Path) -> Optional[int]:
+    try:
+        return int(path.stem.rpartition("-")[2])
+    except ValueError:
+        return None
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill terminates the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
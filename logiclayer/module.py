@@ -1,16 +1,47 @@
 from __future__ import annotations
 
+import asyncio
 import dataclasses as dcls
+import inspect
 from collections import defaultdict
-from collections.abc import Generator
+from collections.abc import Generator, Sequence
 from enum import Enum, auto
-from typing import TYPE_CHECKING, Any, Union
+from typing import TYPE_CHECKING, Any, Callable, Literal, Union
 
 from fastapi import APIRouter
 from pydantic import BaseModel, ConfigDict
-
-from .auth import AuthProvider, VoidAuthProvider
-from .common import LOGICLAYER_METHOD_ATTR, CallableMayReturnCoroutine
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from .admission import AdmissionController, AdmissionPolicy, AdmissionStats, admitted_handler
+from .auth import AnyAuthProvider, VoidAuthProvider, parse_token
+from .cache import CacheBackend, CachePolicy, CacheStats, MemoryCache, cached_handler
+from .coalesce import SingleFlight, coalesced_handler
+from .common import (
+    LOGICLAYER_METHOD_ATTR,
+    CallableMayReturnCoroutine,
+    Handler,
+    _await_for_it,
+    _call_handler,
+    _endpoint_from_handler,
+)
+from .deadline import DeadlineStats, deadline_handler
+from .etag import ETagMode, etag_handler
+from .executor import ExecutorConfig, ModuleExecutor
+from .jobs import JobStatus, yield_dependencies
+from .lifecycle import Hook, ModuleHooks, available_handler
+from .memo import Memo, MemoizedMethod
+from .raw import raw_endpoint, raw_parser
+from .responses import (
+    FastJSONResponse,
+    RecordStreamResponse,
+    response_encoder,
+    response_model,
+    serializing_handler,
+    streaming_handler,
+)
+from .tracing import span, traced_exception_handler, traced_handler
 
 if TYPE_CHECKING:
     from .logiclayer import LogicLayer
@@ -21,6 +52,7 @@ class MethodType(Enum):
     EVENT_STARTUP = auto()
     EXCEPTION_HANDLER = auto()
     HEALTHCHECK = auto()
+    MEMOIZED = auto()
     ROUTE = auto()
 
 
@@ -31,6 +63,14 @@ class ModuleMethod:
     debug_only: bool = False
     kwargs: dict[str, Any] = dcls.field(default_factory=dict)
     path: str = ""
+    admission: Union[AdmissionPolicy, None] = None
+    cache: Union[CachePolicy, None] = None
+    coalesce: bool = False
+    deadline: Union[float, None] = None
+    etag: Union[ETagMode, None] = None
+    executor: Literal["thread", "process"] = "thread"
+    mode: Literal["request", "job"] = "request"
+    raw: bool = False
 
     def bound_to(self, instance: LogicLayerModule) -> CallableMayReturnCoroutine[..., Any]:
         """Retrieve the function bound to the LogicLayerModule.
@@ -66,10 +106,14 @@ class ModuleMeta(type):
             except AttributeError:  # noqa: PERF203
                 pass
 
+        for method in methods[MethodType.MEMOIZED]:
+            attrdict[method.func.__name__] = MemoizedMethod(method)
+
         attrdict["_llexceptions"] = {
             item.kwargs["exception"]: item for item in methods[MethodType.EXCEPTION_HANDLER]
         }
         attrdict["_llhealthchecks"] = tuple(methods[MethodType.HEALTHCHECK])
+        attrdict["_llmemoized"] = tuple(methods[MethodType.MEMOIZED])
         attrdict["_llroutes"] = tuple(methods[MethodType.ROUTE])
         attrdict["_llshutdown"] = tuple(methods[MethodType.EVENT_SHUTDOWN])
         attrdict["_llstartup"] = tuple(methods[MethodType.EVENT_STARTUP])
@@ -84,19 +128,74 @@ class LogicLayerModule(metaclass=ModuleMeta):
     Routes can be set using the provided decorators on any instance method.
     """
 
-    auth: AuthProvider
+    #: Identifies the version of the data served by the module, used to tag the
+    #: responses of the routes set with `etag="version"`. Can be overridden
+    #: with a property.
+    data_version: str | None = None
+
+    admission: AdmissionController | None
+    admissions: dict[str, AdmissionController]
+    auth: AnyAuthProvider
+    caches: dict[str, CacheBackend]
+    deadline: float | None
+    deadlines: dict[str, DeadlineStats]
+    executor: ModuleExecutor | None
+    flight: SingleFlight
+    hooks: ModuleHooks | None
+    memos: dict[str, Memo]
+    prefix: str
     router: APIRouter
     _llexceptions: dict[type[Exception], ModuleMethod]
     _llhealthchecks: tuple[ModuleMethod, ...]
+    _llmemoized: tuple[ModuleMethod, ...]
     _llroutes: tuple[ModuleMethod, ...]
     _llshutdown: tuple[ModuleMethod, ...]
     _llstartup: tuple[ModuleMethod, ...]
 
-    def __init__(self, *, auth: AuthProvider | None = None, debug: bool = False, **kwargs):
+    def __init__(
+        self,
+        *,
+        auth: AnyAuthProvider | None = None,
+        cache_backend: CacheBackend | None = None,
+        debug: bool = False,
+        executor: ExecutorConfig | None = None,
+        **kwargs,
+    ):
+        self.admission = None
+        self.admissions = {}
         self.auth = auth or VoidAuthProvider()
+        self.cache_backend = cache_backend
+        self.caches = {}
+        self.deadline = None
+        self.deadlines = {}
         self.debug = debug
+        self.executor = None
+        self.flight = SingleFlight()
+        self.hooks = None
+        self.memos = {}
+        self.prefix = ""
+        if executor is not None:
+            self.set_executor(executor)
         self.router = APIRouter(**kwargs, tags=[self.name])
 
+    def __getstate__(self) -> dict[str, Any]:
+        # the runtime objects are not needed to run the methods in a worker process
+        state = self.__dict__.copy()
+        runtime = (
+            "admission",
+            "admissions",
+            "cache_backend",
+            "caches",
+            "deadlines",
+            "executor",
+            "flight",
+            "hooks",
+            "memos",
+        )
+        for name in (*runtime, "router"):
+            state.pop(name, None)
+        return state
+
     @property
     def name(self) -> str:
         """Return the name of this module."""
@@ -107,27 +206,365 @@ class LogicLayerModule(metaclass=ModuleMeta):
         """Yields the route paths configured in this module."""
         return (item.path for item in self._llroutes)
 
-    def include_into(self, layer: LogicLayer, **kwargs) -> None:
-        """Configure this Module instance into the provided LogicLayer."""
+    def admission_stats(self) -> dict[str, AdmissionStats]:
+        """Return the admission counters of the module and of each limited route.
+
+        The counters of the module are under its name, and the ones of each
+        route under `{module}:{path}`.
+        """
+        stats = {f"{self.name}:{path}": item.stats for path, item in self.admissions.items()}
+        if self.admission is not None:
+            stats[self.name] = self.admission.stats
+        return stats
+
+    def cache_stats(self) -> dict[str, CacheStats]:
+        """Return the counters of the response cache for each cached route."""
+        return {path: cache.stats for path, cache in self.caches.items()}
+
+    def deadline_stats(self) -> dict[str, DeadlineStats]:
+        """Return the counters of the routes with a deadline, under `{module}:{path}`."""
+        return {f"{self.name}:{path}": stats for path, stats in self.deadlines.items()}
+
+    def memo_stats(self) -> dict[str, CacheStats]:
+        """Return the counters of each memoized method called, by name."""
+        return {name: memo.stats for name, memo in self.memos.items()}
+
+    def invalidate(self, tag: str | None = None) -> int:
+        """Discard the results of the memoized methods with `tag`, or all of
+        them if `tag` is `None`.
+
+        Only affects the current process. Returns the amount of results
+        discarded.
+        """
+        return sum(memo.invalidate(tag) for memo in list(self.memos.values()))
+
+    def set_admission(self, policy: AdmissionPolicy) -> None:
+        """Limit the amount of requests handled at the same time by all the
+        routes of this module.
+
+        Must be called before the module is included into a LogicLayer.
+        """
+        self.admission = AdmissionController(policy, name=self.name)
+
+    def set_data_version(self, version: str | None) -> None:
+        """Publish a new version of the data served by the module.
+
+        The responses tagged with the previous version become stale, so clients
+        get the new data on their next conditional request.
+        """
+        self.data_version = version
+
+    def set_deadline(self, seconds: float | None) -> None:
+        """Limit the seconds each route of this module can take, unless the
+        route sets its own deadline.
+
+        Must be called before the module is included into a LogicLayer.
+        """
+        self.deadline = seconds
+
+    def set_executor(self, config: ExecutorConfig) -> None:
+        """Configure a dedicated executor for the synchronous methods of this module.
+
+        Sync routes, startup/shutdown handlers and healthchecks of the module run
+        in this executor instead of the threadpool shared by the whole app.
+        Must be called before the module is included into a LogicLayer.
+        """
+        self.executor = ModuleExecutor(config, name=self.name)
+
+    async def request_roles(self, request: Request) -> set[str]:
+        """Retrieve the roles of the user making the request from the auth provider."""
+        token = parse_token(request)
+        with span("auth"):
+            return await _await_for_it(self.auth.get_roles, token)
+
+    def include_into(
+        self,
+        layer: LogicLayer,
+        *,
+        depends_on: Sequence[str] = (),
+        **kwargs,
+    ) -> None:
+        """Configure this Module instance into the provided LogicLayer.
+
+        Keyword Arguments:
+            depends_on :Sequence[str]:
+                Names of the modules which must start before this one, and stop
+                after it.
+            {any from :func:`FastAPI.include_router` function}
+
+        """
         app = layer.app
         router = self.router
+        self.prefix = kwargs.get("prefix", "") + router.prefix
 
         for exc_cls, method in self._llexceptions.items():
-            app.add_exception_handler(exc_cls, method.bound_to(self))
+            handler = method.bound_to(self)
+            if layer.tracer is not None:
+                handler = traced_exception_handler(handler)
+            app.add_exception_handler(exc_cls, handler)
 
         for item in self._llhealthchecks:
-            layer.add_check(item.bound_to(self))
+            layer.add_check(self._bound_method(item), **item.kwargs)
+
+        self.hooks = layer.lifecycle.add(
+            self.name,
+            depends_on=depends_on,
+            startup=[self._hook(item) for item in self._llstartup],
+            shutdown=self._shutdown_hooks(),
+        )
 
-        router.on_startup.extend(item.bound_to(self) for item in self._llstartup)
-        router.on_shutdown.extend(item.bound_to(self) for item in self._llshutdown)
+        routes = [item for item in self._llroutes if self.debug or not item.debug_only]
+        for item in routes:
+            endpoint = self._route_endpoint(layer, item)
+            _add_route(router, item, endpoint)
+            if layer.metrics is not None:
+                layer.metrics.add_route(endpoint, self.name, self.prefix + item.path)
 
-        for item in self._llroutes:
-            if item.debug_only and not self.debug:
-                continue
-            router.add_api_route(item.path, item.bound_to(self), **item.kwargs)
+        if any(item.mode == "job" for item in routes):
+            layer.jobs.add_routes(router, self.prefix)
 
         app.include_router(router, **kwargs)
 
+    def _bound_method(self, item: ModuleMethod) -> CallableMayReturnCoroutine[..., Any]:
+        """Retrieve the bound method, set to run in the module executor if sync."""
+        func = item.bound_to(self)
+        return func if self.executor is None else self.executor.wrap(func)
+
+    def _hook(self, item: ModuleMethod) -> Hook:
+        """Retrieve a startup/shutdown handler with its timeout."""
+        return Hook(self._bound_method(item), item.func.__name__, item.kwargs.get("timeout"))
+
+    def _shutdown_hooks(self) -> list[Hook]:
+        """Retrieve the shutdown handlers, followed by the shutdown of the executor."""
+        hooks = [self._hook(item) for item in self._llshutdown]
+        if self.executor is not None:
+            hooks.append(Hook(self.executor.shutdown, "executor_shutdown"))
+        return hooks
+
+    def _route_endpoint(
+        self,
+        layer: LogicLayer,
+        item: ModuleMethod,
+    ) -> CallableMayReturnCoroutine[..., Any]:
+        """Build the endpoint FastAPI will use for a route of this module.
+
+        Routes without LogicLayer-specific options use the bound method directly,
+        and raw routes get a plain Starlette endpoint.
+        """
+        func = item.bound_to(self)
+        handler = self._route_handler(layer, item)
+        if item.raw:
+            return raw_endpoint(
+                handler or _call_handler(func),
+                raw_parser(func, item.path),
+                response_class=self._response_class(layer, item),
+                status_code=item.kwargs.get("status_code"),
+            )
+        if handler is None:
+            return func
+        return _endpoint_from_handler(func, handler)
+
+    def _route_handler(self, layer: LogicLayer, item: ModuleMethod) -> Handler | None:
+        """Build the handler for a route of this module, with its options applied.
+
+        Returns `None` if the route doesn't use any LogicLayer-specific option.
+        """
+        func = item.bound_to(self)
+        executor = self.executor
+        run_sync = run_in_threadpool if executor is None else executor.run
+        streams = _is_generator(func)
+        in_executor = executor is not None and not asyncio.iscoroutinefunction(func)
+        in_process = item.executor == "process"
+        as_job = item.mode == "job"
+        response_class = self._response_class(layer, item)
+        serializes = not streams and not as_job and issubclass(response_class, FastJSONResponse)
+        traced = layer.tracer is not None
+        profiled = layer.profiler is not None and self.debug
+        # with the "degrade" policy, the module can fail to start and keep its routes
+        degradable = layer.lifecycle.policy == "degrade" and self.hooks is not None
+        admissions = [self.admission] if self.admission is not None else []
+        if item.admission is not None:
+            controller = AdmissionController(item.admission, name=f"{self.name}:{item.path}")
+            self.admissions[item.path] = controller
+            admissions.insert(0, controller)
+        deadline = item.deadline if item.deadline is not None else self.deadline
+        features = (
+            item.cache,
+            item.coalesce,
+            deadline,
+            item.etag,
+            in_executor,
+            in_process,
+            streams,
+            serializes,
+            as_job,
+        )
+        if not any((*features, admissions, traced, profiled, degradable)):
+            return None
+
+        namespace = f"{self.name}:{item.path}"
+        # the streaming routes don't have a response model, like in `_route_kwargs`
+        route_kwargs = {"response_model": None, **item.kwargs} if streams else item.kwargs
+        if streams:
+            if item.coalesce or in_process:
+                msg = f"Streaming route '{item.path}' can't be coalesced or run in a process."
+                raise ValueError(msg)
+            if not issubclass(response_class, RecordStreamResponse):
+                response_class = RecordStreamResponse
+            handler = streaming_handler(func, response_class=response_class, run_sync=run_sync)
+        elif in_process:
+            handler = _process_handler(layer, self, func.__name__)
+        else:
+            handler = _call_handler(func, run_sync)
+
+        if admissions:
+            handler = admitted_handler(handler, admissions, get_roles=self.request_roles)
+
+        if item.coalesce:
+            handler = coalesced_handler(
+                handler,
+                self.flight,
+                namespace=namespace,
+                get_roles=self.request_roles,
+            )
+
+        if item.cache is not None:
+            if self.cache_backend is None:
+                backend = MemoryCache(
+                    max_entries=item.cache.max_entries,
+                    max_bytes=item.cache.max_bytes,
+                )
+            else:
+                backend = self.cache_backend
+            self.caches[item.path] = backend
+            handler = cached_handler(
+                handler,
+                backend,
+                item.cache,
+                namespace=namespace,
+                get_roles=self.request_roles,
+            )
+
+        if deadline is not None:
+            stats = self.deadlines[item.path] = DeadlineStats(timeout=deadline)
+            # jobs outlive the request, so they only stop at their deadline
+            handler = deadline_handler(
+                handler,
+                deadline,
+                name=namespace,
+                stats=stats,
+                watch_disconnect=not as_job,
+            )
+
+        if as_job:
+            handler = layer.jobs.handler(
+                handler,
+                module=self.name,
+                prefix=self.prefix,
+                route=item.path,
+                response_class=response_class,
+                encode=response_encoder(func, route_kwargs),
+                get_roles=self.request_roles,
+            )
+
+        if traced:
+            handler = traced_handler(handler, route=namespace)
+
+        if profiled:
+            key = layer.profiler.add_route(self.name, item.path, func)
+            handler = layer.profiler.wrap(handler, key)
+
+        if serializes:
+            handler = serializing_handler(
+                handler,
+                response_class,
+                status_code=item.kwargs.get("status_code"),
+                # without a model, the results skip `jsonable_encoder` entirely
+                encode=(
+                    response_encoder(func, route_kwargs)
+                    if response_model(func, route_kwargs) is not None
+                    else None
+                ),
+            )
+
+        if item.etag is not None:
+            handler = etag_handler(
+                handler,
+                item.etag,
+                namespace=namespace,
+                response_class=response_class,
+                status_code=item.kwargs.get("status_code"),
+                encode=response_encoder(func, route_kwargs),
+                get_version=lambda: self.data_version,
+                get_roles=self.request_roles,
+            )
+
+        if degradable:
+            handler = available_handler(handler, self.hooks)
+
+        return handler
+
+    def _response_class(self, layer: LogicLayer, item: ModuleMethod) -> type[Response]:
+        """Find the response class set for a route, the module, or the app."""
+        return _first_response_class(
+            item.kwargs.get("response_class"),
+            self.router.default_response_class,
+            layer.app.router.default_response_class,
+        )
+
+
+def _first_response_class(*candidates: Any) -> type[Response]:
+    for candidate in candidates:
+        if isinstance(candidate, type) and issubclass(candidate, Response):
+            return candidate
+    return JSONResponse
+
+
+def _is_generator(func: Any) -> bool:
+    return inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func)
+
+
+def _add_route(router: APIRouter, item: ModuleMethod, endpoint: Callable[..., Any]) -> None:
+    """Register the endpoint of a route in the router of its module."""
+    if item.raw:
+        methods = list(item.kwargs["methods"])
+        router.add_route(item.path, endpoint, methods, item.kwargs.get("name"), False)
+    else:
+        if item.mode == "job":
+            dependencies = yield_dependencies(
+                item.func, item.path, item.kwargs.get("dependencies") or ()
+            )
+            if dependencies:
+                msg = (
+                    f"Job route '{item.path}' can't use dependencies with yield, "
+                    f"they end with the request: {', '.join(dependencies)}"
+                )
+                raise ValueError(msg)
+        router.add_api_route(item.path, endpoint, **_route_kwargs(item))
+
+
+def _route_kwargs(item: ModuleMethod) -> dict[str, Any]:
+    """Build the parameters for FastAPI's `add_api_route` for a route."""
+    kwargs = item.kwargs
+    if item.mode == "job":
+        kwargs = {**kwargs, "response_model": JobStatus, "status_code": 202}
+        kwargs.pop("response_class", None)
+    elif _is_generator(item.func):
+        kwargs = {**kwargs, "response_model": kwargs.get("response_model")}
+        kwargs.setdefault("response_class", RecordStreamResponse)
+    return kwargs
+
+
+def _process_handler(layer: LogicLayer, module: LogicLayerModule, name: str) -> Handler:
+    """Create a handler which runs a method of the module in the process pool."""
+    pool = layer.process_pool
+    key = pool.register(module)
+
+    async def process_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+        return await pool.run(key, name, kwargs)
+
+    return process_handler
+
 
 class ModuleStatus(BaseModel):
     """Common class to describe the status of the resources related to a Module."""
@@ -0,0 +1,319 @@
+"""OpenAPI schema module.
+
+Contains the definitions to build the OpenAPI schema of the app once, keep it
+serialized, and serve it with a strong `ETag`. The serialized schema can be
+stored in a directory, keyed by a fingerprint of the routes of the app, so the
+workers of a server, or the next deployment of the same code, reuse it instead
+of building it again. The schema can also be fetched for the routes under a
+single prefix.
+
+The schema can be built in advance with:
+
+    python -m logiclayer openapi package.module:layer ./openapi-cache
+"""
+
+from __future__ import annotations
+
+import dataclasses as dcls
+import hashlib
+import importlib
+import inspect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from .etag import etag_matches, not_modified
+from .lazy import ModuleLoader
+from .responses import dumps
+
+if TYPE_CHECKING:
+    from .logiclayer import LogicLayer
+
+logger = logging.getLogger("logiclayer.openapi")
+
+
+@dcls.dataclass(frozen=True)
+class OpenAPIConfig:
+    """Defines how the OpenAPI schema of the app is built and served.
+
+    Attributes:
+        eager :bool:
+            Builds the schema when the app starts, instead of on the first
+            request.
+        cache_dir :str | Path | None:
+            A directory where the serialized schema is stored, named after the
+            fingerprint of the routes of the app. Workers and later runs with
+            the same routes load it instead of building it.
+        split :bool:
+            Allows fetching the schema of the routes under a single module
+            prefix with the `prefix` query parameter.
+        cache_control :str | None:
+            Value of the `Cache-Control` header of the responses.
+
+    """
+
+    eager: bool = True
+    cache_dir: Union[str, Path, None] = None
+    split: bool = True
+    cache_control: Optional[str] = "no-cache"
+
+
+@dcls.dataclass(frozen=True)
+class SchemaVariant:
+    """A serialized version of the schema."""
+
+    body: bytes
+    etag: str
+
+
+class OpenAPICache:
+    """Builds the OpenAPI schema of a LogicLayer app once, and serves it serialized."""
+
+    def __init__(self, layer: LogicLayer, config: OpenAPIConfig) -> None:
+        self.layer = layer
+        self.config = config
+        self._lock = threading.Lock()
+        self._schema: Optional[SchemaVariant] = None
+        self._variants: dict[tuple[str, str], SchemaVariant] = {}
+
+    @property
+    def app(self) -> FastAPI:
+        return self.layer.app
+
+    def fingerprint(self) -> str:
+        """Hash the details of the app and its routes which define the schema.
+
+        Changes in the models used by the routes which don't alter the
+        signatures of the route methods are not detected; changing the version
+        of the app changes the fingerprint too.
+        """
+        import fastapi
+
+        from . import __version__
+
+        app = self.app
+        digest = hashlib.blake2b(digest_size=16)
+        parts = [
+            __version__,
+            fastapi.__version__,
+            app.title,
+            app.version,
+            app.openapi_version,
+            repr(app.servers),
+        ]
+        for route in app.router.routes:
+            if getattr(route, "include_in_schema", False):
+                parts.append(f"{route.path} {sorted(route.methods or ())} {route.name}")
+        modules = {**self.layer.modules, **self.layer.loaders}
+        for prefix in sorted(modules):
+            item = modules[prefix]
+            cls = item.cls if isinstance(item, ModuleLoader) else type(item)
+            parts.append(f"{prefix} {cls.__module__}.{cls.__qualname__}")
+            for method in cls._llroutes:
+                # the same in every process, unlike the order of sets
+                kwargs = json.dumps(method.kwargs, sort_keys=True, default=_stable_value)
+                parts.append(
+                    f"{method.path} {method.mode} {method.raw} {kwargs} "
+                    f"{inspect.signature(method.func)}"
+                )
+        for part in parts:
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def invalidate(self) -> None:
+        """Discard the schema kept, so it's built again on the next request."""
+        with self._lock:
+            self._schema = None
+            self._variants = {}
+            self.app.openapi_schema = None
+
+    def build(self) -> SchemaVariant:
+        """Retrieve the serialized schema, loading or building it if needed."""
+        with self._lock:
+            if self._schema is not None:
+                return self._schema
+
+            start = time.perf_counter()
+            path = None
+            body = None
+            if self.config.cache_dir is not None:
+                path = Path(self.config.cache_dir, f"openapi-{self.fingerprint()}.json")
+                try:
+                    body = path.read_bytes()
+                    logger.debug("OpenAPI schema loaded from %s", path)
+                except FileNotFoundError:
+                    pass
+
+            if body is None:
+                body = dumps(self.app.openapi())
+                if path is not None:
+                    _write_atomic(path, body)
+                logger.info(
+                    "OpenAPI schema built in %.3f seconds (%d bytes)",
+                    time.perf_counter() - start,
+                    len(body),
+                )
+            # the dict is not needed anymore, the variants are built from the bytes
+            self.app.openapi_schema = None
+
+            self._schema = _variant(body)
+            return self._schema
+
+    def variant(self, prefix: str = "", root_path: str = "") -> Optional[SchemaVariant]:
+        """Retrieve the schema for the routes under `prefix`, and with `root_path`
+        listed in its servers.
+
+        Returns `None` if there are no routes under `prefix`.
+        """
+        schema = self.build()
+        app = self.app
+        if root_path and not app.root_path_in_servers:
+            root_path = ""
+        if not prefix and not root_path:
+            return schema
+
+        key = (prefix, root_path)
+        variant = self._variants.get(key)
+        if variant is None:
+            content = json.loads(schema.body)
+            if prefix:
+                content = _filter_prefix(content, prefix)
+                if content is None:
+                    return None
+            if root_path:
+                servers = content.get("servers", [])
+                if root_path not in {item.get("url") for item in servers}:
+                    content["servers"] = [{"url": root_path}, *servers]
+            variant = self._variants[key] = _variant(dumps(content))
+        return variant
+
+    async def startup(self) -> None:
+        """Build the schema in the threadpool, without blocking the event loop."""
+        await run_in_threadpool(self.build)
+
+    async def endpoint(self, request: Request) -> Response:
+        """Serve the schema, answering conditional requests with a `304` status."""
+        prefix = request.query_params.get("prefix", "") if self.config.split else ""
+        root_path = request.scope.get("root_path", "").rstrip("/")
+        key = (prefix.rstrip("/"), root_path if self.app.root_path_in_servers else "")
+        variant = self._schema if key == ("", "") else self._variants.get(key)
+        if variant is None:
+            # building the schema or a variant takes a while for large apps
+            variant = await run_in_threadpool(self.variant, *key)
+        if variant is None:
+            return JSONResponse({"detail": f"No routes under prefix '{prefix}'"}, 404)
+
+        headers = {"etag": variant.etag}
+        if self.config.cache_control is not None:
+            headers["cache-control"] = self.config.cache_control
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None and etag_matches(if_none_match, (variant.etag,)):
+            response = not_modified(variant.etag)
+            response.headers.update(headers)
+            return response
+        return Response(variant.body, media_type="application/json", headers=headers)
+
+
+def _variant(body: bytes) -> SchemaVariant:
+    return SchemaVariant(body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+
+
+def _filter_prefix(schema: dict[str, Any], prefix: str) -> Optional[dict[str, Any]]:
+    """Keep the paths under `prefix`, and the components they reference."""
+    paths = {
+        path: item
+        for path, item in schema.get("paths", {}).items()
+        if path == prefix or path.startswith(prefix + "/")
+    }
+    if not paths:
+        return None
+
+    components = schema.get("components", {})
+    kept: dict[str, dict[str, Any]] = {}
+    pending = list(_references(paths))
+    while pending:
+        ref = pending.pop()
+        parts = ref.removeprefix("#/components/").split("/")
+        if len(parts) != 2 or parts[1] in kept.get(parts[0], {}):
+            continue
+        value = components.get(parts[0], {}).get(parts[1])
+        if value is None:
+            continue
+        kept.setdefault(parts[0], {})[parts[1]] = value
+        pending.extend(_references(value))
+
+    # the security schemes are referenced by name, not with $ref
+    if "securitySchemes" in components:
+        kept["securitySchemes"] = components["securitySchemes"]
+
+    result = {**schema, "paths": paths}
+    if kept:
+        result["components"] = {key: dict(sorted(value.items())) for key, value in kept.items()}
+    else:
+        result.pop("components", None)
+    return result
+
+
+def _references(value: Any) -> list[str]:
+    refs = []
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            ref = item.get("$ref")
+            if isinstance(ref, str):
+                refs.append(ref)
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return refs
+
+
+def _write_atomic(path: Path, body: bytes) -> None:
+    """Write a file so other processes never read it partially written."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=path.parent, prefix=".openapi-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(body)
+        os.replace(temp, path)
+    except BaseException:
+        Path(temp).unlink(missing_ok=True)
+        raise
+
+
+def build_cache(target: str, cache_dir: Union[str, Path]) -> SchemaVariant:
+    """Import a LogicLayer app and store its schema in a cache directory.
+
+    Arguments:
+        target :str:
+            The app to import, as "package.module:attribute".
+        cache_dir :str | Path:
+            The directory where the schema is stored.
+
+    """
+    module_name, _, attr = target.partition(":")
+    layer = getattr(importlib.import_module(module_name), attr or "layer")
+    cache = OpenAPICache(layer, OpenAPIConfig(cache_dir=cache_dir))
+    return cache.build()
+
+
+def _stable_value(value: Any) -> Any:
+    """Describe a value for the fingerprint, without the parts which change
+    between processes, like the order of sets or the addresses of objects."""
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if hasattr(value, "__qualname__"):
+        return f"{value.__module__}.{value.__qualname__}"
+    return repr(value)
@@ -0,0 +1,303 @@
+"""Profiling module.
+
+Contains a sampling profiler to find out where the routes of a module spend
+their time, and which allocations they retain, while the app handles real
+traffic.
+
+The profiler is only available when the LogicLayer app runs in debug mode, and
+only for modules in debug mode; otherwise no part of it is set up, so it has
+no cost.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dis
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import CodeType
+from typing import Any, Optional
+
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+from .common import Handler, LogicLayerException
+
+logger = logging.getLogger("logiclayer.profiling")
+
+RouteKey = tuple[str, str]
+
+
+class ProfilerBusy(LogicLayerException):
+    """A profiling session is already running."""
+
+    def __init__(self) -> None:
+        super().__init__("A profiling session is already running, try again later.")
+
+
+class AllocationSite(BaseModel):
+    """Memory retained by the allocations done in a line of code."""
+
+    filename: str
+    lineno: int
+    size: int
+    count: int
+
+
+class AllocationSummary(BaseModel):
+    """Memory retained by the allocations done during the execution of a route."""
+
+    module: str
+    route: str
+    size: int
+    count: int
+    top: list[AllocationSite]
+
+
+class ProfileReport(BaseModel):
+    """The result of a profiling session.
+
+    The stacks are stored in the collapsed format, as the frames from the route
+    function to the innermost call separated by `;`, with the amount of samples
+    where the stack was found.
+    """
+
+    module: Optional[str]
+    route: Optional[str]
+    duration: float
+    interval: float
+    requests: int
+    samples: int
+    stacks: dict[str, int]
+    allocations: Optional[list[AllocationSummary]] = None
+
+    def collapsed(self) -> str:
+        """Render the stacks in the format used by flamegraph tools."""
+        lines = [f"{stack} {count}" for stack, count in self.stacks.items()]
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+class _Session:
+    """Keeps the state of a profiling session in progress."""
+
+    def __init__(self, routes: dict[RouteKey, CodeType], request_limit: Optional[int]) -> None:
+        self.routes = routes
+        self.codes = frozenset(routes.values())
+        self.request_limit = request_limit
+        self.requests = 0
+        self.samples = 0
+        self.stacks: dict[str, int] = {}
+        self.done = asyncio.Event()
+        self.stop = threading.Event()
+
+    def count_request(self) -> None:
+        self.requests += 1
+        if self.request_limit is not None and self.requests >= self.request_limit:
+            self.done.set()
+
+
+class Profiler:
+    """Samples the stacks of the threads running the routes of debug modules."""
+
+    def __init__(self) -> None:
+        self.routes: dict[RouteKey, CodeType] = {}
+        self.session: Optional[_Session] = None
+
+    def add_route(self, module: str, path: str, func: Any) -> RouteKey:
+        """Register a route function as a target for the profiler."""
+        key = (module, path)
+        self.routes[key] = getattr(func, "__func__", func).__code__
+        return key
+
+    def wrap(self, handler: Handler, key: RouteKey) -> Handler:
+        """Wrap a route handler to count its requests during a session."""
+
+        async def profile_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+            try:
+                return await handler(request, kwargs)
+            finally:
+                session = self.session
+                if session is not None and key in session.routes:
+                    session.count_request()
+
+        return profile_handler
+
+    async def profile(
+        self,
+        *,
+        module: Optional[str] = None,
+        route: Optional[str] = None,
+        seconds: float = 10.0,
+        requests: Optional[int] = None,
+        interval: float = 0.005,
+        memory: bool = True,
+    ) -> ProfileReport:
+        """Profile the routes selected for some time, or amount of requests.
+
+        Keyword Arguments:
+            module :str | None:
+                Name of the module to profile. All modules if not set.
+            route :str | None:
+                Path of the route to profile, relative to its module.
+            seconds :float:
+                Maximum duration of the session.
+            requests :int | None:
+                If set, the session ends after this amount of requests to the
+                selected routes.
+            interval :float:
+                Seconds between each sample of the stacks.
+            memory :bool:
+                Traces the memory allocations with :mod:`tracemalloc` during the
+                session, and reports the memory retained by each route.
+
+        """
+        routes = {
+            key: code
+            for key, code in self.routes.items()
+            if (module is None or key[0] == module) and (route is None or key[1] == route)
+        }
+        if not routes:
+            msg = f"No routes available to profile for module={module!r} route={route!r}."
+            raise LogicLayerException(msg)
+        if self.session is not None:
+            raise ProfilerBusy
+
+        session = self.session = _Session(routes, requests)
+        sampler = threading.Thread(
+            target=_sample,
+            args=(session, interval),
+            name="logiclayer-profiler",
+            daemon=True,
+        )
+        started_tracemalloc = memory and not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start(25)
+        baseline = tracemalloc.take_snapshot() if memory else None
+
+        logger.info("Profiling %d routes for %s seconds", len(routes), seconds)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(session.done.wait(), seconds)
+        finally:
+            session.stop.set()
+            self.session = None
+            duration = time.perf_counter() - start
+            snapshot = None if baseline is None else tracemalloc.take_snapshot()
+            if started_tracemalloc:
+                tracemalloc.stop()
+            await run_in_threadpool(sampler.join)
+
+        allocations = None
+        if baseline is not None and snapshot is not None:
+            allocations = await run_in_threadpool(_allocations, routes, baseline, snapshot)
+
+        return ProfileReport(
+            module=module,
+            route=route,
+            duration=duration,
+            interval=interval,
+            requests=session.requests,
+            samples=session.samples,
+            stacks=dict(sorted(session.stacks.items(), key=lambda item: -item[1])),
+            allocations=allocations,
+        )
+
+
+def _sample(session: _Session, interval: float) -> None:
+    """Collect the stacks of the threads running a route in the session."""
+    own = threading.get_ident()
+    codes = session.codes
+    stacks = session.stacks
+    labels: dict[CodeType, str] = {}
+
+    while not session.stop.wait(interval):
+        session.samples += 1
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            chain: list[CodeType] = []
+            root = 0
+            while frame is not None:
+                code = frame.f_code
+                chain.append(code)
+                if code in codes:
+                    root = len(chain)
+                frame = frame.f_back
+            if not root:
+                continue
+            for code in chain[:root]:
+                if code not in labels:
+                    labels[code] = _label(code)
+            stack = ";".join(labels[code] for code in reversed(chain[:root]))
+            stacks[stack] = stacks.get(stack, 0) + 1
+
+
+def _label(code: CodeType) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    filename = os.path.basename(code.co_filename)
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _line_range(code: CodeType) -> tuple[int, int]:
+    lines = [line for _, line in dis.findlinestarts(code) if line is not None]
+    return code.co_firstlineno, max(lines, default=code.co_firstlineno)
+
+
+def _allocations(
+    routes: dict[RouteKey, CodeType],
+    baseline: tracemalloc.Snapshot,
+    snapshot: tracemalloc.Snapshot,
+    limit: int = 10,
+) -> list[AllocationSummary]:
+    """Summarize the allocations retained since the baseline by each route.
+
+    An allocation belongs to a route if the route function is in its traceback.
+    """
+    known = Counter((trace.size, trace.traceback) for trace in baseline.traces)
+    new_traces = []
+    for trace in snapshot.traces:
+        key = (trace.size, trace.traceback)
+        if known[key] > 0:
+            known[key] -= 1
+        else:
+            new_traces.append(trace)
+
+    result = []
+    for (module, path), code in routes.items():
+        filename = code.co_filename
+        first, last = _line_range(code)
+        sites: dict[tuple[str, int], list[int]] = {}
+        for trace in new_traces:
+            traceback = trace.traceback
+            if not any(
+                frame.filename == filename and first <= frame.lineno <= last for frame in traceback
+            ):
+                continue
+            # frames are sorted from the oldest to the most recent
+            frame = traceback[-1]
+            site = sites.setdefault((frame.filename, frame.lineno), [0, 0])
+            site[0] += trace.size
+            site[1] += 1
+        top = sorted(sites.items(), key=lambda item: -item[1][0])
+        result.append(
+            AllocationSummary(
+                module=module,
+                route=path,
+                size=sum(size for size, _ in sites.values()),
+                count=sum(count for _, count in sites.values()),
+                top=[
+                    AllocationSite(filename=name, lineno=lineno, size=size, count=count)
+                    for (name, lineno), (size, count) in top[:limit]
+                ],
+            )
+        )
+    return result
@@ -0,0 +1,188 @@
+"""Raw routes module.
+
+Contains the definitions to serve a module route as a plain Starlette endpoint,
+skipping the dependency solving and validation FastAPI does for each request.
+The parameters of the route are read from the path and the query string by a
+parser compiled once, from the signature of the method, when the route is
+registered.
+"""
+
+from __future__ import annotations
+
+import enum
+import inspect
+import types
+import typing
+from collections.abc import Sequence
+from typing import Any, Callable, NamedTuple, Optional, Union
+
+from fastapi.dependencies.utils import get_typed_signature
+from fastapi.exceptions import RequestValidationError
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .common import Handler, LogicLayerException
+
+RawParser = Callable[[Request], dict[str, Any]]
+
+_TRUE = frozenset(("1", "true", "on", "yes"))
+_FALSE = frozenset(("0", "false", "off", "no"))
+
+
+class RawParam(NamedTuple):
+    """A parameter of a raw route, as read from the request."""
+
+    name: str
+    convert: Callable[[str], Any]
+    default: Any
+    required: bool
+    many: bool
+    in_path: bool
+
+
+def _parse_bool(value: str) -> bool:
+    value = value.lower()
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    raise ValueError(value)
+
+
+# `int | None` annotations are `types.UnionType` since Python 3.10
+_UNION_TYPES = (Union, getattr(types, "UnionType", Union))
+
+_ERRORS: dict[Callable[[str], Any], tuple[str, str]] = {
+    int: ("int_parsing", "Input should be a valid integer"),
+    float: ("float_parsing", "Input should be a valid number"),
+    _parse_bool: ("bool_parsing", "Input should be a valid boolean"),
+}
+
+
+def _converter(annotation: Any, name: str) -> tuple[Callable[[str], Any], bool]:
+    """Find the function to convert a string to the type of a parameter, and
+    whether the parameter receives all the values of the key."""
+    origin = typing.get_origin(annotation)
+    if origin in _UNION_TYPES:
+        args = [item for item in typing.get_args(annotation) if item is not type(None)]
+        if len(args) == 1:
+            return _converter(args[0], name)
+    elif origin in (list, tuple, set, frozenset, Sequence) or annotation in (list, tuple):
+        args = typing.get_args(annotation)
+        convert, many = _converter(args[0] if args else str, name)
+        if not many:
+            return convert, True
+    elif origin is typing.Literal:
+        choices = {str(item): item for item in typing.get_args(annotation)}
+        return choices.__getitem__, False
+    elif annotation in (inspect.Parameter.empty, Any, str):
+        return str, False
+    elif annotation is bool:
+        return _parse_bool, False
+    elif annotation in (int, float):
+        return annotation, False
+    elif isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return annotation, False
+
+    msg = f"Parameter '{name}' of a raw route has a type which can't be parsed: {annotation!r}"
+    raise LogicLayerException(msg)
+
+
+def raw_parser(func: Callable[..., Any], path: str) -> RawParser:
+    """Compile the parser of the parameters of a raw route.
+
+    The parameters annotated as :class:`Request` receive the request; the ones
+    named in the path are read from it, and the rest from the query string.
+    Parameters with a default value are optional. Supported types are `str`,
+    `int`, `float`, `bool`, enums and literals, optionals of them, and lists of
+    them to receive all the values of a repeated query key.
+    """
+    signature = get_typed_signature(func)
+    request_params: list[str] = []
+    params: list[RawParam] = []
+    for param in signature.parameters.values():
+        annotation = param.annotation
+        if isinstance(annotation, type) and issubclass(annotation, Request):
+            request_params.append(param.name)
+            continue
+        if param.kind in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD):
+            continue
+        convert, many = _converter(annotation, param.name)
+        required = param.default is inspect.Parameter.empty
+        params.append(
+            RawParam(
+                name=param.name,
+                convert=convert,
+                default=None if required else param.default,
+                required=required,
+                many=many,
+                in_path=f"{{{param.name}}}" in path or f"{{{param.name}:" in path,
+            )
+        )
+
+    def parse(request: Request) -> dict[str, Any]:
+        kwargs: dict[str, Any] = {name: request for name in request_params}
+        if not params:
+            return kwargs
+        query = request.query_params
+        path_params = request.path_params
+        errors: list[dict[str, Any]] = []
+        for param in params:
+            if param.in_path:
+                value: Any = path_params.get(param.name)
+                source = "path"
+            elif param.many:
+                value = query.getlist(param.name) or None
+                source = "query"
+            else:
+                value = query.get(param.name)
+                source = "query"
+
+            if value is None:
+                if param.required:
+                    errors.append(
+                        {"type": "missing", "loc": (source, param.name), "msg": "Field required"}
+                    )
+                kwargs[param.name] = param.default
+                continue
+
+            try:
+                if param.many:
+                    kwargs[param.name] = [param.convert(item) for item in value]
+                elif isinstance(value, str):
+                    kwargs[param.name] = param.convert(value)
+                else:
+                    # already converted by a convertor in the path
+                    kwargs[param.name] = value
+            except (KeyError, ValueError):
+                kind, msg = _ERRORS.get(param.convert, ("value_error", "Invalid value"))
+                errors.append({"type": kind, "loc": (source, param.name), "msg": msg})
+
+        if errors:
+            raise RequestValidationError(errors)
+        return kwargs
+
+    return parse
+
+
+def raw_endpoint(
+    handler: Handler,
+    parser: RawParser,
+    *,
+    response_class: type[Response],
+    status_code: Optional[int] = None,
+) -> Callable[[Request], Any]:
+    """Build the Starlette endpoint of a raw route around its handler.
+
+    Results which are not responses are rendered with `response_class` as they
+    are, without `jsonable_encoder`.
+    """
+    status = status_code or 200
+
+    async def endpoint(request: Request) -> Response:
+        result = await handler(request, parser(request))
+        if isinstance(result, Response):
+            return result
+        return response_class(result, status_code=status)
+
+    return endpoint
@@ -0,0 +1,370 @@
+"""Resources module.
+
+Contains the definitions for pools of resources, like HTTP clients or database
+connections, shared by all the modules of a LogicLayer app. The pools are
+declared once in the app, opened when the app starts, and closed when it
+stops; modules receive them in their constructors, or in their routes as a
+dependency.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses as dcls
+import inspect
+import logging
+import time
+from collections.abc import AsyncIterator
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+from fastapi import Depends
+from starlette.requests import Request
+
+from .common import LogicLayerException
+
+logger = logging.getLogger("logiclayer.resources")
+
+T = TypeVar("T")
+
+
+class PoolTimeout(LogicLayerException):
+    """No resource of a pool became available in the time allowed."""
+
+    def __init__(self, name: str) -> None:
+        super().__init__(f"No resource available in pool '{name}', try again later.")
+        self.name = name
+
+
+@dcls.dataclass
+class PoolStats:
+    """Counters describing the usage of a resource pool.
+
+    `in_use` counts the checkouts, which for a :class:`SharedResource` can be
+    more than its `size`; `idle` counts the resources kept ready to be checked
+    out, only held by a :class:`ResourcePool`.
+    """
+
+    max_size: Optional[int]
+    size: int = 0
+    in_use: int = 0
+    idle: int = 0
+    waiting: int = 0
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_time: float = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        """Average seconds waited to check out a resource."""
+        return self.wait_time / self.checkouts if self.checkouts else 0.0
+
+
+@dcls.dataclass(frozen=True)
+class ResourceRef:
+    """A reference to a pool of the app, by name.
+
+    Used in the constructor arguments of a :class:`logiclayer.LazyModule`, where
+    the pool is replaced when the module is created.
+    """
+
+    name: str
+
+
+class BasePool(Generic[T]):
+    """Common logic for the pools: limits the amount of concurrent checkouts,
+    and measures the time spent waiting for a resource."""
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        *,
+        close: Optional[Callable[[T], Any]] = None,
+        max_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.name = getattr(factory, "__name__", "pool")
+        self.factory = factory
+        self.closer = close
+        self.timeout = timeout
+        self.stats = PoolStats(max_size=max_size)
+        self.listeners: list[Callable[[str, float], None]] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def open(self) -> None:
+        """Prepare the pool to be used."""
+        max_size = self.stats.max_size
+        if max_size is not None and self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max_size)
+
+    async def close(self) -> None:
+        """Close all the resources of the pool."""
+        self._semaphore = None
+
+    def acquire(self) -> contextlib.AbstractAsyncContextManager[T]:
+        """Check out a resource for the duration of an `async with` block."""
+        raise NotImplementedError
+
+    async def _wait(self) -> None:
+        stats = self.stats
+        start = time.perf_counter()
+        if self._semaphore is None and stats.max_size is not None:
+            self._semaphore = asyncio.Semaphore(stats.max_size)
+        if self._semaphore is not None:
+            stats.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                raise PoolTimeout(self.name) from None
+            finally:
+                stats.waiting -= 1
+        elapsed = time.perf_counter() - start
+        stats.checkouts += 1
+        stats.wait_time += elapsed
+        stats.in_use += 1
+        for listener in self.listeners:
+            listener(self.name, elapsed)
+
+    def _release(self) -> None:
+        self.stats.in_use -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    async def _close_resource(self, resource: T) -> None:
+        try:
+            if self.closer is not None:
+                result = self.closer(resource)
+            elif hasattr(resource, "aclose"):
+                result = resource.aclose()  # type: ignore[attr-defined]
+            elif hasattr(resource, "close"):
+                result = resource.close()  # type: ignore[attr-defined]
+            else:
+                return
+            if inspect.isawaitable(result):
+                await result
+        except Exception:
+            logger.exception("Error closing a resource of pool '%s'", self.name)
+
+
+class SharedResource(BasePool[T]):
+    """A single resource shared by all users, like an HTTP client which keeps
+    its own connection pool.
+
+    The resource is created when the app starts. If `max_size` is set, only
+    that amount of users can check it out at the same time, which limits the
+    concurrency of the operations done with it.
+
+    Arguments:
+        factory :Callable[[], T | Awaitable[T]]:
+            Creates the resource.
+
+    Keyword Arguments:
+        close :Callable[[T], Any] | None:
+            Closes the resource. By default, its `aclose` or `close` method is
+            called.
+        max_size :int | None:
+            Maximum amount of concurrent checkouts.
+        timeout :float | None:
+            Maximum seconds to wait for a checkout, before raising
+            :class:`PoolTimeout`.
+
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        *,
+        close: Optional[Callable[[T], Any]] = None,
+        max_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        super().__init__(factory, close=close, max_size=max_size, timeout=timeout)
+        self.resource: Optional[T] = None
+
+    async def open(self) -> None:
+        await super().open()
+        if self.resource is None:
+            self.resource = await _create(self.factory)
+            self.stats.size = 1
+
+    async def close(self) -> None:
+        await super().close()
+        resource, self.resource = self.resource, None
+        if resource is not None:
+            await self._close_resource(resource)
+            self.stats.size = 0
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> AsyncIterator[T]:
+        if self.resource is None:
+            await self.open()
+        await self._wait()
+        try:
+            assert self.resource is not None
+            yield self.resource
+        finally:
+            self._release()
+
+
+class ResourcePool(BasePool[T]):
+    """A pool of interchangeable resources, like database connections.
+
+    Resources are created when needed, up to `max_size`, and returned to the
+    pool after each use. Resources checked out by a block which raised an
+    exception are closed instead, as they may be in an invalid state.
+
+    Arguments:
+        factory :Callable[[], T | Awaitable[T]]:
+            Creates a new resource.
+
+    Keyword Arguments:
+        close :Callable[[T], Any] | None:
+            Closes a resource. By default, its `aclose` or `close` method is
+            called.
+        max_size :int:
+            Maximum amount of resources in the pool.
+        min_size :int:
+            Amount of resources created when the app starts.
+        timeout :float | None:
+            Maximum seconds to wait for a free resource, before raising
+            :class:`PoolTimeout`.
+
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        *,
+        close: Optional[Callable[[T], Any]] = None,
+        max_size: int = 10,
+        min_size: int = 0,
+        timeout: Optional[float] = None,
+    ) -> None:
+        super().__init__(factory, close=close, max_size=max_size, timeout=timeout)
+        self.min_size = min(min_size, max_size)
+        self._idle: list[T] = []
+
+    async def open(self) -> None:
+        await super().open()
+        missing = self.min_size - self.stats.size
+        if missing > 0:
+            resources = await asyncio.gather(*(_create(self.factory) for _ in range(missing)))
+            self._idle.extend(resources)
+            self.stats.size += len(resources)
+            self.stats.idle = len(self._idle)
+
+    async def close(self) -> None:
+        await super().close()
+        idle, self._idle = self._idle, []
+        self.stats.size -= len(idle)
+        self.stats.idle = 0
+        await asyncio.gather(*(self._close_resource(item) for item in idle))
+
+    @contextlib.asynccontextmanager
+    async def acquire(self) -> AsyncIterator[T]:
+        await self._wait()
+        try:
+            if self._idle:
+                resource = self._idle.pop()
+                self.stats.idle = len(self._idle)
+            else:
+                resource = await _create(self.factory)
+                self.stats.size += 1
+        except BaseException:
+            self._release()
+            raise
+
+        try:
+            yield resource
+        except BaseException:
+            self.stats.size -= 1
+            await self._close_resource(resource)
+            raise
+        else:
+            self._idle.append(resource)
+            self.stats.idle = len(self._idle)
+        finally:
+            self._release()
+
+
+class ResourceRegistry:
+    """Keeps the pools declared in a LogicLayer app, by name."""
+
+    def __init__(self) -> None:
+        self.pools: dict[str, BasePool[Any]] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.pools
+
+    def __getitem__(self, name: str) -> BasePool[Any]:
+        try:
+            return self.pools[name]
+        except KeyError:
+            msg = f"Resource pool '{name}' is not registered"
+            raise LogicLayerException(msg) from None
+
+    def add(self, name: str, pool: BasePool[T]) -> BasePool[T]:
+        """Register a pool under a name."""
+        if name in self.pools:
+            msg = f"Resource pool '{name}' is already registered"
+            raise LogicLayerException(msg)
+        pool.name = name
+        self.pools[name] = pool
+        return pool
+
+    def resolve(self, value: Any) -> Any:
+        """Replace a :class:`ResourceRef` with the pool it refers to."""
+        return self[value.name] if isinstance(value, ResourceRef) else value
+
+    def stats(self) -> dict[str, PoolStats]:
+        """Return the counters of each pool."""
+        return {name: pool.stats for name, pool in self.pools.items()}
+
+    async def open(self) -> None:
+        """Open all the pools concurrently."""
+        start = time.perf_counter()
+        await asyncio.gather(*(pool.open() for pool in self.pools.values()))
+        if self.pools:
+            logger.info(
+                "Opened %d resource pools in %.3f seconds",
+                len(self.pools),
+                time.perf_counter() - start,
+            )
+
+    async def close(self) -> None:
+        """Close all the pools; failures are logged."""
+        results = await asyncio.gather(
+            *(pool.close() for pool in self.pools.values()),
+            return_exceptions=True,
+        )
+        for name, result in zip(self.pools, results):
+            if isinstance(result, BaseException):
+                logger.error("Error closing resource pool '%s'", name, exc_info=result)
+
+
+def resource(name: str) -> Any:
+    """Declare a route parameter which receives a resource from a pool of the app.
+
+    The resource is checked out for the duration of the request.
+
+    Usage:
+        @ll.route("GET", "/search")
+        async def route_search(self, query: str, client=ll.resource("http")):
+            return (await client.get(SEARCH_URL, params={"q": query})).json()
+    """
+
+    async def resource_dependency(request: Request) -> AsyncIterator[Any]:
+        pool = request.app.state.resources[name]
+        async with pool.acquire() as item:
+            yield item
+
+    resource_dependency.__name__ = f"resource_{name}"
+    return Depends(resource_dependency)
+
+
+async def _create(factory: Callable[[], Any]) -> Any:
+    result = factory()
+    if inspect.isawaitable(result):
+        return await result
+    return result
@@ -0,0 +1,481 @@
+"""Responses module.
+
+Contains the response classes LogicLayer uses to serve the results of the
+module routes.
+
+The fast serialization path uses the `orjson` package if available, and the
+Arrow IPC output requires the `pyarrow` package. Both are optional.
+"""
+
+from __future__ import annotations
+
+import csv
+import datetime
+import decimal
+import enum
+import io
+import itertools
+import json
+import math
+import uuid
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator, Mapping
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi.dependencies.utils import get_typed_return_annotation
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .common import Handler
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "json": "application/json",
+}
+
+
+def json_default(obj: Any) -> Any:
+    """Convert the objects the standard JSON encoder can't handle.
+
+    Numpy arrays and pandas objects are converted with their own vectorized
+    methods, without importing these libraries if they are not in use. NaN
+    values are converted to null, and datetime64 values to ISO 8601 strings
+    with microseconds precision, as orjson does.
+    """
+    module = type(obj).__module__
+    if module.startswith("numpy"):
+        if obj.dtype.kind == "M":
+            return _datetime64_isoformat(obj)
+        if not obj.shape:
+            value = obj.item()
+            return None if value != value else value
+        if obj.dtype.kind == "f":
+            # NaN is not valid JSON; missing values are converted to null
+            mask = obj != obj
+            if mask.any():
+                obj = obj.astype(object)
+                obj[mask] = None
+        return obj.tolist()
+    if module.startswith("pandas"):
+        if hasattr(obj, "to_dict") and hasattr(obj, "columns"):
+            return _dataframe_records(obj)
+        if hasattr(obj, "to_numpy") and hasattr(obj, "dtype"):
+            if obj.dtype.kind in "fM":
+                return json_default(obj.to_numpy())
+            return obj.astype(object).where(obj.notna(), None).tolist()
+        if hasattr(obj, "to_datetime64"):
+            # Timestamp and NaT, in the same format as the datetime64 values
+            if obj != obj:
+                return None
+            return obj.floor("us").to_pydatetime().isoformat()
+        if hasattr(obj, "tolist"):
+            return obj.tolist()
+        if hasattr(obj, "isoformat"):
+            return obj.isoformat()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", "replace")
+    msg = f"Object of type {type(obj).__name__} is not JSON serializable"
+    raise TypeError(msg)
+
+
+def _datetime64_isoformat(obj: Any) -> Any:
+    # datetime64[us] values convert to datetime objects, and NaT to None
+    values = obj.astype("datetime64[us]")
+    if not values.shape:
+        value = values.item()
+        return value.isoformat() if value is not None else None
+    return [item.isoformat() if item is not None else None for item in values.tolist()]
+
+
+def _finite(content: Any) -> Any:
+    """Replace the NaN and infinite floats in `content` with `None`."""
+    if isinstance(content, float):
+        return content if math.isfinite(content) else None
+    if isinstance(content, Mapping):
+        return {key: _finite(value) for key, value in content.items()}
+    if isinstance(content, (list, tuple)):
+        return [_finite(item) for item in content]
+    return content
+
+
+def _dataframe_records(df: Any) -> list[dict[str, Any]]:
+    # NaN is not valid JSON; missing values are converted to null
+    if df.isna().to_numpy().any():
+        df = df.astype(object).where(df.notna(), None)
+    return df.to_dict(orient="records")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize `content` to JSON in a single pass.
+
+    Unlike FastAPI's default path, the content is not converted beforehand by
+    `jsonable_encoder`; objects unknown to the encoder are handled by
+    :func:`json_default` as they are found.
+    """
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        try:
+            return orjson.dumps(content, default=json_default, option=option)
+        except orjson.JSONEncodeError:
+            # arrays orjson can't represent, like datetime64 with NaT, are
+            # converted by json_default instead
+            option = orjson.OPT_NON_STR_KEYS
+            return orjson.dumps(content, default=json_default, option=option)
+    try:
+        return _json_dumps(content)
+    except ValueError:
+        # NaN is not valid JSON; orjson converts it to null too
+        return _json_dumps(_finite(content))
+
+
+def _json_dumps(content: Any) -> bytes:
+    return json.dumps(
+        content,
+        default=_json_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _json_default(obj: Any) -> Any:
+    return _finite(json_default(obj))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response which serializes numpy arrays, pandas objects, datetimes and
+    pydantic models directly.
+
+    When used as the `response_class` of a module route, or as the default
+    response class of the app, the results of the route skip FastAPI's
+    `jsonable_encoder`. Routes with a `response_model`, or a return annotation,
+    still get their results validated and filtered by it.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class ArrowResponse(Response):
+    """Response with a table serialized in the Arrow IPC streaming format."""
+
+    media_type = ARROW_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        import pyarrow as pa
+
+        table = to_arrow_table(content)
+        if table is None:
+            msg = f"Object of type {type(content).__name__} can't be converted to an Arrow table"
+            raise TypeError(msg)
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+def to_arrow_table(content: Any) -> Any:
+    """Convert a columnar result into a :class:`pyarrow.Table`, if possible.
+
+    Supports pandas DataFrames, and mappings of column names to sequences or
+    numpy arrays. Returns `None` for other kinds of content.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+
+    if isinstance(content, pa.Table):
+        return content
+    if type(content).__module__.startswith("pandas") and hasattr(content, "columns"):
+        return pa.Table.from_pandas(content, preserve_index=False)
+    if isinstance(content, Mapping) and all(
+        hasattr(value, "__len__") and not isinstance(value, (str, bytes, Mapping))
+        for value in content.values()
+    ):
+        try:
+            return pa.table(dict(content))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            return None
+    return None
+
+
+def response_model(func: Callable[..., Any], route_kwargs: dict[str, Any]) -> Any:
+    """Find the model FastAPI uses for the results of a route, or `None`."""
+    if "response_model" in route_kwargs:
+        return route_kwargs["response_model"]
+    model = get_typed_return_annotation(func)
+    if isinstance(model, type) and issubclass(model, Response):
+        return None
+    return model
+
+
+def response_encoder(
+    func: Callable[..., Any], route_kwargs: dict[str, Any]
+) -> Callable[[Any], Any]:
+    """Build the function which encodes the results of a route like FastAPI does.
+
+    Results are validated against the `response_model` of the route, or the
+    return annotation of `func`, and dumped with the `response_model_*` options
+    of the route; without a model, they go through `jsonable_encoder`.
+    """
+    model = response_model(func, route_kwargs)
+    if model is None:
+        return jsonable_encoder
+
+    adapter: TypeAdapter[Any] = TypeAdapter(model)
+    options = {
+        "include": route_kwargs.get("response_model_include"),
+        "exclude": route_kwargs.get("response_model_exclude"),
+        "by_alias": route_kwargs.get("response_model_by_alias", True),
+        "exclude_unset": route_kwargs.get("response_model_exclude_unset", False),
+        "exclude_defaults": route_kwargs.get("response_model_exclude_defaults", False),
+        "exclude_none": route_kwargs.get("response_model_exclude_none", False),
+    }
+
+    def encode(result: Any) -> Any:
+        value = adapter.validate_python(result, from_attributes=True)
+        return adapter.dump_python(value, mode="json", **options)
+
+    return encode
+
+
+def serializing_handler(
+    handler: Handler,
+    response_class: type[Response],
+    *,
+    status_code: Optional[int] = None,
+    encode: Optional[Callable[[Any], Any]] = None,
+) -> Handler:
+    """Wrap a handler to serialize its results directly with `response_class`.
+
+    Results which are already a :class:`Response` are returned unchanged; the
+    rest are converted by `encode` first, if set, usually to apply the response
+    model of the route. If the client accepts the Arrow IPC format and the
+    result is columnar, it is returned as an :class:`ArrowResponse` instead.
+    """
+    status = status_code or 200
+
+    async def serialize_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+        result = await handler(request, kwargs)
+        if isinstance(result, Response):
+            return result
+        if encode is not None:
+            result = encode(result)
+        if ARROW_MEDIA_TYPE in request.headers.get("accept", ""):
+            table = to_arrow_table(result)
+            if table is not None:
+                return ArrowResponse(table, status_code=status)
+        return response_class(result, status_code=status)
+
+    return serialize_handler
+
+
+def negotiate_stream_format(accept: Optional[str], default: str = "ndjson") -> str:
+    """Pick the streaming format for the media types accepted by the client."""
+    if not accept:
+        return default
+
+    candidates: list[tuple[float, int, str]] = []
+    for index, item in enumerate(accept.split(",")):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        candidates.append((-quality, index, media_type.lower()))
+
+    for quality, _, media_type in sorted(candidates):
+        if quality == 0:
+            break
+        for fmt, fmt_type in STREAM_MEDIA_TYPES.items():
+            if media_type == fmt_type:
+                return fmt
+        if media_type in ("*/*", "application/*"):
+            return default
+    return default
+
+
+class RecordStreamResponse(StreamingResponse):
+    """Streams the records yielded by an iterator, serialized in a format.
+
+    The records are serialized as newline-delimited JSON ("ndjson"), CSV
+    ("csv"), or the items of a JSON array ("json"). Records are grouped in
+    chunks of around `chunk_size` bytes before being sent. Synchronous
+    iterators are consumed in batches through `run_sync`, so the event loop
+    doesn't block; the iterator is closed when the response ends, including
+    when the client disconnects.
+    """
+
+    media_type = STREAM_MEDIA_TYPES["ndjson"]
+
+    def __init__(
+        self,
+        records: Iterable[Any] | AsyncIterable[Any],
+        *,
+        format: str = "ndjson",
+        columns: Optional[list[str]] = None,
+        chunk_size: int = 1 << 16,
+        batch_size: int = 256,
+        run_sync: Callable[..., Awaitable[Any]] = run_in_threadpool,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        if format not in STREAM_MEDIA_TYPES:
+            msg = f"Invalid stream format: {format!r}"
+            raise ValueError(msg)
+        self.records = records
+        self.format = format
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.run_sync = run_sync
+        super().__init__(
+            self._encode(),
+            status_code=status_code,
+            headers=headers,
+            media_type=STREAM_MEDIA_TYPES[format],
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._close()
+
+    async def _close(self) -> None:
+        records = self.records
+        if hasattr(records, "aclose"):
+            await records.aclose()
+        elif hasattr(records, "close"):
+            try:
+                records.close()
+            except ValueError:
+                # the generator is still running in a thread; it will be
+                # discarded when it yields again
+                pass
+
+    async def _iterate(self) -> AsyncIterator[list[Any]]:
+        records = self.records
+        if isinstance(records, AsyncIterable):
+            batch: list[Any] = []
+            async for record in records:
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        else:
+            iterator = iter(records)
+            while True:
+                batch = await self.run_sync(_take, iterator, self.batch_size)
+                if not batch:
+                    break
+                yield batch
+
+    async def _encode(self) -> AsyncIterator[bytes]:
+        encode = getattr(self, f"_encode_{self.format}")
+        buffer = io.StringIO()
+        first = True
+
+        if self.format == "json":
+            buffer.write("[")
+
+        async for batch in self._iterate():
+            if first and self.format == "csv":
+                self._write_csv_header(buffer, batch[0])
+            first = encode(buffer, batch, first)
+            if buffer.tell() >= self.chunk_size:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+
+        if self.format == "json":
+            buffer.write("]")
+        yield buffer.getvalue().encode("utf-8")
+
+    def _encode_ndjson(self, buffer: io.StringIO, batch: list[Any], first: bool) -> bool:
+        for record in batch:
+            buffer.write(_dumps_record(record))
+            buffer.write("\n")
+        return False
+
+    def _encode_json(self, buffer: io.StringIO, batch: list[Any], first: bool) -> bool:
+        for record in batch:
+            if not first:
+                buffer.write(",")
+            buffer.write(_dumps_record(record))
+            first = False
+        return first
+
+    def _write_csv_header(self, buffer: io.StringIO, record: Any) -> None:
+        if self.columns is None and isinstance(record, Mapping):
+            self.columns = list(record.keys())
+        if self.columns is not None:
+            csv.writer(buffer).writerow(self.columns)
+
+    def _encode_csv(self, buffer: io.StringIO, batch: list[Any], first: bool) -> bool:
+        writer = csv.writer(buffer)
+        columns = self.columns
+        for record in batch:
+            if isinstance(record, Mapping):
+                writer.writerow([record.get(column) for column in columns or ()])
+            else:
+                writer.writerow(record)
+        return False
+
+
+def _dumps_record(record: Any) -> str:
+    return dumps(record).decode("utf-8")
+
+
+def _take(iterator: Iterator[Any], size: int) -> list[Any]:
+    return list(itertools.islice(iterator, size))
+
+
+def streaming_handler(
+    func: Callable[..., Iterable[Any] | AsyncIterable[Any]],
+    *,
+    response_class: type[RecordStreamResponse] = RecordStreamResponse,
+    run_sync: Callable[..., Awaitable[Any]] = run_in_threadpool,
+) -> Handler:
+    """Wrap a generator function into a handler which streams its records.
+
+    The format of the stream is chosen from the `Accept` header of the request.
+    """
+
+    async def stream_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+        records = func(**kwargs)
+        fmt = negotiate_stream_format(request.headers.get("accept"))
+        return response_class(records, format=fmt, run_sync=run_sync)
+
+    return stream_handler
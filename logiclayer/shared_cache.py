@@ -0,0 +1,383 @@
+"""Shared cache module.
+
+Contains a cache storage in a memory-mapped file, shared by all the worker
+processes of a server in the same host, so the results stored by a worker can
+be reused by the others instead of being computed and kept once per worker.
+
+The file is split in sets of a fixed amount of slots of a fixed size. Each key
+is assigned to a set by its hash, and when the set is full its least recently
+used entry is replaced. Each set is protected by a lock on its byte range of
+the file, so workers only wait for each other when they use the same set.
+
+The range locks belong to the process, so the stores of a process using the
+same file share its descriptor, memory map and thread lock. Each process also
+holds a shared lock on the whole file while it's mapped, so a file in use is
+never resized by a process with a different geometry.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+from .cache import MISSING, CacheBackend, CacheStats
+from .common import LogicLayerException
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger("logiclayer.shared_cache")
+
+_MAGIC = b"LLSC0001"
+# magic, sets, ways, slot size
+_HEADER = struct.Struct("<8sIII")
+_HEADER_SIZE = 64
+# key digest, expiration time, last access time, length of the value
+_SLOT = struct.Struct("<16sddI")
+_EMPTY_SLOT = (b"", 0.0, 0.0, 0)
+
+
+class SharedStore:
+    """A key-value storage in a memory-mapped file, shared between processes.
+
+    Values are serialized with :mod:`pickle` by default; only processes which
+    can be trusted should have access to the file. Values larger than
+    `slot_size` once serialized are not stored.
+
+    All operations are synchronous and hold the lock of a set for the time it
+    takes to copy a value, so they can be used from async code.
+
+    Arguments:
+        path :str | Path | None:
+            The file where the values are stored. By default, a file named after
+            `name` in `/dev/shm`, or in the temporary directory if not available;
+            one of them must be set. All the processes must use the same path and geometry. A file
+            created with a different geometry is reset, unless it's still in
+            use, in which case a :class:`LogicLayerException` is raised.
+
+    Keyword Arguments:
+        name :str | None:
+            Name of the default file. It must be unique to the app, as the
+            stores of all the apps in the host with the same name share it.
+        max_entries :int:
+            Maximum amount of values stored, rounded up to a multiple of `ways`.
+        ways :int:
+            Amount of slots in each set. With `ways >= max_entries` the eviction
+            is a strict LRU across all the keys, but every operation checks all
+            the slots.
+        slot_size :int:
+            Maximum size in bytes of a stored value, once serialized. The file
+            takes `max_entries * slot_size` bytes, but the pages not used yet
+            are not allocated by the system.
+        ttl :float | None:
+            Default amount of seconds a value is valid.
+        dumps :Callable[[Any], bytes]:
+            Serializes a value.
+        loads :Callable[[bytes], Any]:
+            Deserializes a value.
+
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path, None] = None,
+        *,
+        name: Optional[str] = None,
+        max_entries: int = 1024,
+        ways: int = 8,
+        slot_size: int = 64 << 10,
+        ttl: Optional[float] = None,
+        dumps: Callable[[Any], bytes] = pickle.dumps,
+        loads: Callable[[bytes], Any] = pickle.loads,
+    ) -> None:
+        if fcntl is None:  # pragma: no cover
+            msg = "SharedStore requires a system with POSIX file locks."
+            raise LogicLayerException(msg)
+        if path is None and name is None:
+            msg = "SharedStore requires a path, or a name unique to the app"
+            raise ValueError(msg)
+        if max_entries < 1 or ways < 1 or slot_size <= 0:
+            msg = "max_entries, ways and slot_size must be positive"
+            raise ValueError(msg)
+
+        self.ways = min(ways, max_entries)
+        self.sets = -(-max_entries // self.ways)
+        self.slot_size = slot_size
+        self.max_entries = self.sets * self.ways
+        self.ttl = ttl
+        self.dumps = dumps
+        self.loads = loads
+        self.path = Path(path) if path is not None else _default_path(str(name))
+        self.stats = CacheStats()
+
+        self._index_size = self.ways * _SLOT.size
+        self._data_offset = _HEADER_SIZE + self.sets * self._index_size
+        header = _HEADER.pack(_MAGIC, self.sets, self.ways, slot_size)
+        self._file: Optional[_MappedFile] = _open_file(self.path, header, self._data_offset)
+        self._fd = self._file.fd
+        self._mmap = self._file.mmap
+
+    def __len__(self) -> int:
+        return self.usage()[0]
+
+    @contextlib.contextmanager
+    def _locked(self, start: int, length: int) -> Iterator[None]:
+        """Lock a range of the file, against other threads and processes."""
+        assert self._file is not None, "The store is closed"
+        with self._file.lock, _range_locked(self._fd, start, length):
+            yield
+
+    def _locate(self, key: str) -> tuple[bytes, int]:
+        digest = hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        index = int.from_bytes(digest[:8], "little") % self.sets
+        return digest, _HEADER_SIZE + index * self._index_size
+
+    def _slot_data(self, offset: int) -> int:
+        slot = (offset - _HEADER_SIZE) // _SLOT.size
+        return self._data_offset + slot * self.slot_size
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Retrieve the value stored for `key`, or `default`."""
+        digest, start = self._locate(key)
+        data = None
+        with self._locked(start, self._index_size):
+            now = time.time()
+            for offset in range(start, start + self._index_size, _SLOT.size):
+                slot_digest, expires, _, length = _SLOT.unpack_from(self._mmap, offset)
+                if length == 0 or slot_digest != digest:
+                    continue
+                if expires < now:
+                    _SLOT.pack_into(self._mmap, offset, *_EMPTY_SLOT)
+                    break
+                _SLOT.pack_into(self._mmap, offset, digest, expires, now, length)
+                position = self._slot_data(offset)
+                data = self._mmap[position : position + length]
+                break
+
+        if data is None:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        return self.loads(data)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store `value` under `key`, for `ttl` seconds or the default of the store.
+
+        Returns `False` if the value is too large to be stored.
+        """
+        data = self.dumps(value)
+        length = len(data)
+        if length == 0 or length > self.slot_size:
+            return False
+
+        ttl = self.ttl if ttl is None else ttl
+        digest, start = self._locate(key)
+        with self._locked(start, self._index_size):
+            now = time.time()
+            expires = now + ttl if ttl is not None else float("inf")
+            target = free = None
+            oldest = None
+            # the slot of the key is reused, even after a free slot
+            for offset in range(start, start + self._index_size, _SLOT.size):
+                fields = _SLOT.unpack_from(self._mmap, offset)
+                if fields[0] == digest and fields[3] > 0:
+                    target = offset
+                    break
+                if not _is_live(fields, now):
+                    if free is None:
+                        free = offset
+                elif oldest is None or fields[2] < oldest[1]:
+                    oldest = (offset, fields[2])
+            if target is None:
+                target = free
+            if target is None:
+                assert oldest is not None
+                target = oldest[0]
+                self.stats.evictions += 1
+
+            position = self._slot_data(target)
+            self._mmap[position : position + length] = data
+            _SLOT.pack_into(self._mmap, target, digest, expires, now, length)
+        return True
+
+    def delete(self, key: str) -> None:
+        """Remove the value stored under `key`, if present."""
+        digest, start = self._locate(key)
+        with self._locked(start, self._index_size):
+            for offset in range(start, start + self._index_size, _SLOT.size):
+                if _SLOT.unpack_from(self._mmap, offset)[0] == digest:
+                    _SLOT.pack_into(self._mmap, offset, *_EMPTY_SLOT)
+
+    def clear(self) -> None:
+        """Remove all the values stored, for all the processes."""
+        with self._locked(_HEADER_SIZE, self._data_offset - _HEADER_SIZE):
+            self._mmap[_HEADER_SIZE : self._data_offset] = bytes(self._data_offset - _HEADER_SIZE)
+
+    def usage(self) -> tuple[int, int]:
+        """Return the amount of values stored and their size in bytes.
+
+        The index is read without locks, so the result is approximate while
+        other processes are writing.
+        """
+        now = time.time()
+        entries = size = 0
+        for offset in range(_HEADER_SIZE, self._data_offset, _SLOT.size):
+            fields = _SLOT.unpack_from(self._mmap, offset)
+            if _is_live(fields, now):
+                entries += 1
+                size += fields[3]
+        return entries, size
+
+    def close(self) -> None:
+        """Release the memory map and the file descriptor of this process, once
+        all the stores using the file are closed."""
+        mapped, self._file = self._file, None
+        if mapped is not None:
+            _release_file(mapped)
+            self._fd = -1
+
+    def unlink(self) -> None:
+        """Close the storage and remove its file."""
+        self.close()
+        with contextlib.suppress(FileNotFoundError):
+            self.path.unlink()
+
+
+class SharedMemoryCache(CacheBackend):
+    """Response cache backend on a :class:`SharedStore`, shared by all the
+    workers in the host.
+
+    Receives the same arguments as :class:`SharedStore`, or an existing store
+    as `store`, to share it with other uses in the module.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path, None] = None,
+        *,
+        store: Optional[SharedStore] = None,
+        **kwargs: Any,
+    ) -> None:
+        self.store = store if store is not None else SharedStore(path, **kwargs)
+
+    @property
+    def stats(self) -> CacheStats:  # type: ignore[override]
+        stats = self.store.stats
+        stats.entries, stats.bytes = self.store.usage()
+        return stats
+
+    async def get(self, key: str) -> Any:
+        return self.store.get(key, MISSING)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        try:
+            self.store.set(key, value, ttl)
+        except (pickle.PicklingError, TypeError, AttributeError) as exc:
+            logger.debug("Value for key %s can't be stored in the shared cache: %s", key, exc)
+
+    async def delete(self, key: str) -> None:
+        self.store.delete(key)
+
+    async def clear(self) -> None:
+        self.store.clear()
+
+
+class _MappedFile:
+    """The descriptor, memory map and thread lock of a store file, shared by the
+    stores of a process which use the same path."""
+
+    def __init__(self, key: str, fd: int, header: bytes, size: int) -> None:
+        self.key = key
+        self.fd = fd
+        self.header = header
+        self.mmap = mmap.mmap(fd, size)
+        self.lock = threading.Lock()
+        self.refs = 0
+
+
+_files: dict[str, _MappedFile] = {}
+_files_lock = threading.Lock()
+
+
+def _open_file(path: Path, header: bytes, data_offset: int) -> _MappedFile:
+    """Map a store file, or reuse the map of the same file in this process."""
+    _, sets, ways, slot_size = _HEADER.unpack(header)
+    size = data_offset + sets * ways * slot_size
+    key = os.path.realpath(path)
+    with _files_lock:
+        mapped = _files.get(key)
+        if mapped is None:
+            mapped = _files[key] = _map_file(path, key, header, size, data_offset)
+        elif mapped.header != header:
+            msg = f"The shared cache file {path} is already open with a different geometry"
+            raise LogicLayerException(msg)
+        mapped.refs += 1
+        return mapped
+
+
+def _map_file(path: Path, key: str, header: bytes, size: int, data_offset: int) -> _MappedFile:
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        # tells the other processes the file is mapped
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        with _range_locked(fd, 0, _HEADER_SIZE):
+            current = os.pread(fd, _HEADER.size, 0)
+            if os.fstat(fd).st_size != size or current != header:
+                if current.startswith(_MAGIC):
+                    # resizing a file mapped by other processes would crash them
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        msg = f"The shared cache file {path} is in use with a different geometry"
+                        raise LogicLayerException(msg) from None
+                logger.debug("Initializing shared cache file %s", path)
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                os.pwrite(fd, header, 0)
+                fcntl.flock(fd, fcntl.LOCK_SH)
+            return _MappedFile(key, fd, header, size)
+    except BaseException:
+        os.close(fd)
+        raise
+
+
+def _release_file(mapped: _MappedFile) -> None:
+    with _files_lock:
+        mapped.refs -= 1
+        if mapped.refs > 0:
+            return
+        _files.pop(mapped.key, None)
+    mapped.mmap.close()
+    # closing the descriptor releases the locks of this process on the file
+    os.close(mapped.fd)
+
+
+@contextlib.contextmanager
+def _range_locked(fd: int, start: int, length: int) -> Iterator[None]:
+    fcntl.lockf(fd, fcntl.LOCK_EX, length, start, os.SEEK_SET)
+    try:
+        yield
+    finally:
+        fcntl.lockf(fd, fcntl.LOCK_UN, length, start, os.SEEK_SET)
+
+
+def _is_live(fields: tuple[bytes, float, float, int], now: float) -> bool:
+    return fields[3] > 0 and fields[1] >= now
+
+
+def _default_path(name: str) -> Path:
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return Path(directory, f"{name}.llcache")
@@ -0,0 +1,448 @@
+"""Static files module.
+
+Contains a static files app which indexes its directory when the server
+starts: the ETags of the files are computed from their content, compressible
+files get a gzip variant, and the small files are kept in memory. Requests
+are answered from the index, without touching the disk for the files kept in
+memory, and sending the rest with `sendfile` when the server supports it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses as dcls
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+import time
+from email.utils import formatdate
+from pathlib import Path
+from typing import Optional, Union
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from .etag import etag_matches
+
+logger = logging.getLogger("logiclayer.static")
+
+EXTRA_MEDIA_TYPES = {
+    ".geojson": "application/geo+json",
+    ".topojson": "application/json",
+    ".mjs": "text/javascript",
+    ".gz": "application/gzip",
+}
+
+COMPRESSIBLE_MEDIA_TYPES = frozenset(
+    (
+        "application/geo+json",
+        "application/javascript",
+        "application/json",
+        "application/wasm",
+        "application/xml",
+        "image/svg+xml",
+    )
+)
+
+_READ_SIZE = 1 << 20
+
+
+@dcls.dataclass(frozen=True)
+class StaticConfig:
+    """Defines how an indexed static folder is served.
+
+    Attributes:
+        memory_file_size :int:
+            Files up to this size in bytes are kept in memory.
+        memory_budget :int:
+            Maximum amount of bytes kept in memory for the whole folder,
+            including the gzip variants.
+        gzip :bool:
+            Serves a gzip variant of compressible files to the clients which
+            accept it. Existing `.gz` files next to the originals are used if
+            they are newer; otherwise the variant is built when indexing.
+        gzip_min_size :int:
+            Files smaller than this are not compressed.
+        gzip_level :int:
+            Compression level used to build the gzip variants.
+        cache_control :str | None:
+            Value of the `Cache-Control` header of the responses.
+        watch :float | None:
+            If set, the folder is checked for changes every this amount of
+            seconds, and the index is updated.
+        follow_symlinks :bool:
+            Serves the files reached through symbolic links which point
+            outside the folder. By default, these files are not served.
+
+    """
+
+    memory_file_size: int = 256 << 10
+    memory_budget: int = 64 << 20
+    gzip: bool = True
+    gzip_min_size: int = 1024
+    gzip_level: int = 6
+    cache_control: Optional[str] = None
+    watch: Optional[float] = None
+    follow_symlinks: bool = False
+
+
+@dcls.dataclass
+class StaticVariant:
+    """A representation of a file, kept in memory or on disk."""
+
+    etag: str
+    size: int
+    body: Optional[bytes] = None
+    path: Optional[Path] = None
+    stat: Optional[os.stat_result] = None
+
+
+@dcls.dataclass
+class StaticEntry:
+    """A file in the index of a static folder."""
+
+    path: Path
+    media_type: str
+    mtime_ns: int
+    size: int
+    last_modified: str
+    identity: StaticVariant
+    gzip: Optional[StaticVariant] = None
+
+
+class IndexedStaticFiles(StaticFiles):
+    """Serves the files of a directory from an index built when the app starts.
+
+    Requests for files not in the index, like the files added after the index
+    was built when not watching the directory, are served by the regular
+    :class:`StaticFiles` logic. The files in the index are expected not to
+    change unless the directory is watched.
+    """
+
+    def __init__(
+        self,
+        *,
+        directory: Union[str, Path],
+        html: bool = False,
+        config: Optional[StaticConfig] = None,
+    ) -> None:
+        self.config = config or StaticConfig()
+        super().__init__(directory=directory, html=html, follow_symlink=self.config.follow_symlinks)
+        self.root = Path(directory)
+        self.entries: dict[str, StaticEntry] = {}
+        self.memory_size = 0
+        self._cache_dir: Optional[Path] = None
+        self._task: Optional[asyncio.Task[None]] = None
+
+    async def startup(self) -> None:
+        """Build the index, and start watching the directory if configured."""
+        start = time.perf_counter()
+        await run_in_threadpool(self.refresh)
+        logger.info(
+            "Indexed %d static files in %s in %.3f seconds (%d bytes in memory)",
+            len(self.entries),
+            self.root,
+            time.perf_counter() - start,
+            self.memory_size,
+        )
+        if self.config.watch is not None and self._task is None:
+            self._task = asyncio.create_task(self._watch(self.config.watch))
+
+    async def shutdown(self) -> None:
+        """Stop watching the directory and remove the gzip variants built."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        cache_dir, self._cache_dir = self._cache_dir, None
+        if cache_dir is not None:
+            await run_in_threadpool(shutil.rmtree, cache_dir, True)
+
+    async def _watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await run_in_threadpool(self.refresh)
+            except Exception:
+                logger.exception("Failed to refresh the index of %s", self.root)
+
+    def refresh(self) -> None:
+        """Scan the directory, indexing the new and changed files.
+
+        The files which didn't change keep their entry.
+        """
+        previous = self.entries
+        entries: dict[str, StaticEntry] = {}
+        budget = [self.config.memory_budget]
+        changed = 0
+
+        # the smallest files are indexed first, so they get the memory budget
+        files = _walk(self.root, follow_symlinks=self.config.follow_symlinks)
+        files.sort(key=lambda item: item[1].st_size)
+        for path, stat in files:
+            key = os.path.normpath(os.path.relpath(path, self.root))
+            entry = previous.get(key)
+            if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+                entry = self._index(path, stat, budget)
+                changed += 1
+            else:
+                budget[0] -= _memory_size(entry)
+            entries[key] = entry
+
+        if changed or len(entries) != len(previous):
+            logger.debug("Index of %s updated: %d files changed", self.root, changed)
+        self.entries = entries
+        self.memory_size = self.config.memory_budget - budget[0]
+
+    def _index(self, path: Path, stat: os.stat_result, budget: list[int]) -> StaticEntry:
+        config = self.config
+        suffix = path.suffix.lower()
+        media_type = (
+            EXTRA_MEDIA_TYPES.get(suffix)
+            or mimetypes.guess_type(path.name)[0]
+            or "application/octet-stream"
+        )
+
+        size = stat.st_size
+        in_memory = size <= config.memory_file_size and size <= budget[0]
+        body, digest = _read(path, keep=in_memory)
+        if in_memory:
+            budget[0] -= size
+        identity = StaticVariant(
+            etag=f'"{digest}"',
+            size=size,
+            body=body,
+            path=None if in_memory else path,
+            stat=stat,
+        )
+        entry = StaticEntry(
+            path=path,
+            media_type=media_type,
+            mtime_ns=stat.st_mtime_ns,
+            size=size,
+            last_modified=formatdate(stat.st_mtime, usegmt=True),
+            identity=identity,
+        )
+        if config.gzip and size >= config.gzip_min_size and _is_compressible(media_type):
+            entry.gzip = self._gzip_variant(entry, digest, budget)
+        return entry
+
+    def _gzip_variant(
+        self,
+        entry: StaticEntry,
+        digest: str,
+        budget: list[int],
+    ) -> Optional[StaticVariant]:
+        """Load the `.gz` sibling of a file, or compress it."""
+        config = self.config
+        etag = f'"{digest}-gz"'
+        sibling = entry.path.with_name(entry.path.name + ".gz")
+        with contextlib.suppress(FileNotFoundError):
+            stat = sibling.stat()
+            if stat.st_mtime_ns >= entry.mtime_ns:
+                if stat.st_size <= config.memory_file_size and stat.st_size <= budget[0]:
+                    budget[0] -= stat.st_size
+                    return StaticVariant(etag, stat.st_size, body=sibling.read_bytes(), stat=stat)
+                return StaticVariant(etag, stat.st_size, path=sibling, stat=stat)
+
+        data = entry.identity.body
+        if data is None:
+            data = entry.path.read_bytes()
+        compressed = gzip.compress(data, config.gzip_level, mtime=0)
+        if len(compressed) >= len(data) * 0.9:
+            return None
+
+        size = len(compressed)
+        if size <= config.memory_file_size and size <= budget[0]:
+            budget[0] -= size
+            return StaticVariant(etag, size, body=compressed)
+
+        if self._cache_dir is None:
+            self._cache_dir = Path(tempfile.mkdtemp(prefix="logiclayer-static-"))
+        target = self._cache_dir / f"{digest}.gz"
+        target.write_bytes(compressed)
+        return StaticVariant(etag, size, path=target, stat=target.stat())
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+
+        entry = self.entries.get(path)
+        if entry is None and self.html and scope["path"].endswith("/"):
+            entry = self.entries.get(os.path.normpath(os.path.join(path, "index.html")))
+        if entry is None:
+            return await super().get_response(path, scope)
+        return self.entry_response(entry, scope)
+
+    def entry_response(self, entry: StaticEntry, scope: Scope) -> Response:
+        """Build the response for a file in the index."""
+        request_headers = Headers(scope=scope)
+        http_range = request_headers.get("range")
+
+        variant = entry.identity
+        headers = {"last-modified": entry.last_modified}
+        if entry.gzip is not None:
+            headers["vary"] = "Accept-Encoding"
+            accept = request_headers.get("accept-encoding", "")
+            # ranges are only served from the original file
+            if http_range is None and _accepts_gzip(accept):
+                variant = entry.gzip
+                headers["content-encoding"] = "gzip"
+        headers["etag"] = variant.etag
+        if self.config.cache_control is not None:
+            headers["cache-control"] = self.config.cache_control
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            etags = (entry.identity.etag, entry.gzip.etag if entry.gzip else None)
+            if etag_matches(if_none_match, etags):
+                return Response(status_code=304, headers=headers)
+
+        if variant.body is None:
+            assert variant.path is not None
+            return FileResponse(
+                variant.path,
+                headers=headers,
+                media_type=entry.media_type,
+                stat_result=variant.stat,
+            )
+
+        body = variant.body
+        head = scope["method"] == "HEAD"
+        if http_range is not None:
+            if_range = request_headers.get("if-range")
+            if if_range is None or if_range == variant.etag:
+                span = _parse_range(http_range, len(body))
+                if span is None:
+                    headers["content-range"] = f"bytes */{len(body)}"
+                    return Response(status_code=416, headers=headers)
+                if span != (0, len(body)):
+                    start, end = span
+                    headers["content-range"] = f"bytes {start}-{end - 1}/{len(body)}"
+                    headers["content-length"] = str(end - start)
+                    content = b"" if head else body[start:end]
+                    return Response(content, 206, headers, entry.media_type)
+
+        headers["accept-ranges"] = "bytes"
+        headers["content-length"] = str(len(body))
+        return Response(b"" if head else body, 200, headers, entry.media_type)
+
+
+def _walk(root: Path, *, follow_symlinks: bool) -> list[tuple[Path, os.stat_result]]:
+    """List the files in `root`, skipping the links outside it unless `follow_symlinks`.
+
+    Each directory is visited once, so links to a parent directory don't make
+    the walk loop forever.
+    """
+    real_root = root.resolve()
+
+    def inside(path: str) -> bool:
+        return follow_symlinks or Path(os.path.realpath(path)).is_relative_to(real_root)
+
+    def first_visit(path: str) -> bool:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        key = (stat.st_dev, stat.st_ino)
+        if key in visited:
+            return False
+        visited.add(key)
+        return True
+
+    visited: set[tuple[int, int]] = set()
+    first_visit(str(root))
+    result = []
+    for dirpath, dirnames, filenames in os.walk(root, followlinks=True):
+        dirnames[:] = [
+            name
+            for name in dirnames
+            if inside(os.path.join(dirpath, name)) and first_visit(os.path.join(dirpath, name))
+        ]
+        for name in filenames:
+            path = Path(dirpath, name)
+            if not inside(str(path)):
+                logger.debug("Skipped static file linked outside of %s: %s", root, path)
+                continue
+            with contextlib.suppress(OSError):
+                result.append((path, path.stat()))
+    return result
+
+
+def _accepts_gzip(header: str) -> bool:
+    """Check if an `Accept-Encoding` header allows gzip, honoring its q-values."""
+    qualities: dict[str, float] = {}
+    for item in header.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def _read(path: Path, *, keep: bool) -> tuple[Optional[bytes], str]:
+    """Hash the content of a file, returning the content too if `keep`."""
+    digest = hashlib.blake2b(digest_size=16)
+    if keep:
+        body = path.read_bytes()
+        digest.update(body)
+        return body, digest.hexdigest()
+    with path.open("rb") as file:
+        while chunk := file.read(_READ_SIZE):
+            digest.update(chunk)
+    return None, digest.hexdigest()
+
+
+def _memory_size(entry: StaticEntry) -> int:
+    size = 0
+    for variant in (entry.identity, entry.gzip):
+        if variant is not None and variant.body is not None:
+            size += variant.size
+    return size
+
+
+def _is_compressible(media_type: str) -> bool:
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_MEDIA_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """Parse a single byte range, as a `(start, end)` slice of the content.
+
+    Returns the whole content for malformed or multiple ranges, which are
+    ignored, and `None` if the range can't be satisfied.
+    """
+    unit, _, value = header.partition("=")
+    if unit.strip() != "bytes" or "," in value:
+        return 0, size
+    first, sep, last = value.strip().partition("-")
+    if not sep:
+        return 0, size
+    try:
+        if not first:
+            length = int(last)
+            return (max(size - length, 0), size) if length > 0 and size else None
+        start = int(first)
+        end = int(last) + 1 if last else size
+    except ValueError:
+        return 0, size
+    if start >= size or end <= start:
+        return None
+    return start, min(end, size)
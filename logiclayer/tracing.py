@@ -0,0 +1,335 @@
+"""Tracing module.
+
+Contains the definitions to record the time spent in each phase of a request
+as spans, report them in the `Server-Timing` header of the response, and keep
+a sample of the traces in memory or in a local file for later inspection.
+
+Modules can record spans for their own code with :func:`span`, which does
+nothing when the request is not being traced.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses as dcls
+import functools
+import json
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Optional, Union
+
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .common import Handler
+
+logger = logging.getLogger("logiclayer.tracing")
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("logiclayer_trace", default=None)
+
+_NULL_SPAN = contextlib.nullcontext()
+
+_INVALID_TOKEN_CHARS = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+
+@dcls.dataclass(frozen=True)
+class TracingConfig:
+    """Defines how the requests to a LogicLayer app are traced.
+
+    Attributes:
+        sample_rate :float:
+            Fraction of the requests whose traces are kept, between 0 and 1.
+        slow_threshold :float | None:
+            Requests taking at least this amount of seconds are always kept.
+        buffer_size :int:
+            Amount of traces kept in memory, available from the debug route.
+        file :str | Path | None:
+            If set, the traces kept are also appended to this file, one JSON
+            object per line.
+        max_bytes :int:
+            Size of the file before it's rotated.
+        backup_count :int:
+            Amount of rotated files kept.
+        server_timing :bool:
+            Adds the duration of each phase to the `Server-Timing` header of
+            all responses.
+        path :str:
+            Path of the route to query the traces, only available when the app
+            is in debug mode.
+
+    """
+
+    sample_rate: float = 0.01
+    slow_threshold: Optional[float] = None
+    buffer_size: int = 1000
+    file: Union[str, Path, None] = None
+    max_bytes: int = 10 << 20
+    backup_count: int = 5
+    server_timing: bool = True
+    path: str = "/_debug/traces"
+
+
+@dcls.dataclass
+class Span:
+    """A named phase of a request, with its timing in `perf_counter` seconds."""
+
+    name: str
+    start: float
+    duration: float
+    attributes: dict[str, Any] = dcls.field(default_factory=dict)
+    error: Optional[str] = None
+
+
+class Trace:
+    """Keeps the spans recorded during a single request."""
+
+    def __init__(self, method: str, path: str) -> None:
+        self.id = os.urandom(8).hex()
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        # end of the handler, where the serialization of the result starts
+        self.mark: Optional[float] = None
+        self.spans: list[Span] = []
+
+    def add_span(
+        self,
+        name: str,
+        start: float,
+        end: float,
+        attributes: Optional[dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Record a span which started and ended at the provided times."""
+        self.spans.append(Span(name, start, end - start, attributes or {}, error))
+
+    def span(self, name: str, **attributes: Any) -> _SpanContext:
+        """Return a context manager which records its body as a span."""
+        return _SpanContext(self, name, attributes)
+
+    def server_timing(self, now: float) -> str:
+        """Render the spans recorded until `now` as a `Server-Timing` header."""
+        items = [
+            f"{_INVALID_TOKEN_CHARS.sub('_', item.name)};dur={item.duration * 1000:.3f}"
+            for item in self.spans
+        ]
+        items.append(f"app;dur={(now - self.start) * 1000:.3f}")
+        return ", ".join(items)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the trace as a serializable object, with times in milliseconds."""
+        start = self.start
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "timestamp": self.timestamp,
+            "duration": _ms(self.duration or 0.0),
+            "spans": [
+                {
+                    "name": item.name,
+                    "start": _ms(item.start - start),
+                    "duration": _ms(item.duration),
+                    "attributes": item.attributes,
+                    "error": item.error,
+                }
+                for item in self.spans
+            ],
+        }
+
+
+class _SpanContext:
+    __slots__ = ("attributes", "name", "start", "trace")
+
+    def __init__(self, trace: Trace, name: str, attributes: dict[str, Any]) -> None:
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+        self.start = 0.0
+
+    def __enter__(self) -> dict[str, Any]:
+        self.start = time.perf_counter()
+        return self.attributes
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        error = None if exc_type is None else exc_type.__name__
+        self.trace.add_span(self.name, self.start, time.perf_counter(), self.attributes, error)
+
+    async def __aenter__(self) -> dict[str, Any]:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.__exit__(exc_type, exc, tb)
+
+
+def current_trace() -> Optional[Trace]:
+    """Return the trace of the request being handled, if it's being traced."""
+    return _current_trace.get()
+
+
+def span(name: str, **attributes: Any) -> ContextManager[Any]:
+    """Record the execution of a block of code as a span of the current request.
+
+    Can be used with `with` and `async with`. The attributes are stored with the
+    span, and can be updated inside the block through the dict returned when
+    entering it. If the request is not being traced, nothing is recorded.
+
+    Usage:
+        with ll.span("query", table="sales") as attributes:
+            rows = run_query()
+            attributes["rows"] = len(rows)
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return trace.span(name, **attributes)
+
+
+def traced_handler(handler: Handler, *, route: str) -> Handler:
+    """Wrap a route handler to record the validation and handler phases.
+
+    The validation phase covers the routing of the request and the resolution
+    of its parameters, until the handler is called.
+    """
+
+    async def trace_handler(request: Request, kwargs: dict[str, Any]) -> Any:
+        trace = _current_trace.get()
+        if trace is None:
+            return await handler(request, kwargs)
+        trace.route = route
+        trace.add_span("validate", trace.start, time.perf_counter())
+        with trace.span("handler"):
+            result = await handler(request, kwargs)
+        trace.mark = time.perf_counter()
+        return result
+
+    return trace_handler
+
+
+def traced_exception_handler(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap an exception handler to record its execution as a span."""
+    if asyncio.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(request: Request, exc: Exception) -> Any:
+            with span("exception_handler", exception=type(exc).__name__):
+                return await func(request, exc)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def sync_wrapper(request: Request, exc: Exception) -> Any:
+        with span("exception_handler", exception=type(exc).__name__):
+            return func(request, exc)
+
+    return sync_wrapper
+
+
+class Tracer:
+    """Traces the requests to an ASGI app and keeps a sample of the traces."""
+
+    def __init__(self, config: TracingConfig) -> None:
+        self.config = config
+        self.buffer: deque[dict[str, Any]] = deque(maxlen=config.buffer_size)
+        self._file: Optional[RotatingFileHandler] = None
+        if config.file is not None:
+            self._file = RotatingFileHandler(
+                config.file,
+                maxBytes=config.max_bytes,
+                backupCount=config.backup_count,
+                encoding="utf-8",
+                delay=True,
+            )
+
+    async def handle(self, app: ASGIApp, scope: Scope, receive: Receive, send: Send) -> None:
+        """Call the app for an HTTP request, recording its trace."""
+        trace = Trace(scope["method"], scope["path"])
+        server_timing = self.config.server_timing
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                trace.status = message["status"]
+                if trace.mark is not None:
+                    trace.add_span("serialize", trace.mark, now)
+                if server_timing:
+                    header = (b"server-timing", trace.server_timing(now).encode("latin-1"))
+                    message = {**message, "headers": [*message.get("headers", ()), header]}
+            await send(message)
+
+        token = _current_trace.set(trace)
+        try:
+            await app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            trace.duration = time.perf_counter() - trace.start
+            if self._sampled(trace):
+                self.record(trace)
+
+    def _sampled(self, trace: Trace) -> bool:
+        config = self.config
+        threshold = config.slow_threshold
+        if threshold is not None and trace.duration is not None and trace.duration >= threshold:
+            return True
+        return random.random() < config.sample_rate
+
+    def record(self, trace: Trace) -> None:
+        """Store a trace in the buffer, and in the file if configured."""
+        data = trace.to_dict()
+        self.buffer.append(data)
+        if self._file is not None:
+            line = json.dumps(data, default=str, separators=(",", ":"))
+            self._file.handle(logging.makeLogRecord({"msg": line}))
+
+    def traces(
+        self,
+        *,
+        limit: int = 50,
+        path: Optional[str] = None,
+        min_duration: Optional[float] = None,
+    ) -> list[dict[str, Any]]:
+        """Return the most recent traces in the buffer, newest first.
+
+        Keyword Arguments:
+            limit :int:
+                Maximum amount of traces returned.
+            path :str | None:
+                Only return the traces of requests whose path starts with this.
+            min_duration :float | None:
+                Only return the traces which took at least this amount of
+                milliseconds.
+
+        """
+        result = []
+        for item in reversed(self.buffer):
+            if len(result) >= limit:
+                break
+            if path is not None and not item["path"].startswith(path):
+                continue
+            if min_duration is not None and item["duration"] < min_duration:
+                continue
+            result.append(item)
+        return result
+
+    def close(self) -> None:
+        """Close the file where the traces are written."""
+        if self._file is not None:
+            self._file.close()
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+from logiclayer.admission import AdmissionController
+
+
+class RolesAuth(ll.AuthProvider):
+    def get_roles(self, token):
+        return {token.value} if token else set()
+
+    def get_user(self, token):
+        return None
+
+
+class SlowModule(ll.LogicLayerModule):
+    @ll.route("GET", "/slow")
+    async def route_slow(self, delay: float = 0.2):
+        await asyncio.sleep(delay)
+        return "ok"
+
+    @ll.route("GET", "/limited", admission=ll.AdmissionPolicy(max_concurrent=1))
+    async def route_limited(self):
+        await asyncio.sleep(0.2)
+        return "ok"
+
+
+def concurrent_get(client: TestClient, *paths: str, headers=None):
+    async def run():
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    None,
+                    lambda path=path, index=index: client.get(
+                        path, headers=(headers or {}).get(index)
+                    ),
+                )
+                for index, path in enumerate(paths)
+            )
+        )
+
+    return asyncio.run(run())
+
+
+def test_module_limit():
+    layer = ll.LogicLayer(metrics_path="/_metrics")
+    policy = ll.AdmissionPolicy(max_concurrent=1, retry_after=5)
+    layer.add_module("/slow", SlowModule(), admission=policy)
+
+    with TestClient(app=layer) as client:
+        responses = concurrent_get(client, "/slow/slow", "/slow/slow")
+        metrics = client.get("/_metrics").text
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200, 503]
+    rejected = next(response for response in responses if response.status_code == 503)
+    assert rejected.headers["retry-after"] == "5"
+
+    stats = layer.admission_stats()["SlowModule"]
+    assert (stats.admitted, stats.rejected, stats.active) == (1, 1, 0)
+    assert 'logiclayer_admission_total{scope="SlowModule",outcome="rejected"} 1' in metrics
+
+
+def test_module_queue():
+    layer = ll.LogicLayer()
+    policy = ll.AdmissionPolicy(max_concurrent=1, max_queue=2, queue_timeout=0.1)
+    layer.add_module("/slow", SlowModule(), admission=policy)
+
+    with TestClient(app=layer) as client:
+        queued = concurrent_get(client, *["/slow/slow?delay=0.02"] * 3)
+        timed_out = concurrent_get(client, "/slow/slow?delay=0.3", "/slow/slow?delay=0.3")
+
+    assert [response.status_code for response in queued] == [200, 200, 200]
+    assert sorted(response.status_code for response in timed_out) == [200, 503]
+    stats = layer.admission_stats()["SlowModule"]
+    assert stats.timeouts == 1
+    assert stats.queued == 0
+
+
+def test_bypass_roles():
+    layer = ll.LogicLayer()
+    policy = ll.AdmissionPolicy(max_concurrent=1, bypass_roles={"admin"})
+    layer.add_module("/slow", SlowModule(auth=RolesAuth()), admission=policy)
+
+    with TestClient(app=layer) as client:
+        admin = {"Authorization": "Basic admin"}
+        responses = concurrent_get(client, "/slow/slow", "/slow/slow", headers={1: admin})
+
+    assert [response.status_code for response in responses] == [200, 200]
+    assert layer.admission_stats()["SlowModule"].bypassed == 1
+
+
+def test_route_limit():
+    layer = ll.LogicLayer()
+    layer.add_module("/slow", SlowModule())
+
+    with TestClient(app=layer) as client:
+        limited = concurrent_get(client, "/slow/limited", "/slow/limited")
+        unlimited = concurrent_get(client, "/slow/slow", "/slow/slow")
+
+    assert sorted(response.status_code for response in limited) == [200, 503]
+    assert [response.status_code for response in unlimited] == [200, 200]
+    assert list(layer.admission_stats()) == ["SlowModule:/limited"]
+
+
+def test_controller_handover():
+    controller = AdmissionController(ll.AdmissionPolicy(max_concurrent=1, max_queue=2), name="x")
+
+    async def run():
+        await controller.acquire()
+        waiter = asyncio.ensure_future(controller.acquire())
+        cancelled = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        controller.release()
+        await waiter
+        assert controller.stats.active == 1
+        controller.release()
+
+    asyncio.run(run())
+    assert controller.stats.active == 0
+    assert controller.stats.queued == 0
+    with pytest.raises(ValueError):
+        ll.AdmissionPolicy(max_concurrent=0)
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+from logiclayer.auth import parse_token
+
+
+class CountingAuth(ll.AuthProvider):
+    def __init__(self):
+        self.calls = 0
+
+    def get_roles(self, token):
+        self.calls += 1
+        if token is None:
+            return set()
+        if token.value == "broken":
+            raise ValueError("Identity service error")
+        return {token.value}
+
+    def get_user(self, token):
+        return None
+
+
+def test_parse_token():
+    class FakeRequest:
+        def __init__(self, headers, query_params=None):
+            self.headers = headers
+            self.query_params = query_params or {}
+
+    jwtoken = parse_token(FakeRequest({"authorization": "Bearer a.b.c"}))
+    assert jwtoken == ll.AuthToken(ll.AuthTokenType.JWTOKEN, "a.b.c")
+    oauth = parse_token(FakeRequest({"authorization": "Bearer abc"}))
+    assert oauth == ll.AuthToken(ll.AuthTokenType.OAUTH20, "abc")
+    param = parse_token(FakeRequest({}, {"token": "abc"}))
+    assert param == ll.AuthToken(ll.AuthTokenType.SEARCHPARAM, "abc")
+    assert parse_token(FakeRequest({})) is None
+
+
+def test_cached_auth_provider():
+    provider = CountingAuth()
+    auth = ll.CachedAuthProvider(provider, ttl=60, negative_ttl=60)
+    admin = ll.AuthToken(ll.AuthTokenType.BASIC, "admin")
+    broken = ll.AuthToken(ll.AuthTokenType.BASIC, "broken")
+
+    async def run():
+        results = await asyncio.gather(*(auth.get_roles(admin) for _ in range(5)))
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await auth.get_roles(broken)
+        return results
+
+    assert asyncio.run(run()) == [{"admin"}] * 5
+    assert provider.calls == 2
+
+
+def test_jwt_auth_provider():
+    jwt = pytest.importorskip("jwt")
+    auth = ll.JWTAuthProvider("secret", audience="logiclayer")
+    token = jwt.encode({"roles": ["admin"], "aud": "logiclayer"}, "secret")
+    forged = jwt.encode({"roles": ["admin"], "aud": "logiclayer"}, "other")
+
+    jwtoken = ll.AuthToken(ll.AuthTokenType.JWTOKEN, token)
+    assert asyncio.run(auth.get_roles(jwtoken)) == {"admin"}
+    assert asyncio.run(auth.get_roles(ll.AuthToken(ll.AuthTokenType.JWTOKEN, forged))) == set()
+    assert asyncio.run(auth.get_user(ll.AuthToken(ll.AuthTokenType.BASIC, token))) is None
+
+    class RolesModule(ll.LogicLayerModule):
+        @ll.route("GET", "/roles", cache=ll.CachePolicy(ttl=60))
+        async def route_roles(self):
+            return {"calls": 1}
+
+    layer = ll.LogicLayer()
+    layer.add_module("/jwt", RolesModule(auth=ll.CachedAuthProvider(auth)))
+    with TestClient(app=layer) as client:
+        res = client.get("/jwt/roles", headers={"Authorization": f"Bearer {token}"})
+
+    assert res.status_code == 200, res.text
+
+
+def test_jwt_leeway():
+    jwt = pytest.importorskip("jwt")
+    auth = ll.JWTAuthProvider("secret", leeway=60)
+    now = time.time()
+    expired = jwt.encode({"roles": "admin", "exp": int(now) - 10}, "secret")
+    forged = jwt.encode({"roles": "admin"}, "other")
+
+    # the leeway accepts a token which expired recently, until exp + leeway
+    assert auth.verify(expired) is not None
+    assert auth._tokens[expired][1] == int(now) - 10 + 60
+    # rejected tokens are not kept longer because of the leeway
+    assert auth.verify(forged) is None
+    assert auth._tokens[forged][1] <= time.time() + 5
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.requests import Request
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+
+
+class BatchModule(ll.LogicLayerModule):
+    @ll.route("GET", "/echo")
+    async def route_echo(self, value: int):
+        return {"value": value}
+
+    @ll.route("GET", "/slow")
+    async def route_slow(self, delay: float):
+        await asyncio.sleep(delay)
+        return {"delay": delay}
+
+    @ll.route("POST", "/sum")
+    def route_sum(self, numbers: list[int]):
+        return sum(numbers)
+
+    @ll.route("GET", "/whoami")
+    def route_whoami(self, request: Request):
+        return request.headers.get("authorization")
+
+
+def parse(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.fixture
+def layer():
+    layer = ll.LogicLayer(batch=ll.BatchConfig(timeout=5.0))
+    layer.add_module("/batch", BatchModule())
+    return layer
+
+
+def test_batch(layer: ll.LogicLayer):
+    items = [
+        {"id": "slow", "path": "/batch/slow", "query": {"delay": 0.2}},
+        {"id": "echo", "path": "/batch/echo", "query": {"value": 3}},
+        {"id": "sum", "method": "POST", "path": "/batch/sum", "body": [1, 2, 3]},
+        {"id": "invalid", "path": "/batch/echo?value=abc"},
+        {"id": "missing", "path": "/batch/missing"},
+    ]
+
+    with TestClient(app=layer) as client:
+        response = client.post("/_batch", json=items)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = parse(response)
+    by_id = {result["id"]: result for result in results}
+    assert by_id["echo"]["status"] == 200
+    assert by_id["echo"]["body"] == {"value": 3}
+    assert by_id["sum"]["body"] == 6
+    assert by_id["invalid"]["status"] == 422
+    assert by_id["missing"]["status"] == 404
+    assert [result["index"] for result in results if result["id"] == "slow"] == [0]
+    # results are sent as they complete
+    assert results[-1]["id"] == "slow"
+
+
+def test_batch_timeout(layer: ll.LogicLayer):
+    items = [{"path": "/batch/slow", "query": {"delay": 5}, "timeout": 0.1}]
+
+    with TestClient(app=layer) as client:
+        response = client.post("/_batch", json=items)
+
+    (result,) = parse(response)
+    assert result["status"] == 504
+
+
+def test_batch_headers(layer: ll.LogicLayer):
+    items = [
+        {"id": "forwarded", "path": "/batch/whoami"},
+        {"id": "own", "path": "/batch/whoami", "headers": {"Authorization": "Bearer other"}},
+        {"id": "nested", "method": "POST", "path": "/_batch", "body": []},
+        {"id": "invalid", "path": "/batch/whoami", "headers": {"Authorization": "Bearer ✓"}},
+    ]
+
+    with TestClient(app=layer) as client:
+        response = client.post("/_batch", json=items, headers={"Authorization": "Bearer abc"})
+
+    by_id = {result["id"]: result for result in parse(response)}
+    assert by_id["forwarded"]["body"] == "Bearer abc"
+    assert by_id["own"]["body"] == "Bearer other"
+    assert by_id["nested"]["status"] == 400
+    # an invalid header fails its own request, not the whole batch
+    assert by_id["invalid"]["status"] == 400
+    assert len(by_id) == 4
+
+
+def test_batch_limit():
+    layer = ll.LogicLayer(batch=ll.BatchConfig(max_requests=1))
+    items = [{"path": "/_health"}, {"path": "/_health"}]
+
+    with TestClient(app=layer) as client:
+        response = client.post("/_batch", json=items)
+
+    assert response.status_code == 413
@@ -0,0 +1,82 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+
+
+class CounterModule(ll.LogicLayerModule):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    @ll.route("GET", "/count", cache=ll.CachePolicy(ttl=60))
+    async def route_count(self, value: int = 0):
+        self.calls += 1
+        return {"calls": self.calls, "value": value}
+
+    @ll.route("GET", "/text/{name}", cache=ll.CachePolicy(ttl=60))
+    def route_text(self, name: str):
+        self.calls += 1
+        return name
+
+
+class RolesAuth(ll.AuthProvider):
+    def get_roles(self, token):
+        return {token.value} if token else set()
+
+    def get_user(self, token):
+        return None
+
+
+def test_route_cached():
+    module = CounterModule()
+    layer = ll.LogicLayer()
+    layer.add_module("/counter", module)
+
+    with TestClient(app=layer) as client:
+        res1 = client.get("/counter/count?value=1")
+        res2 = client.get("/counter/count?value=1")
+        res3 = client.get("/counter/count?value=2")
+        res4 = client.get("/counter/text/asdf")
+        res5 = client.get("/counter/text/asdf")
+
+    assert res1.json() == res2.json() == {"calls": 1, "value": 1}
+    assert res3.json() == {"calls": 2, "value": 2}
+    assert res4.json() == res5.json() == "asdf"
+    assert module.calls == 3
+
+    stats = module.cache_stats()
+    assert stats["/count"].hits == 1
+    assert stats["/count"].misses == 2
+
+
+def test_route_cached_roles():
+    module = CounterModule(auth=RolesAuth())
+    layer = ll.LogicLayer()
+    layer.add_module("/counter", module)
+
+    with TestClient(app=layer) as client:
+        res1 = client.get("/counter/count", headers={"Authorization": "Basic admin"})
+        res2 = client.get("/counter/count", headers={"Authorization": "Basic guest"})
+        res3 = client.get("/counter/count", headers={"Authorization": "Basic admin"})
+
+    assert res1.json() == res3.json() == {"calls": 1, "value": 0}
+    assert res2.json() == {"calls": 2, "value": 0}
+
+
+def test_memory_cache_eviction():
+    async def run():
+        cache = ll.MemoryCache(max_entries=2, max_bytes=10)
+        await cache.set("a", b"12345")
+        await cache.set("b", b"12345")
+        assert await cache.get("a") == b"12345"
+        await cache.set("c", b"123")
+        assert await cache.get("b") is ll.cache.MISSING
+        await cache.set("d", b"12345678901")
+        assert await cache.get("d") is ll.cache.MISSING
+        return cache.stats
+
+    stats = asyncio.run(run())
+    assert stats.entries == 2
+    assert stats.evictions == 1
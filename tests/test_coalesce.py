@@ -0,0 +1,54 @@
+import asyncio
+
+import httpx
+
+import logiclayer as ll
+
+
+class SlowModule(ll.LogicLayerModule):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    @ll.route("GET", "/slow", coalesce=True)
+    async def route_slow(self, value: int):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return {"value": value, "calls": self.calls}
+
+
+async def fetch_all(layer: ll.LogicLayer, *urls: str):
+    transport = httpx.ASGITransport(app=layer)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(client.get(url) for url in urls))
+
+
+def test_route_coalesced():
+    module = SlowModule()
+    layer = ll.LogicLayer()
+    layer.add_module("/slow", module)
+
+    urls = ["/slow/slow?value=1"] * 5 + ["/slow/slow?value=2"]
+    responses = asyncio.run(fetch_all(layer, *urls))
+
+    assert all(res.status_code == 200 for res in responses)
+    assert module.calls == 2
+    assert len({res.text for res in responses[:5]}) == 1
+    assert module.flight.stats.shared == 4
+    assert len(module.flight) == 0
+
+
+def test_layer_route_coalesced():
+    layer = ll.LogicLayer()
+    calls = []
+
+    @layer.route("/sum", coalesce=True)
+    async def route_sum(a: int, b: int):
+        calls.append((a, b))
+        await asyncio.sleep(0.05)
+        return a + b
+
+    responses = asyncio.run(fetch_all(layer, *["/sum?a=1&b=2"] * 3))
+
+    assert [res.json() for res in responses] == [3, 3, 3]
+    assert calls == [(1, 2)]
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+
+
+class SlowModule(ll.LogicLayerModule):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.cancelled = asyncio.Event()
+        self.stopped = threading.Event()
+
+    @ll.route("GET", "/async")
+    async def route_async(self, delay: float = 1.0):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return "done"
+
+    @ll.route("GET", "/sync", deadline=0.1)
+    def route_sync(self):
+        deadline = ll.current_deadline()
+        while not deadline.wait(0.01):
+            pass
+        self.stopped.set()
+        # the work stopped, but the result is not ready before the deadline
+        time.sleep(0.1)
+        return "late"
+
+    @ll.route("GET", "/remaining", deadline=5.0)
+    def route_remaining(self):
+        return ll.current_deadline().remaining()
+
+    @ll.route("GET", "/unlimited")
+    def route_unlimited(self):
+        return ll.current_deadline().remaining()
+
+
+def test_deadline_timeout():
+    module = SlowModule()
+    layer = ll.LogicLayer(metrics_path="/_metrics")
+    layer.add_module("/slow", module, deadline=0.1)
+
+    with TestClient(app=layer) as client:
+        fast = client.get("/slow/async", params={"delay": 0})
+        slow = client.get("/slow/async")
+        metrics = client.get("/_metrics").text
+
+    assert fast.status_code == 200
+    assert slow.status_code == 504
+    assert module.cancelled.is_set()
+    stats = layer.deadline_stats()["SlowModule:/async"]
+    assert (stats.completed, stats.timeouts, stats.disconnects) == (1, 1, 0)
+    assert 'logiclayer_aborted_total{scope="SlowModule:/async",reason="timeout"} 1' in metrics
+
+
+def test_deadline_sync():
+    module = SlowModule()
+    layer = ll.LogicLayer()
+    layer.add_module("/slow", module)
+
+    with TestClient(app=layer) as client:
+        response = client.get("/slow/sync")
+        assert module.stopped.wait(1)
+        remaining = client.get("/slow/remaining").json()
+        unlimited = client.get("/slow/unlimited").json()
+
+    assert response.status_code == 504
+    assert 4 < remaining <= 5
+    assert unlimited is None
+
+
+def test_deadline_disconnect():
+    module = SlowModule()
+    layer = ll.LogicLayer()
+    layer.add_module("/slow", module, deadline=float("inf"))
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/slow/async",
+        "raw_path": b"/slow/async",
+        "root_path": "",
+        "query_string": b"delay=5",
+        "headers": [(b"host", b"test")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }
+    messages = []
+
+    async def run():
+        received = 0
+
+        async def receive():
+            nonlocal received
+            received += 1
+            if received == 1:
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.sleep(0.1)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            messages.append(message)
+
+        start = time.perf_counter()
+        await layer(scope, receive, send)
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+
+    assert elapsed < 1
+    assert module.cancelled.is_set()
+    assert messages[0]["status"] == 499
+    assert layer.deadline_stats()["SlowModule:/async"].disconnects == 1
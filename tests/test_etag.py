@@ -0,0 +1,131 @@
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+import logiclayer as ll
+
+
+class Value(BaseModel):
+    value: int
+
+
+class VersionedModule(ll.LogicLayerModule):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    @ll.route("GET", "/versioned", etag="version")
+    def route_versioned(self, value: int = 0):
+        self.calls += 1
+        return {"value": value, "calls": self.calls}
+
+    @ll.route("GET", "/hashed", etag="hash")
+    def route_hashed(self):
+        self.calls += 1
+        return {"value": "constant"}
+
+    @ll.route("GET", "/filtered", etag="version", response_model=Value)
+    def route_filtered(self):
+        return {"value": 1, "secret": "hidden"}
+
+    @ll.route("GET", "/filtered-hash", etag="hash", response_model=Value)
+    def route_filtered_hash(self):
+        return {"value": 1, "secret": "hidden"}
+
+
+def test_version_etag():
+    module = VersionedModule()
+    module.set_data_version("v1")
+    layer = ll.LogicLayer()
+    layer.add_module("/data", module)
+
+    with TestClient(app=layer) as client:
+        first = client.get("/data/versioned", params={"value": 1})
+        etag = first.headers["etag"]
+        repeated = client.get(
+            "/data/versioned", params={"value": 1}, headers={"If-None-Match": etag}
+        )
+        other = client.get("/data/versioned", params={"value": 2}, headers={"If-None-Match": etag})
+
+        module.set_data_version("v2")
+        updated = client.get(
+            "/data/versioned", params={"value": 1}, headers={"If-None-Match": etag}
+        )
+
+    assert first.status_code == 200
+    assert repeated.status_code == 304
+    assert repeated.headers["etag"] == etag
+    assert repeated.content == b""
+    assert other.status_code == 200
+    assert other.headers["etag"] != etag
+    assert updated.status_code == 200
+    assert updated.headers["etag"] != etag
+    # the conditional request with a matching tag didn't run the route
+    assert module.calls == 3
+
+
+def test_version_etag_without_version():
+    module = VersionedModule()
+    layer = ll.LogicLayer()
+    layer.add_module("/data", module)
+
+    with TestClient(app=layer) as client:
+        response = client.get("/data/versioned", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+
+
+def test_version_etag_varies_by_accept():
+    module = VersionedModule()
+    module.set_data_version("v1")
+    layer = ll.LogicLayer()
+    layer.add_module("/data", module)
+
+    with TestClient(app=layer) as client:
+        json = client.get("/data/versioned", headers={"Accept": "application/json"})
+        other = client.get("/data/versioned", headers={"Accept": "text/csv"})
+
+    assert json.headers["etag"] != other.headers["etag"]
+
+
+def test_hash_etag():
+    module = VersionedModule()
+    layer = ll.LogicLayer()
+    layer.add_module("/data", module)
+
+    with TestClient(app=layer) as client:
+        first = client.get("/data/hashed")
+        etag = first.headers["etag"]
+        repeated = client.get("/data/hashed", headers={"If-None-Match": f"W/{etag}"})
+
+    assert first.status_code == 200
+    assert first.json() == {"value": "constant"}
+    assert repeated.status_code == 304
+    assert repeated.headers["etag"] == etag
+    assert module.calls == 2
+
+
+def test_invalid_etag_mode():
+    with pytest.raises(ValueError):
+        ll.route("GET", "/", etag="strong")
+    with pytest.raises(ValueError):
+        ll.route("GET", "/", etag="version", mode="job")
+
+
+def test_etag_response_model():
+    module = VersionedModule()
+    module.set_data_version("v1")
+    layer = ll.LogicLayer()
+    layer.add_module("/data", module)
+
+    with TestClient(app=layer) as client:
+        versioned = client.get("/data/filtered")
+        repeated = client.get(
+            "/data/filtered", headers={"If-None-Match": versioned.headers["etag"]}
+        )
+        hashed = client.get("/data/filtered-hash")
+
+    assert versioned.json() == hashed.json() == {"value": 1}
+    assert repeated.status_code == 304
+    assert "etag" in hashed.headers
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+import httpx
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+
+
+class ThreadModule(ll.LogicLayerModule):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.threads = set()
+        self.release = threading.Event()
+
+    @ll.healthcheck
+    def check_thread(self):
+        self.threads.add(threading.current_thread().name)
+        return True
+
+    @ll.route("GET", "/thread")
+    def route_thread(self):
+        return {"thread": threading.current_thread().name}
+
+    @ll.route("GET", "/block")
+    def route_block(self):
+        self.release.wait(5)
+        return {}
+
+
+def test_module_executor():
+    module = ThreadModule()
+    layer = ll.LogicLayer()
+    layer.add_module("/thread", module, executor=ll.ExecutorConfig(max_workers=2))
+
+    with TestClient(app=layer) as client:
+        res1 = client.get("/thread/thread")
+        res2 = client.get("/_health")
+
+    assert res1.status_code == 200, res1.text
+    assert res1.json()["thread"].startswith("logiclayer-ThreadModule")
+    assert res2.status_code == 204, res2.text
+    assert all(name.startswith("logiclayer-ThreadModule") for name in module.threads)
+    assert layer.executor_stats()["/thread"].completed == 2
+
+
+def test_module_executor_saturated():
+    module = ThreadModule(executor=ll.ExecutorConfig(max_workers=1, queue_size=1))
+    layer = ll.LogicLayer()
+    layer.add_module("/thread", module)
+
+    async def run():
+        transport = httpx.ASGITransport(app=layer)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            tasks = [asyncio.create_task(client.get("/thread/block")) for _ in range(2)]
+            await asyncio.sleep(0.1)
+            rejected = await client.get("/thread/block")
+            module.release.set()
+            return rejected, await asyncio.gather(*tasks)
+
+    rejected, accepted = asyncio.run(run())
+
+    assert rejected.status_code == 503, rejected.text
+    assert rejected.headers["Retry-After"] == "1"
+    assert [res.status_code for res in accepted] == [200, 200]
+    assert module.executor.stats.rejected == 1
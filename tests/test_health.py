@@ -0,0 +1,63 @@
+import time
+
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+
+
+class CheckModule(ll.LogicLayerModule):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+        self.healthy = True
+
+    @ll.healthcheck
+    def check_sync(self):
+        self.calls += 1
+        if not self.healthy:
+            raise RuntimeError("Service unavailable")
+        return True
+
+    @ll.healthcheck(timeout=0.05)
+    def check_slow(self):
+        time.sleep(0.2 if not self.healthy else 0)
+        return True
+
+
+def test_healthcheck_on_demand():
+    module = CheckModule()
+    layer = ll.LogicLayer()
+    layer.add_module("/check", module)
+
+    with TestClient(app=layer) as client:
+        res1 = client.get("/_health")
+        module.healthy = False
+        res2 = client.get("/_health")
+        res3 = client.get("/_health/details")
+
+    assert res1.status_code == 204, res1.text
+    assert res2.status_code == 500, res2.text
+    assert module.calls == 3
+
+    details = {item["name"]: item for item in res3.json()}
+    assert res3.status_code == 500
+    assert details["CheckModule.check_sync"]["last_failure"] == "RuntimeError: Service unavailable"
+    assert details["CheckModule.check_slow"]["last_failure"].startswith("Timed out")
+
+
+def test_healthcheck_scheduled():
+    module = CheckModule()
+    layer = ll.LogicLayer(healthcheck_interval=60)
+    layer.add_module("/check", module)
+
+    with TestClient(app=layer) as client:
+        res1 = client.get("/_health")
+        module.healthy = False
+        res2 = client.get("/_health")
+        res3 = client.get("/_health/details")
+
+    assert res1.status_code == 204, res1.text
+    assert res2.status_code == 204, res2.text
+    assert res3.status_code == 200, res3.text
+    assert module.calls == 1
+    assert all(item["healthy"] for item in res3.json())
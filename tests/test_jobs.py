@@ -0,0 +1,177 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+import logiclayer as ll
+
+
+class Total(BaseModel):
+    year: int
+    total: int
+
+
+class ReportModule(ll.LogicLayerModule):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    @ll.route("GET", "/report", mode="job")
+    async def route_report(self, year: int):
+        self.calls += 1
+        await asyncio.sleep(0.2)
+        return {"year": year, "total": year * 2}
+
+    @ll.route("GET", "/rows", mode="job")
+    def route_rows(self, count: int):
+        for index in range(count):
+            yield {"index": index}
+
+    @ll.route("GET", "/broken", mode="job")
+    def route_broken(self):
+        raise ValueError("broken")
+
+    @ll.route("GET", "/slow", mode="job")
+    async def route_slow(self):
+        await asyncio.sleep(10)
+
+    @ll.route("GET", "/total", mode="job", response_model=Total)
+    def route_total(self, year: int):
+        return {"year": year, "total": year * 2, "secret": "hidden"}
+
+
+def wait_for(client: TestClient, location: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(location).json()
+        if status["status"] not in ("queued", "running"):
+            return status
+        time.sleep(0.02)
+    raise TimeoutError(location)
+
+
+def test_job_lifecycle():
+    module = ReportModule()
+    layer = ll.LogicLayer()
+    layer.add_module("/reports", module)
+
+    with TestClient(app=layer) as client:
+        res1 = client.get("/reports/report?year=2020")
+        res2 = client.get("/reports/report?year=2020")
+        res3 = client.get("/reports/report?year=2021")
+        assert res1.status_code == 202
+        assert res1.json()["id"] == res2.json()["id"] != res3.json()["id"]
+
+        location = res1.headers["location"]
+        assert location.endswith(f"/reports/_jobs/{res1.json()['id']}")
+        assert client.get(f"{location}/result").status_code == 409
+
+        status = wait_for(client, location)
+        assert status["status"] == "done"
+        assert status["media_type"] == "application/json"
+        result = client.get(f"{location}/result")
+        assert result.json() == {"year": 2020, "total": 4040}
+        assert status["size"] == len(result.content)
+
+    assert module.calls == 2
+
+
+def test_job_stream_and_failure():
+    layer = ll.LogicLayer()
+    layer.add_module("/reports", ReportModule())
+
+    with TestClient(app=layer) as client:
+        location = client.get("/reports/rows?count=3").headers["location"]
+        assert wait_for(client, location)["status"] == "done"
+        result = client.get(f"{location}/result")
+        assert result.headers["content-type"].startswith("application/x-ndjson")
+        assert result.text.splitlines() == ['{"index":0}', '{"index":1}', '{"index":2}']
+
+        location = client.get("/reports/broken").headers["location"]
+        status = wait_for(client, location)
+        assert status["status"] == "failed"
+        assert status["error"] == "ValueError: broken"
+
+        assert client.get("/reports/_jobs/unknown").status_code == 404
+
+
+def test_job_cancel():
+    layer = ll.LogicLayer()
+    layer.add_module("/reports", ReportModule())
+
+    with TestClient(app=layer) as client:
+        location = client.get("/reports/slow").headers["location"]
+        status = client.delete(location).json()
+        assert status["status"] == "cancelled"
+        assert client.get(location).json()["status"] == "cancelled"
+        assert client.get(f"{location}/result").status_code == 409
+
+
+def test_job_limits_and_disk_store(tmp_path):
+    config = ll.JobsConfig(workers=1, max_pending=1, ttl=0.5, store=ll.DiskJobStore(tmp_path))
+    layer = ll.LogicLayer(jobs=config)
+    layer.add_module("/reports", ReportModule())
+
+    with TestClient(app=layer) as client:
+        first = client.get("/reports/report?year=1")
+        client.get("/reports/report?year=2")
+        rejected = client.get("/reports/report?year=3")
+        assert rejected.status_code == 503
+        assert "retry-after" in rejected.headers
+
+        location = first.headers["location"]
+        assert wait_for(client, location)["status"] == "done"
+        job_id = first.json()["id"]
+        assert (tmp_path / f"{job_id}.result").exists()
+        assert client.get(f"{location}/result").json() == {"year": 1, "total": 2}
+
+        # another worker, sharing the directory, can answer for the job
+        other = ll.LogicLayer(jobs=config)
+        other.add_module("/reports", ReportModule())
+        with TestClient(app=other) as other_client:
+            assert other_client.get(f"{location}/result").json() == {"year": 1, "total": 2}
+
+        time.sleep(0.6)
+        asyncio.run(layer.jobs.purge())
+        assert not (tmp_path / f"{job_id}.result").exists()
+        assert client.get(location).status_code == 404
+
+
+def test_job_response_model():
+    layer = ll.LogicLayer()
+    layer.add_module("/reports", ReportModule())
+
+    with TestClient(app=layer) as client:
+        location = client.get("/reports/total?year=3").headers["location"]
+        assert wait_for(client, location)["status"] == "done"
+        assert client.get(f"{location}/result").json() == {"year": 3, "total": 6}
+
+
+def test_job_modules_separated():
+    layer = ll.LogicLayer()
+    layer.add_module("/first", ReportModule())
+    layer.add_module("/second", ReportModule())
+
+    with TestClient(app=layer) as client:
+        first = client.get("/first/report?year=1")
+        second = client.get("/second/report?year=1")
+        assert first.json()["id"] != second.json()["id"]
+        assert first.headers["location"].endswith(f"/first/_jobs/{first.json()['id']}")
+        assert second.headers["location"].endswith(f"/second/_jobs/{second.json()['id']}")
+
+        # a job can't be reached from the prefix of another module
+        assert client.get(f"/second/_jobs/{first.json()['id']}").status_code == 404
+        assert client.delete(f"/second/_jobs/{first.json()['id']}").status_code == 404
+
+
+def test_job_yield_dependencies():
+    class PooledModule(ll.LogicLayerModule):
+        @ll.route("GET", "/search", mode="job")
+        async def route_search(self, client=ll.resource("http")):
+            return []
+
+    layer = ll.LogicLayer()
+    with pytest.raises(ValueError, match="resource_http"):
+        layer.add_module("/pooled", PooledModule())
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+from logiclayer.common import LogicLayerException
+
+instances = []
+
+
+class LazyError(Exception):
+    pass
+
+
+class LazyTestModule(ll.LogicLayerModule):
+    def __init__(self, *, value: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.value = value
+        self.started = False
+        instances.append(self)
+
+    @ll.on_startup
+    async def event_startup(self):
+        self.started = True
+
+    @ll.healthcheck
+    def check(self):
+        return True
+
+    @ll.route("GET", "/value/{offset}")
+    def route_value(self, offset: int) -> dict:
+        return {"value": self.value + offset, "started": self.started}
+
+    @ll.route("GET", "/cached", cache=ll.CachePolicy(ttl=60))
+    async def route_cached(self):
+        return {"value": self.value}
+
+    @ll.route("GET", "/fail")
+    async def route_fail(self):
+        raise LazyError
+
+    @ll.exception_handler(LazyError)
+    def handle_error(self, request, exc):
+        return ll.FastJSONResponse({"error": self.value}, status_code=418)
+
+
+class ProcessModule(ll.LogicLayerModule):
+    @ll.route("GET", "/cpu", executor="process")
+    def route_cpu(self):
+        return 1
+
+
+@pytest.fixture(autouse=True)
+def clear_instances():
+    instances.clear()
+
+
+def test_lazy_on_first_request(caplog):
+    layer = ll.LogicLayer()
+    spec = ll.LazyModule("tests.test_lazy:LazyTestModule", {"value": 10}, preload=False)
+    layer.add_module("/lazy", spec)
+
+    # the route table is available before the instance exists
+    assert "/lazy/value/{offset}" in layer.app.openapi()["paths"]
+
+    with caplog.at_level(logging.INFO, logger="logiclayer.lazy"), TestClient(app=layer) as client:
+        assert instances == []
+        assert client.get("/lazy/value/1").json() == {"value": 11, "started": True}
+        assert client.get("/lazy/value/asdf").status_code == 422
+        assert client.get("/lazy/cached").json() == {"value": 10}
+        assert client.get("/lazy/fail").status_code == 418
+        assert client.get("/_health").status_code == 204
+
+    assert len(instances) == 1
+    assert layer.modules["/lazy"] is instances[0]
+    assert "Module LazyTestModule loaded in" in caplog.text
+
+
+def test_lazy_preload():
+    layer = ll.LogicLayer()
+    layer.add_module("/lazy", ll.LazyModule("tests.test_lazy.LazyTestModule"))
+
+    with TestClient(app=layer) as client:
+        loader = layer.loaders["/lazy"]
+        client.portal.call(asyncio.sleep, 0.05)
+        assert loader.loaded
+        assert client.get("/lazy/value/1").json() == {"value": 1, "started": True}
+
+    assert len(instances) == 1
+
+
+def test_lazy_invalid():
+    layer = ll.LogicLayer()
+    with pytest.raises(LogicLayerException):
+        layer.add_module("/lazy", ll.LazyModule("tests.test_lazy:LazyError"))
+    with pytest.raises(LogicLayerException):
+        layer.add_module("/lazy", ll.LazyModule("tests.test_lazy:ProcessModule"))
+
+
+def test_lazy_healthcheck_not_loaded():
+    layer = ll.LogicLayer()
+    layer.add_module("/lazy", ll.LazyModule("tests.test_lazy:LazyTestModule", preload=False))
+
+    with TestClient(app=layer) as client:
+        assert client.get("/_health").status_code == 204
+        details = client.get("/_health/details").json()
+        assert not layer.loaders["/lazy"].loaded
+        assert details[0]["healthy"] is True
+        assert details[0]["detail"] == "Module LazyTestModule is not loaded"
+
+        client.get("/lazy/value/1")
+        details = client.get("/_health/details").json()
+        assert details[0]["healthy"] is True
+        assert details[0]["detail"] is None
@@ -0,0 +1,169 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+from logiclayer.common import LogicLayerException
+from logiclayer.lifecycle import StartupFailed
+
+
+def slow_module(name: str) -> type[ll.LogicLayerModule]:
+    class SlowModule(ll.LogicLayerModule):
+        def __init__(self, events: list, *, delay: float = 0.2, fail: bool = False, **kwargs):
+            super().__init__(**kwargs)
+            self.events = events
+            self.delay = delay
+            self.fail = fail
+
+        @ll.on_startup
+        async def event_startup(self):
+            self.events.append(("start", self.name))
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("broken")
+            self.events.append(("started", self.name))
+
+        @ll.on_shutdown
+        def event_shutdown(self):
+            self.events.append(("stopped", self.name))
+
+    SlowModule.__name__ = SlowModule.__qualname__ = name
+    return SlowModule
+
+
+DatabaseModule = slow_module("DatabaseModule")
+ModelModule = slow_module("ModelModule")
+SearchModule = slow_module("SearchModule")
+
+
+class TimeoutModule(ll.LogicLayerModule):
+    @ll.on_startup(timeout=0.05)
+    async def event_startup(self):
+        await asyncio.sleep(10)
+
+
+def test_concurrent_startup():
+    events = []
+    layer = ll.LogicLayer()
+    layer.add_module("/db", DatabaseModule(events))
+    layer.add_module("/model", ModelModule(events))
+    layer.add_module("/search", SearchModule(events))
+
+    start = time.perf_counter()
+    with TestClient(app=layer):
+        elapsed = time.perf_counter() - start
+    assert elapsed < 0.5
+
+    results = [(item.module, item.event, item.status) for item in layer.lifecycle.results]
+    assert ("DatabaseModule", "startup", "ok") in results
+    assert ("SearchModule", "shutdown", "ok") in results
+    assert all(item.duration >= 0 for item in layer.lifecycle.results)
+
+
+def test_dependency_order():
+    events = []
+    layer = ll.LogicLayer()
+    layer.add_module("/search", SearchModule(events, delay=0.01), depends_on=["ModelModule"])
+    layer.add_module("/model", ModelModule(events, delay=0.01), depends_on=["DatabaseModule"])
+    layer.add_module("/db", DatabaseModule(events, delay=0.01))
+
+    with TestClient(app=layer):
+        pass
+
+    assert events == [
+        ("start", "DatabaseModule"),
+        ("started", "DatabaseModule"),
+        ("start", "ModelModule"),
+        ("started", "ModelModule"),
+        ("start", "SearchModule"),
+        ("started", "SearchModule"),
+        ("stopped", "SearchModule"),
+        ("stopped", "ModelModule"),
+        ("stopped", "DatabaseModule"),
+    ]
+
+
+def test_fail_fast():
+    events = []
+    layer = ll.LogicLayer()
+    layer.add_module("/db", DatabaseModule(events, delay=0.01))
+    layer.add_module("/model", ModelModule(events, delay=0.05, fail=True))
+    layer.add_module("/search", SearchModule(events, delay=5))
+
+    with pytest.raises(StartupFailed), TestClient(app=layer):
+        pass
+
+    # the slow module was cancelled, and only the started one was stopped
+    assert ("started", "SearchModule") not in events
+    assert ("stopped", "DatabaseModule") in events
+    assert ("stopped", "ModelModule") not in events
+    assert ("stopped", "SearchModule") not in events
+
+
+def test_timeout_degrade():
+    events = []
+    layer = ll.LogicLayer(startup_policy="degrade")
+    layer.add_module("/db", DatabaseModule(events, delay=0.01))
+    layer.add_module("/slow", TimeoutModule())
+    layer.add_module("/model", ModelModule(events, delay=0.01), depends_on=["TimeoutModule"])
+
+    with TestClient(app=layer) as client:
+        res = client.get("/_health/details")
+        assert client.get("/_health").status_code == 204
+
+    assert res.status_code == 200
+    assert all(item["degraded"] for item in res.json() if not item["healthy"])
+    failures = {item["name"]: item["last_failure"] for item in res.json() if not item["healthy"]}
+    assert failures == {
+        "TimeoutModule.startup": "Timed out after 0.05 seconds",
+        "ModelModule.startup": "A dependency failed to start",
+    }
+    assert ("started", "DatabaseModule") in events
+    assert ("start", "ModelModule") not in events
+    assert ("stopped", "ModelModule") not in events
+
+
+def test_invalid_dependencies():
+    layer = ll.LogicLayer()
+    layer.add_module("/db", DatabaseModule([]), depends_on=["ModelModule"])
+    layer.add_module("/model", ModelModule([]), depends_on=["DatabaseModule"])
+    with pytest.raises(LogicLayerException, match="Circular"), TestClient(app=layer):
+        pass
+
+    layer = ll.LogicLayer()
+    layer.add_module("/db", DatabaseModule([]), depends_on=["Unknown"])
+    with pytest.raises(LogicLayerException, match="unknown module"), TestClient(app=layer):
+        pass
+
+
+def test_degraded_module_routes():
+    events = []
+
+    class BrokenModule(ll.LogicLayerModule):
+        @ll.on_startup
+        def event_startup(self):
+            raise RuntimeError("broken")
+
+        @ll.on_shutdown
+        def event_shutdown(self):
+            events.append(("stopped", self.name))
+
+        @ll.route("GET", "/value")
+        def route_value(self):
+            return 1
+
+    layer = ll.LogicLayer(startup_policy="degrade")
+    layer.add_module("/db", DatabaseModule(events, delay=0.01))
+    layer.add_module("/broken", BrokenModule())
+
+    with TestClient(app=layer) as client:
+        res = client.get("/broken/value")
+        assert res.status_code == 503
+        assert "failed to start" in res.json()["detail"]
+        assert client.get("/_health").status_code == 204
+
+    # the failed module is not shut down
+    assert ("stopped", "DatabaseModule") in events
+    assert ("stopped", "BrokenModule") not in events
@@ -0,0 +1,188 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+
+
+class SchemaModule(ll.LogicLayerModule):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.loads: list[str] = []
+
+    @ll.memoize(tags=lambda cube: ("schema", f"cube:{cube}"))
+    def load_cube(self, cube: str):
+        self.loads.append(cube)
+        time.sleep(0.05)
+        return {"name": cube, "version": self.loads.count(cube)}
+
+    @ll.memoize(max_entries=2)
+    async def fetch_members(self, level: str):
+        self.loads.append(level)
+        await asyncio.sleep(0.05)
+        return [level]
+
+    @ll.memoize(ttl=0.05)
+    def build_lookup(self, items: list):
+        self.loads.append("lookup")
+        return set(items)
+
+    @ll.route("GET", "/cube/{name}")
+    def route_cube(self, name: str):
+        return self.load_cube(name)
+
+    @ll.route("GET", "/members")
+    async def route_members(self, level: str):
+        return await self.fetch_members(level)
+
+
+def test_sync_memoized():
+    module = SchemaModule()
+    assert module.load_cube("sales") == {"name": "sales", "version": 1}
+    assert module.load_cube("sales") == {"name": "sales", "version": 1}
+    # the arguments passed by name give the same key
+    assert module.load_cube(cube="sales")["version"] == 1
+    assert module.load_cube("stock") == {"name": "stock", "version": 1}
+    assert module.loads == ["sales", "stock"]
+
+    stats = module.memo_stats()["load_cube"]
+    assert (stats.hits, stats.misses, stats.entries) == (2, 2, 2)
+    assert stats.hit_ratio == 1 / 2
+
+
+def test_instances_separated():
+    first, second = SchemaModule(), SchemaModule()
+    first.load_cube("sales")
+    second.load_cube("sales")
+    assert first.loads == second.loads == ["sales"]
+    assert first.memos["load_cube"] is not second.memos["load_cube"]
+
+
+def test_sync_concurrent_calls_shared():
+    module = SchemaModule()
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(module.load_cube, ["sales"] * 8))
+    assert module.loads == ["sales"]
+    assert all(item is results[0] for item in results)
+
+
+def test_async_memoized():
+    module = SchemaModule()
+
+    async def main():
+        results = await asyncio.gather(*(module.fetch_members("year") for _ in range(5)))
+        assert all(item is results[0] for item in results)
+        await module.fetch_members("month")
+        await module.fetch_members("day")
+        await module.fetch_members("year")
+
+    asyncio.run(main())
+    # "year" was the least recently used when "day" was stored
+    assert module.loads == ["year", "month", "day", "year"]
+    stats = module.memo_stats()["fetch_members"]
+    assert (stats.entries, stats.evictions) == (2, 2)
+
+
+def test_async_errors_not_kept():
+    calls = []
+
+    class FailingModule(ll.LogicLayerModule):
+        @ll.memoize
+        async def fail(self):
+            calls.append(1)
+            raise ValueError("fail")
+
+    module = FailingModule()
+
+    async def main():
+        for _ in range(2):
+            try:
+                await module.fail()
+            except ValueError:
+                pass
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_ttl_and_unhashable():
+    module = SchemaModule()
+    module.build_lookup(["a", "b"])
+    module.build_lookup(["a", "b"])
+    # lists can't be keys, the calls are not memoized
+    assert module.loads == ["lookup", "lookup"]
+
+    class TupleModule(ll.LogicLayerModule):
+        calls = 0
+
+        @ll.memoize(ttl=0.05, key=lambda items: tuple(items))
+        def build_lookup(self, items: list):
+            TupleModule.calls += 1
+            return set(items)
+
+    module = TupleModule()
+    module.build_lookup(["a"])
+    module.build_lookup(["a"])
+    assert TupleModule.calls == 1
+    time.sleep(0.06)
+    module.build_lookup(["a"])
+    assert TupleModule.calls == 2
+
+
+def test_invalidate_by_tag():
+    module = SchemaModule()
+    module.load_cube("sales")
+    module.load_cube("stock")
+    assert module.invalidate("cube:sales") == 1
+    module.load_cube("sales")
+    module.load_cube("stock")
+    assert module.loads == ["sales", "stock", "sales"]
+
+    assert module.invalidate("schema") == 2
+    assert module.invalidate() == 0
+    assert module.memo_stats()["load_cube"].entries == 0
+
+
+def test_invalidate_during_call():
+    module = SchemaModule()
+    thread = threading.Thread(target=module.load_cube, args=("sales",))
+    thread.start()
+    time.sleep(0.01)
+    module.invalidate("schema")
+    thread.join()
+    # the result computed before the invalidation is not kept
+    assert module.memo_stats()["load_cube"].entries == 0
+
+
+def test_debug_routes():
+    layer = ll.LogicLayer(debug=True)
+    layer.add_module("/schema", SchemaModule())
+
+    with TestClient(layer) as client:
+        assert client.get("/schema/cube/sales").json()["version"] == 1
+        assert client.get("/schema/cube/sales").json()["version"] == 1
+        assert client.get("/schema/members", params={"level": "year"}).json() == ["year"]
+
+        res = client.get("/_debug/memoize")
+        stats = res.json()["SchemaModule:load_cube"]
+        assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+        assert "SchemaModule:fetch_members" in res.json()
+
+        res = client.post("/_debug/memoize/invalidate", params={"tag": "cube:sales"})
+        assert res.json() == {"invalidated": 1}
+        assert client.get("/schema/cube/sales").json()["version"] == 2
+
+        res = client.post("/_debug/memoize/invalidate", params={"module": "/schema"})
+        assert res.json() == {"invalidated": 2}
+        res = client.post("/_debug/memoize/invalidate", params={"module": "/other"})
+        assert res.status_code == 404
+
+
+def test_debug_routes_disabled():
+    layer = ll.LogicLayer()
+    layer.add_module("/schema", SchemaModule())
+    with TestClient(layer) as client:
+        assert client.post("/_debug/memoize/invalidate").status_code in (404, 405)
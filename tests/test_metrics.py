@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+from logiclayer.metrics import MetricsRegistry
+
+
+class MetricsModule(ll.LogicLayerModule):
+    @ll.healthcheck
+    def check(self):
+        return True
+
+    @ll.on_startup
+    def event_startup(self):
+        pass
+
+    @ll.route("GET", "/item/{item_id}")
+    def route_item(self, item_id: int):
+        return {"id": item_id}
+
+
+def test_metrics_endpoint():
+    layer = ll.LogicLayer(metrics_path="/_metrics")
+    layer.add_module("/mod", MetricsModule())
+
+    with TestClient(app=layer) as client:
+        client.get("/mod/item/1")
+        client.get("/mod/item/2")
+        client.get("/mod/item/asdf")
+        client.get("/_health")
+        res = client.get("/_metrics")
+
+    assert res.status_code == 200, res.text
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = res.text.splitlines()
+    assert (
+        'logiclayer_requests_total{module="MetricsModule",route="/mod/item/{item_id}",status="200"} 2'
+        in lines
+    )
+    assert (
+        'logiclayer_requests_total{module="MetricsModule",route="/mod/item/{item_id}",status="422"} 1'
+        in lines
+    )
+    assert (
+        'logiclayer_request_duration_seconds_count{module="MetricsModule",route="/mod/item/{item_id}"} 3'
+        in lines
+    )
+    assert "logiclayer_requests_in_flight 1" in lines
+    assert any(
+        line.startswith(
+            'logiclayer_healthcheck_duration_seconds_count{check="MetricsModule.check",healthy="true"}'
+        )
+        for line in lines
+    )
+    assert any(
+        line.startswith(
+            'logiclayer_hook_duration_seconds_count{module="MetricsModule",hook="event_startup",event="startup"}'
+        )
+        for line in lines
+    )
+
+
+def test_metrics_multiprocess(tmp_path):
+    registry = MetricsRegistry(directory=tmp_path)
+    other = MetricsRegistry()
+    other.requests.inc(("Mod", "/a", "200"), 3)
+    other.latency.observe(("Mod", "/a"), 0.02)
+    # emulate the snapshot written by another worker process
+    (tmp_path / f"logiclayer-metrics-{os.getppid()}.json").write_text(json.dumps(other.snapshot()))
+
+    registry.requests.inc(("Mod", "/a", "200"))
+    lines = registry.render().splitlines()
+
+    assert 'logiclayer_requests_total{module="Mod",route="/a",status="200"} 4' in lines
+    assert (
+        'logiclayer_request_duration_seconds_bucket{module="Mod",route="/a",le="0.025"} 1' in lines
+    )
+    assert registry.filename.exists()
+
+
+def test_metrics_finished_worker(tmp_path):
+    # a process id which is not running anymore
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    other = MetricsRegistry()
+    other.requests.inc(("Mod", "/a", "200"), 3)
+    other.in_flight.set((), 5)
+    path = tmp_path / f"logiclayer-metrics-{proc.pid}.json"
+    path.write_text(json.dumps(other.snapshot()))
+
+    registry = MetricsRegistry(directory=tmp_path)
+    registry.requests.inc(("Mod", "/a", "200"))
+    lines = registry.render().splitlines()
+
+    assert 'logiclayer_requests_total{module="Mod",route="/a",status="200"} 4' in lines
+    assert "logiclayer_requests_in_flight 5" not in lines
+    assert not path.exists()
+    # the counters are kept after the file is removed
+    lines = registry.render().splitlines()
+    assert 'logiclayer_requests_total{module="Mod",route="/a",status="200"} 4' in lines
@@ -0,0 +1,147 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+import logiclayer as ll
+
+
+class Member(BaseModel):
+    key: int
+    label: str
+
+
+class Total(BaseModel):
+    value: float
+
+
+class MembersModule(ll.LogicLayerModule):
+    @ll.route("GET", "/members", response_model=list[Member])
+    def route_members(self, level: str):
+        return []
+
+
+class TotalsModule(ll.LogicLayerModule):
+    @ll.route("GET", "/total", response_model=Total)
+    def route_total(self):
+        return Total(value=1)
+
+
+class ResourceModule(ll.LogicLayerModule):
+    @ll.route(["GET", "POST", "PUT", "DELETE"], "/resource")
+    def route_resource(self):
+        return {}
+
+
+def build_layer(config: ll.OpenAPIConfig) -> ll.LogicLayer:
+    layer = ll.LogicLayer(openapi=config)
+    layer.add_module("/members", MembersModule())
+    layer.add_module("/totals", TotalsModule())
+    return layer
+
+
+def test_openapi_etag():
+    layer = build_layer(ll.OpenAPIConfig())
+
+    with TestClient(app=layer) as client:
+        response = client.get("/openapi.json")
+        etag = response.headers["etag"]
+        repeated = client.get("/openapi.json", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    schema = response.json()
+    assert "/members/members" in schema["paths"]
+    assert "/totals/total" in schema["paths"]
+    assert repeated.status_code == 304
+    assert repeated.headers["etag"] == etag
+
+
+def test_openapi_split():
+    layer = build_layer(ll.OpenAPIConfig())
+
+    with TestClient(app=layer) as client:
+        members = client.get("/openapi.json", params={"prefix": "/members"})
+        missing = client.get("/openapi.json", params={"prefix": "/missing"})
+
+    schema = members.json()
+    assert list(schema["paths"]) == ["/members/members"]
+    assert "Member" in schema["components"]["schemas"]
+    assert "Total" not in schema["components"]["schemas"]
+    assert missing.status_code == 404
+
+
+def test_openapi_disk_cache(tmp_path: Path):
+    config = ll.OpenAPIConfig(cache_dir=tmp_path)
+    with TestClient(app=build_layer(config)) as client:
+        first = client.get("/openapi.json")
+    assert len(list(tmp_path.glob("openapi-*.json"))) == 1
+
+    layer = build_layer(config)
+
+    def fail():
+        raise AssertionError("The schema should be loaded from the cache")
+
+    layer.app.openapi = fail
+    with TestClient(app=layer) as client:
+        second = client.get("/openapi.json")
+
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.content == first.content
+
+
+def test_openapi_fingerprint():
+    first = build_layer(ll.OpenAPIConfig())
+    second = build_layer(ll.OpenAPIConfig())
+    assert first.openapi is not None
+    assert second.openapi is not None
+    assert first.openapi.fingerprint() == second.openapi.fingerprint()
+
+    second.add_module("/other", TotalsModule())
+    assert first.openapi.fingerprint() != second.openapi.fingerprint()
+
+
+def test_openapi_invalidation():
+    layer = build_layer(ll.OpenAPIConfig(eager=False))
+
+    with TestClient(app=layer) as client:
+        before = client.get("/openapi.json").json()
+        layer.add_module("/other", TotalsModule())
+        after = client.get("/openapi.json").json()
+
+    assert "/other/total" not in before["paths"]
+    assert "/other/total" in after["paths"]
+
+
+def test_openapi_no_split():
+    layer = build_layer(ll.OpenAPIConfig(split=False))
+
+    with TestClient(app=layer) as client:
+        response = client.get("/openapi.json", params={"prefix": "/members"})
+
+    assert "/totals/total" in response.json()["paths"]
+
+
+def test_openapi_fingerprint_hash_seed():
+    script = (
+        "import logiclayer as ll\n"
+        "from tests.test_openapi import ResourceModule, build_layer\n"
+        "layer = build_layer(ll.OpenAPIConfig())\n"
+        "layer.add_module('/resource', ResourceModule())\n"
+        "print(layer.openapi.fingerprint())\n"
+    )
+    root = Path(__file__).parent.parent
+    fingerprints = {
+        subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=root,
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        for seed in ("1", "2", "3")
+    }
+    assert len(fingerprints) == 1
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+
+
+class ProcessModule(ll.LogicLayerModule):
+    @ll.route("GET", "/pid", executor="process")
+    def route_pid(self):
+        return {"pid": os.getpid()}
+
+    @ll.route("GET", "/blob", executor="process")
+    def route_blob(self, size: int):
+        data = bytes(range(256)) * (size // 256)
+        return {"size": len(data), "tail": data[-1]}
+
+    @ll.route("GET", "/error", executor="process")
+    def route_error(self):
+        raise ValueError("Process error")
+
+    @ll.exception_handler(ValueError)
+    def exc_valueerror(self, request, exc):
+        return JSONResponse({"error": str(exc)}, status_code=400)
+
+
+def test_route_process():
+    layer = ll.LogicLayer(process_workers=1)
+    layer.add_module("/proc", ProcessModule())
+
+    with TestClient(app=layer) as client:
+        res1 = client.get("/proc/pid")
+        res2 = client.get("/proc/blob?size=2097152")
+        res3 = client.get("/proc/error")
+
+    assert res1.status_code == 200, res1.text
+    assert res1.json()["pid"] != os.getpid()
+    assert res2.json() == {"size": 2097152, "tail": 255}
+    assert res3.status_code == 400, res3.text
+    assert res3.json() == {"error": "Process error"}
+    assert not layer.process_pool.running
+
+
+def test_process_shared_memory():
+    np = pytest.importorskip("numpy")
+    from logiclayer.executor import _export_result, _import_result, _SharedArray
+
+    array = np.arange(1 << 18, dtype="float64")
+    exported = _export_result({"array": array, "small": b"abc"}, 1024)
+    assert isinstance(exported["array"], _SharedArray)
+    assert exported["small"] == b"abc"
+
+    imported = _import_result(exported)
+    assert np.array_equal(imported["array"], array)
+
+    dates = np.arange(1 << 18).astype("datetime64[s]")
+    deltas = np.arange(1 << 18).astype("timedelta64[ms]").reshape(2, -1)
+    exported = _export_result([dates, deltas], 1024)
+    assert all(isinstance(item, _SharedArray) for item in exported)
+    imported = _import_result(exported)
+    assert imported[0].dtype == dates.dtype
+    assert np.array_equal(imported[0], dates)
+    assert np.array_equal(imported[1], deltas)
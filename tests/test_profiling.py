@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+
+
+class ProfiledModule(ll.LogicLayerModule):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.retained = []
+
+    @ll.route("GET", "/busy")
+    def route_busy(self):
+        self.retained.append(bytearray(1 << 16))
+        return {"total": spin(0.02)}
+
+    @ll.route("GET", "/idle")
+    async def route_idle(self):
+        return {}
+
+
+def spin(seconds: float) -> int:
+    total = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+
+def test_profile_requests():
+    layer = ll.LogicLayer(debug=True)
+    layer.add_module("/mod", ProfiledModule(debug=True))
+
+    with TestClient(app=layer) as client:
+
+        def send_requests():
+            time.sleep(0.1)
+            for _ in range(5):
+                client.get("/mod/busy")
+
+        thread = threading.Thread(target=send_requests)
+        thread.start()
+        res = client.get(
+            "/_debug/profile",
+            params={"module": "ProfiledModule", "route": "/busy", "requests": 5, "seconds": 10},
+        )
+        thread.join()
+
+    assert res.status_code == 200, res.text
+    report = res.json()
+    assert report["requests"] == 5
+    assert report["samples"] > 0
+    assert report["stacks"]
+    assert all(stack.startswith("ProfiledModule.route_busy") for stack in report["stacks"])
+    assert any("spin" in stack for stack in report["stacks"])
+
+    (summary,) = report["allocations"]
+    assert summary["route"] == "/busy"
+    assert summary["size"] >= 5 << 16
+
+
+def test_profile_collapsed():
+    layer = ll.LogicLayer(debug=True)
+    layer.add_module("/mod", ProfiledModule(debug=True))
+
+    with TestClient(app=layer) as client:
+        res = client.get(
+            "/_debug/profile",
+            params={"seconds": 0.05, "memory": False, "format": "collapsed"},
+        )
+        assert res.status_code == 200, res.text
+        assert res.headers["content-type"].startswith("text/plain")
+
+        res = client.get("/_debug/profile", params={"module": "Unknown"})
+        assert res.status_code == 404
+
+
+@pytest.mark.parametrize("layer_debug, module_debug", [(False, True), (True, False)])
+def test_profiler_disabled(layer_debug, module_debug):
+    layer = ll.LogicLayer(debug=layer_debug)
+    module = ProfiledModule(debug=module_debug)
+    layer.add_module("/mod", module)
+
+    if layer.profiler is None:
+        with TestClient(app=layer) as client:
+            assert client.get("/_debug/profile").status_code == 404
+    else:
+        assert layer.profiler.routes == {}
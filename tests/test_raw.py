@@ -0,0 +1,119 @@
+import enum
+import sys
+from typing import Literal, Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+import logiclayer as ll
+
+
+class Color(enum.Enum):
+    RED = "red"
+    BLUE = "blue"
+
+
+class MissingKey(Exception):
+    pass
+
+
+class RawModule(ll.LogicLayerModule):
+    table = {1: "one", 2: "two"}
+
+    @ll.route("GET", "/item/{key:int}", raw=True)
+    def route_item(self, request: Request, key: int, upper: bool = False):
+        if key not in self.table:
+            raise MissingKey(key)
+        value = self.table[key]
+        return {"key": key, "value": value.upper() if upper else value}
+
+    @ll.route("GET", "/search", raw=True)
+    async def route_search(
+        self,
+        keys: list[int],
+        color: Optional[Color] = None,
+        order: Literal["asc", "desc"] = "asc",
+    ):
+        values = [self.table.get(key) for key in sorted(keys, reverse=order == "desc")]
+        return {"values": values, "color": color.value if color else None}
+
+    @ll.route("GET", "/text", raw=True)
+    async def route_text(self, request: Request):
+        return PlainTextResponse(request.url.path)
+
+    @ll.exception_handler(MissingKey)
+    def handle_lookup(self, request: Request, exc: MissingKey):
+        return PlainTextResponse(f"missing {exc}", status_code=404)
+
+
+@pytest.fixture
+def client():
+    layer = ll.LogicLayer()
+    layer.add_module("/raw", RawModule())
+    with TestClient(app=layer) as client:
+        yield client
+
+
+def test_raw_route(client: TestClient):
+    response = client.get("/raw/item/1", params={"upper": "true"})
+    assert response.status_code == 200
+    assert response.json() == {"key": 1, "value": "ONE"}
+
+    response = client.get("/raw/search", params={"keys": [2, 1], "color": "red"})
+    assert response.json() == {"values": ["one", "two"], "color": "red"}
+
+    response = client.get("/raw/text")
+    assert response.text == "/raw/text"
+
+
+def test_raw_route_validation(client: TestClient):
+    response = client.get("/raw/search", params={"keys": "a", "order": "random"})
+    assert response.status_code == 422
+    errors = {tuple(item["loc"]): item["type"] for item in response.json()["detail"]}
+    assert errors == {("query", "keys"): "int_parsing", ("query", "order"): "value_error"}
+
+    response = client.get("/raw/search")
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["type"] == "missing"
+
+
+def test_raw_route_exception_handler(client: TestClient):
+    response = client.get("/raw/item/3")
+    assert response.status_code == 404
+    assert response.text == "missing 3"
+
+
+def test_raw_route_schema(client: TestClient):
+    paths = client.get("/openapi.json").json()["paths"]
+    assert not any(path.startswith("/raw") for path in paths)
+
+
+def test_raw_route_options():
+    with pytest.raises(ValueError):
+        ll.route("GET", "/", raw=True, cache=ll.CachePolicy(ttl=10))
+
+    class InvalidModule(ll.LogicLayerModule):
+        @ll.route("GET", "/", raw=True)
+        def route_index(self, value: dict):
+            return value
+
+    layer = ll.LogicLayer()
+    with pytest.raises(ll.LogicLayerException):
+        layer.add_module("/invalid", InvalidModule())
+
+
+@pytest.mark.skipif(sys.version_info < (3, 10), reason="requires PEP 604 unions")
+def test_raw_route_union_type():
+    class UnionModule(ll.LogicLayerModule):
+        @ll.route("GET", "/count", raw=True)
+        def route_count(self, n: int | None = None):
+            return {"n": n}
+
+    layer = ll.LogicLayer()
+    layer.add_module("/union", UnionModule())
+    with TestClient(app=layer) as client:
+        assert client.get("/union/count", params={"n": "3"}).json() == {"n": 3}
+        assert client.get("/union/count").json() == {"n": None}
+        assert client.get("/union/count", params={"n": "x"}).status_code == 422
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+from logiclayer.common import LogicLayerException
+
+
+class Connection:
+    def __init__(self, events: list):
+        self.events = events
+        self.closed = False
+        events.append("open")
+
+    async def aclose(self):
+        self.closed = True
+        self.events.append("close")
+
+
+class PoolModule(ll.LogicLayerModule):
+    def __init__(self, pool: ll.ResourcePool, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+
+    @ll.route("GET", "/direct")
+    async def route_direct(self):
+        async with self.pool.acquire() as conn:
+            return {"closed": conn.closed}
+
+    @ll.route("GET", "/injected")
+    async def route_injected(self, conn=ll.resource("db")):
+        await asyncio.sleep(0.1)
+        return {"closed": conn.closed}
+
+
+def test_pool_lifecycle():
+    events = []
+    layer = ll.LogicLayer()
+    pool = layer.add_resource("db", ll.ResourcePool(lambda: Connection(events), min_size=2))
+    layer.add_module("/pool", PoolModule(layer.resources["db"]))
+    assert events == []
+
+    with TestClient(app=layer) as client:
+        assert events == ["open", "open"]
+        assert client.get("/pool/direct").json() == {"closed": False}
+        assert client.get("/pool/injected").json() == {"closed": False}
+        assert pool.stats.size == 2
+        assert pool.stats.checkouts == 2
+        assert pool.stats.in_use == 0
+
+    assert events == ["open", "open", "close", "close"]
+    assert pool.stats.size == 0
+
+
+def test_pool_discards_broken_resources():
+    events = []
+    pool = ll.ResourcePool(lambda: Connection(events), max_size=1)
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            async with pool.acquire():
+                raise RuntimeError("broken")
+        async with pool.acquire() as conn:
+            assert not conn.closed
+
+    asyncio.run(run())
+    assert events == ["open", "close", "open"]
+    assert pool.stats.size == 1
+
+
+def test_pool_limit_timeout():
+    events = []
+    layer = ll.LogicLayer(metrics_path="/_metrics")
+    layer.add_resource("db", ll.ResourcePool(lambda: Connection(events), max_size=1, timeout=0.02))
+    layer.add_module("/pool", PoolModule(layer.resources["db"]))
+
+    async def run():
+        with TestClient(app=layer) as client:
+            loop = asyncio.get_running_loop()
+            responses = await asyncio.gather(
+                *(loop.run_in_executor(None, client.get, "/pool/injected") for _ in range(3))
+            )
+            return responses, client.get("/_metrics").text
+
+    responses, text = asyncio.run(run())
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses[0] == 200
+    assert 503 in statuses
+    rejected = next(response for response in responses if response.status_code == 503)
+    assert "retry-after" in rejected.headers
+    assert events.count("open") == 1
+
+    stats = layer.resources.stats()["db"]
+    assert stats.timeouts == statuses.count(503)
+    assert 'logiclayer_pool_wait_seconds_count{pool="db"}' in text
+    assert 'logiclayer_pool_timeouts_total{pool="db"}' in text
+    assert 'logiclayer_pool_resources{pool="db",state="idle"} 1' in text
+
+
+def test_shared_resource():
+    events = []
+    layer = ll.LogicLayer()
+    shared = layer.add_resource("http", ll.SharedResource(lambda: Connection(events)))
+
+    with TestClient(app=layer):
+        assert events == ["open"]
+        assert shared.resource is not None
+    assert events == ["open", "close"]
+    assert shared.resource is None
+
+
+def test_lazy_module_resource_ref():
+    layer = ll.LogicLayer()
+    pool = layer.add_resource("db", ll.ResourcePool(lambda: Connection([])))
+    layer.add_module(
+        "/pool",
+        ll.LazyModule(
+            "tests.test_resources:PoolModule",
+            kwargs={"pool": ll.ResourceRef("db")},
+            preload=False,
+        ),
+    )
+
+    with TestClient(app=layer) as client:
+        assert client.get("/pool/direct").json() == {"closed": False}
+    assert layer.modules["/pool"].pool is pool
+
+
+def test_duplicate_and_unknown_pools():
+    layer = ll.LogicLayer()
+    layer.add_resource("db", ll.ResourcePool(lambda: None))
+    with pytest.raises(LogicLayerException):
+        layer.add_resource("db", ll.ResourcePool(lambda: None))
+    with pytest.raises(LogicLayerException):
+        layer.resources["missing"]
+
+
+def test_shared_resource_metrics():
+    layer = ll.LogicLayer(metrics_path="/_metrics")
+    shared = layer.add_resource("http", ll.SharedResource(lambda: Connection([])))
+
+    with TestClient(app=layer) as client:
+
+        async def hold():
+            async with shared.acquire(), shared.acquire():
+                return await asyncio.to_thread(client.get, "/_metrics")
+
+        text = asyncio.run(hold()).text
+
+    assert 'logiclayer_pool_resources{pool="http",state="in_use"} 2' in text
+    assert 'logiclayer_pool_resources{pool="http",state="idle"} 0' in text
@@ -0,0 +1,112 @@
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+import logiclayer as ll
+from logiclayer import responses
+
+
+class User(BaseModel):
+    name: str
+
+
+class DataModule(ll.LogicLayerModule):
+    @ll.route("GET", "/status", response_class=ll.FastJSONResponse)
+    def route_status(self):
+        return ll.ModuleStatus(module="DataModule", version="1.0", debug=False, status="ok")
+
+    @ll.route("GET", "/user", response_model=User, response_class=ll.FastJSONResponse)
+    def route_user(self):
+        return {"name": "a", "password": "secret"}
+
+    @ll.route("GET", "/dates")
+    def route_dates(self):
+        return {"date": datetime.date(2024, 1, 2), "items": {1, 2}}
+
+    @ll.route("GET", "/array")
+    def route_array(self):
+        np = pytest.importorskip("numpy")
+        return {"values": np.array([1.5, np.nan, 3.0]), "total": np.float64(4.5)}
+
+    @ll.route("GET", "/missing")
+    def route_missing(self):
+        np = pytest.importorskip("numpy")
+        pd = pytest.importorskip("pandas")
+        return {
+            "series": pd.Series([1.0, None]),
+            "scalars": [np.float32("nan"), np.float64("nan"), float("inf")],
+            "dates": np.array(["2024-01-02T03:04:05.5", "NaT"], dtype="datetime64[ns]"),
+            "timestamp": pd.Timestamp("2024-01-02"),
+        }
+
+    @ll.route("GET", "/table")
+    def route_table(self):
+        pd = pytest.importorskip("pandas")
+        return pd.DataFrame({"a": [1, 2], "b": ["x", None]})
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(responses, "orjson", None)
+    elif responses.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+@pytest.fixture
+def client():
+    layer = ll.LogicLayer(default_response_class=ll.FastJSONResponse)
+    layer.add_module("/data", DataModule())
+    with TestClient(app=layer) as client:
+        yield client
+
+
+def test_fast_json_route(client: TestClient, encoder: str):
+    res1 = client.get("/data/status")
+    res2 = client.get("/data/dates")
+
+    assert res1.json() == {"module": "DataModule", "version": "1.0", "debug": False, "status": "ok"}
+    assert res2.json()["date"] == "2024-01-02"
+    assert sorted(res2.json()["items"]) == [1, 2]
+
+
+def test_fast_json_numpy(client: TestClient, encoder: str):
+    pytest.importorskip("numpy")
+    res = client.get("/data/array")
+    assert res.json() == {"values": [1.5, None, 3.0], "total": 4.5}
+
+
+def test_fast_json_missing(client: TestClient, encoder: str):
+    pytest.importorskip("pandas")
+    res = client.get("/data/missing")
+    assert res.json() == {
+        "series": [1.0, None],
+        "scalars": [None, None, None],
+        "dates": ["2024-01-02T03:04:05.500000", None],
+        "timestamp": "2024-01-02T00:00:00",
+    }
+
+
+def test_fast_json_dataframe(client: TestClient, encoder: str):
+    pytest.importorskip("pandas")
+    res = client.get("/data/table")
+    assert res.json() == [{"a": 1, "b": "x"}, {"a": 2, "b": None}]
+
+
+def test_arrow_response(client: TestClient):
+    pa = pytest.importorskip("pyarrow")
+    pytest.importorskip("pandas")
+    res = client.get("/data/table", headers={"Accept": responses.ARROW_MEDIA_TYPE})
+
+    assert res.headers["content-type"] == responses.ARROW_MEDIA_TYPE
+    table = pa.ipc.open_stream(res.content).read_all()
+    assert table.to_pydict() == {"a": [1, 2], "b": ["x", None]}
+
+
+def test_fast_json_response_model(client: TestClient, encoder: str):
+    res = client.get("/data/user")
+    assert res.status_code == 200
+    assert res.json() == {"name": "a"}
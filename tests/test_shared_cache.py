@@ -0,0 +1,162 @@
+import multiprocessing
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+from logiclayer.common import LogicLayerException
+
+
+def _worker_store(path, key, value):
+    store = ll.SharedStore(path, max_entries=16, ways=4, slot_size=1024)
+    store.set(key, value)
+    store.close()
+
+
+class MatrixModule(ll.LogicLayerModule):
+    def __init__(self, calls: list, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = calls
+
+    @ll.route("GET", "/square", cache=ll.CachePolicy(ttl=60))
+    def route_square(self, size: int):
+        self.calls.append(size)
+        return [[i * j for j in range(size)] for i in range(size)]
+
+
+def test_store_roundtrip(tmp_path):
+    store = ll.SharedStore(tmp_path / "cache", max_entries=16, ways=4, slot_size=1024)
+    assert store.get("missing") is None
+    assert store.set("matrix", [[1, 2], [3, 4]])
+    assert store.get("matrix") == [[1, 2], [3, 4]]
+    assert store.set("none", None)
+    assert store.get("none", "default") is None
+    assert not store.set("large", b"x" * 2048)
+    assert store.get("large") is None
+
+    store.delete("matrix")
+    assert store.get("matrix") is None
+    store.clear()
+    assert len(store) == 0
+    assert store.stats.hits == 2
+    store.unlink()
+    assert not store.path.exists()
+
+
+def test_store_ttl(tmp_path):
+    store = ll.SharedStore(tmp_path / "cache", max_entries=4, slot_size=256, ttl=0.05)
+    store.set("short", 1)
+    store.set("long", 2, ttl=60)
+    time.sleep(0.1)
+    assert store.get("short") is None
+    assert store.get("long") == 2
+    store.close()
+
+
+def test_store_lru(tmp_path):
+    # a single set, so the eviction is a strict LRU
+    store = ll.SharedStore(tmp_path / "cache", max_entries=2, ways=2, slot_size=256)
+    store.set("a", 1)
+    store.set("b", 2)
+    assert store.get("a") == 1
+    store.set("c", 3)
+    assert store.get("b") is None
+    assert store.get("a") == 1
+    assert store.get("c") == 3
+    assert store.stats.evictions == 1
+    store.close()
+
+
+def test_store_shared_between_processes(tmp_path):
+    path = tmp_path / "cache"
+    store = ll.SharedStore(path, max_entries=16, ways=4, slot_size=1024)
+    context = multiprocessing.get_context("spawn")
+    process = context.Process(target=_worker_store, args=(path, "from-worker", {"a": 1}))
+    process.start()
+    process.join(10)
+    assert process.exitcode == 0
+    assert store.get("from-worker") == {"a": 1}
+
+    # a file in use can't be reset with a different geometry
+    with pytest.raises(LogicLayerException, match="different geometry"):
+        ll.SharedStore(path, max_entries=8, ways=4, slot_size=1024)
+    store.close()
+
+    # once closed, a different geometry resets the file
+    other = ll.SharedStore(path, max_entries=8, ways=4, slot_size=1024)
+    assert other.get("from-worker") is None
+    other.close()
+
+
+def _worker_reset(path):
+    try:
+        ll.SharedStore(path, max_entries=8, ways=4, slot_size=1024)
+    except LogicLayerException:
+        raise SystemExit(3) from None
+
+
+def test_store_geometry_other_process(tmp_path):
+    path = tmp_path / "cache"
+    store = ll.SharedStore(path, max_entries=16, ways=4, slot_size=1024)
+    store.set("key", 1)
+    context = multiprocessing.get_context("spawn")
+    process = context.Process(target=_worker_reset, args=(path,))
+    process.start()
+    process.join(10)
+    assert process.exitcode == 3
+    assert store.get("key") == 1
+    store.close()
+
+
+def test_stores_share_file(tmp_path):
+    path = tmp_path / "cache"
+    first = ll.SharedStore(path, max_entries=16, ways=4, slot_size=1024)
+    second = ll.SharedStore(path, max_entries=16, ways=4, slot_size=1024)
+    assert first._file is second._file
+
+    # closing a store keeps the file of the other open, with its locks
+    first.set("key", 1)
+    first.close()
+    assert second.get("key") == 1
+    with second._locked(0, 8):
+        pass
+    second.close()
+
+
+def test_route_shared_cache(tmp_path):
+    calls = []
+    backend = ll.SharedMemoryCache(tmp_path / "cache", max_entries=16, slot_size=4096)
+    layer1 = ll.LogicLayer()
+    layer1.add_module("/matrix", MatrixModule(calls, cache_backend=backend))
+    # another app in the same host, as a different worker would have
+    layer2 = ll.LogicLayer()
+    other = ll.SharedMemoryCache(tmp_path / "cache", max_entries=16, slot_size=4096)
+    layer2.add_module("/matrix", MatrixModule(calls, cache_backend=other))
+
+    with TestClient(app=layer1) as client1, TestClient(app=layer2) as client2:
+        res1 = client1.get("/matrix/square?size=3")
+        res2 = client2.get("/matrix/square?size=3")
+
+    assert res1.json() == res2.json() == [[0, 0, 0], [0, 1, 2], [0, 2, 4]]
+    assert calls == [3]
+    assert other.stats.hits == 1
+    assert backend.stats.entries == 1
+
+
+def test_store_key_single_slot(tmp_path):
+    store = ll.SharedStore(tmp_path / "cache", max_entries=2, ways=2, slot_size=256)
+    store.set("a", 1)
+    store.set("b", 2)
+    store.delete("a")
+    # the free slot comes before the one of "b", which is updated anyway
+    store.set("b", 3)
+    assert store.usage()[0] == 1
+    store.delete("b")
+    assert store.get("b") is None
+    store.close()
+
+
+def test_store_requires_name():
+    with pytest.raises(ValueError):
+        ll.SharedStore()
@@ -0,0 +1,153 @@
+import gzip
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / "small.json").write_text('{"type": "FeatureCollection", "features": []}' * 50)
+    (tmp_path / "large.js").write_text("console.log('hello');\n" * 5000)
+    (tmp_path / "image.png").write_bytes(os.urandom(4096))
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "index.html").write_text("<h1>" + "docs " * 500 + "</h1>")
+    return tmp_path
+
+
+def make_layer(static_dir, **kwargs):
+    layer = ll.LogicLayer()
+    config = ll.StaticConfig(memory_file_size=64 << 10, **kwargs)
+    layer.add_static("/static", static_dir, html=True, config=config)
+    return layer
+
+
+def test_static_etags_and_gzip(static_dir):
+    layer = make_layer(static_dir, cache_control="public, max-age=60")
+
+    with TestClient(app=layer) as client:
+        plain = client.get("/static/small.json", headers={"Accept-Encoding": "identity"})
+        zipped = client.get("/static/small.json", headers={"Accept-Encoding": "gzip"})
+        refused = client.get(
+            "/static/small.json", headers={"Accept-Encoding": "gzip;q=0, identity"}
+        )
+        binary = client.get("/static/image.png", headers={"Accept-Encoding": "gzip"})
+        cached = client.get(
+            "/static/small.json",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["etag"]},
+        )
+        index = client.get("/static/docs/")
+
+    assert plain.status_code == zipped.status_code == 200
+    assert "content-encoding" not in plain.headers
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["vary"] == "Accept-Encoding"
+    assert zipped.content == plain.content
+    assert plain.headers["etag"] != zipped.headers["etag"]
+    assert plain.headers["cache-control"] == "public, max-age=60"
+    assert "content-encoding" not in refused.headers
+    assert "content-encoding" not in binary.headers
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert index.text.startswith("<h1>docs")
+
+
+def test_static_memory_and_disk(static_dir):
+    layer = make_layer(static_dir)
+    static = layer.app.routes[-1].app
+
+    with TestClient(app=layer) as client:
+        entries = static.entries
+        assert entries["small.json"].identity.body is not None
+        assert entries["large.js"].identity.body is None
+        assert entries["large.js"].gzip.body is not None
+
+        (static_dir / "small.json").write_text("changed")
+        # the index is a snapshot when not watching
+        assert client.get("/static/small.json").text.startswith('{"type"')
+        assert client.get("/static/missing.txt").status_code == 404
+
+        large = client.get("/static/large.js", headers={"Accept-Encoding": "identity"})
+        assert large.headers["etag"] == entries["large.js"].identity.etag
+        assert large.text == (static_dir / "large.js").read_text()
+
+
+def test_static_ranges(static_dir):
+    layer = make_layer(static_dir)
+    content = (static_dir / "small.json").read_bytes()
+    size = len(content)
+
+    with TestClient(app=layer) as client:
+        partial = client.get("/static/small.json", headers={"Range": "bytes=10-19"})
+        suffix = client.get("/static/small.json", headers={"Range": "bytes=-5"})
+        invalid = client.get("/static/small.json", headers={"Range": f"bytes={size}-"})
+        stale = client.get(
+            "/static/small.json", headers={"Range": "bytes=0-4", "If-Range": '"other"'}
+        )
+        large = client.get("/static/large.js", headers={"Range": "bytes=0-9"})
+        head = client.head("/static/small.json", headers={"Accept-Encoding": "identity"})
+
+    assert partial.status_code == 206
+    assert partial.content == content[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{size}"
+    assert suffix.content == content[-5:]
+    assert invalid.status_code == 416
+    assert stale.status_code == 200
+    assert stale.content == content
+    assert large.status_code == 206
+    assert large.text == "console.lo"
+    assert head.content == b""
+    assert head.headers["content-length"] == str(size)
+
+
+def test_static_existing_gz_and_watch(static_dir):
+    original = (static_dir / "large.js").read_bytes()
+    (static_dir / "large.js.gz").write_bytes(gzip.compress(original))
+    layer = make_layer(static_dir, watch=0.05)
+    static = layer.app.routes[-1].app
+
+    with TestClient(app=layer) as client:
+        assert static.entries["large.js"].gzip.body == (static_dir / "large.js.gz").read_bytes()
+
+        (static_dir / "new.txt").write_text("new file")
+        time.sleep(0.3)
+        assert "new.txt" in static.entries
+        assert client.get("/static/new.txt").text == "new file"
+
+
+def test_static_symlinks(static_dir, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("outside")
+    (outside / "secret.txt").write_text("secret")
+    (static_dir / "secret.txt").symlink_to(outside / "secret.txt")
+    (static_dir / "linked").symlink_to(outside, target_is_directory=True)
+    (static_dir / "alias.json").symlink_to(static_dir / "small.json")
+
+    layer = make_layer(static_dir)
+    static = layer.app.routes[-1].app
+    with TestClient(app=layer) as client:
+        assert "alias.json" in static.entries
+        assert "secret.txt" not in static.entries
+        assert "linked/secret.txt" not in static.entries
+        assert client.get("/static/secret.txt").status_code == 404
+        assert client.get("/static/linked/secret.txt").status_code == 404
+
+    layer = make_layer(static_dir, follow_symlinks=True)
+    with TestClient(app=layer) as client:
+        assert client.get("/static/secret.txt").text == "secret"
+        assert client.get("/static/linked/secret.txt").text == "secret"
+
+
+def test_static_symlink_loops(static_dir):
+    (static_dir / "docs" / "up").symlink_to("..", target_is_directory=True)
+    (static_dir / "docs" / "again").symlink_to("..", target_is_directory=True)
+    (static_dir / "docs" / "self").symlink_to(".", target_is_directory=True)
+
+    layer = make_layer(static_dir)
+    static = layer.app.routes[-1].app
+    with TestClient(app=layer) as client:
+        assert client.get("/static/docs/").text.startswith("<h1>docs")
+    assert "small.json" in static.entries
+    assert "docs/index.html" in static.entries
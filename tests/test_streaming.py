@@ -0,0 +1,64 @@
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+from logiclayer.responses import negotiate_stream_format
+
+
+class StreamModule(ll.LogicLayerModule):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.closed = False
+
+    @ll.route("GET", "/rows")
+    def route_rows(self, count: int):
+        try:
+            for index in range(count):
+                yield {"index": index, "square": index * index}
+        finally:
+            self.closed = True
+
+    @ll.route("GET", "/async-rows")
+    async def route_async_rows(self, count: int):
+        for index in range(count):
+            yield {"index": index}
+
+
+def test_negotiate_stream_format():
+    assert negotiate_stream_format(None) == "ndjson"
+    assert negotiate_stream_format("text/csv") == "csv"
+    assert negotiate_stream_format("application/json;q=0.5, text/csv;q=0.9") == "csv"
+    assert negotiate_stream_format("text/html, */*;q=0.1") == "ndjson"
+
+
+def test_route_stream_formats():
+    module = StreamModule()
+    layer = ll.LogicLayer()
+    layer.add_module("/stream", module)
+
+    with TestClient(app=layer) as client:
+        res1 = client.get("/stream/rows?count=3")
+        res2 = client.get("/stream/rows?count=3", headers={"Accept": "text/csv"})
+        res3 = client.get("/stream/async-rows?count=2", headers={"Accept": "application/json"})
+
+    assert res1.status_code == 200, res1.text
+    assert res1.headers["content-type"] == "application/x-ndjson"
+    assert res1.text.splitlines() == [
+        '{"index":0,"square":0}',
+        '{"index":1,"square":1}',
+        '{"index":2,"square":4}',
+    ]
+    assert res2.headers["content-type"].startswith("text/csv")
+    assert res2.text.splitlines() == ["index,square", "0,0", "1,1", "2,4"]
+    assert res3.json() == [{"index": 0}, {"index": 1}]
+    assert module.closed
+
+
+def test_route_stream_schema():
+    layer = ll.LogicLayer()
+    layer.add_module("/stream", StreamModule())
+    schema = layer.app.openapi()
+
+    assert (
+        "application/x-ndjson"
+        in schema["paths"]["/stream/rows"]["get"]["responses"]["200"]["content"]
+    )
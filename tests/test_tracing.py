@@ -0,0 +1,93 @@
+import json
+
+from fastapi.testclient import TestClient
+
+import logiclayer as ll
+from logiclayer.tracing import current_trace
+
+
+class TracedError(Exception):
+    pass
+
+
+class TracedModule(ll.LogicLayerModule):
+    @ll.route("GET", "/item/{item_id}")
+    def route_item(self, item_id: int):
+        with ll.span("lookup", item=item_id) as attributes:
+            attributes["found"] = True
+        return {"id": item_id}
+
+    @ll.route("GET", "/cached", cache=ll.CachePolicy(ttl=60))
+    async def route_cached(self):
+        return {"cached": True}
+
+    @ll.route("GET", "/fail")
+    async def route_fail(self):
+        raise TracedError
+
+    @ll.exception_handler(TracedError)
+    def handle_error(self, request, exc):
+        return ll.FastJSONResponse({"error": True}, status_code=418)
+
+
+def server_timing(response):
+    return [item.split(";")[0] for item in response.headers["server-timing"].split(", ")]
+
+
+def test_server_timing():
+    layer = ll.LogicLayer(tracing=ll.TracingConfig(sample_rate=0))
+    layer.add_module("/mod", TracedModule())
+
+    with TestClient(app=layer) as client:
+        res = client.get("/mod/item/1")
+        assert res.json() == {"id": 1}
+        assert server_timing(res) == ["validate", "lookup", "handler", "serialize", "app"]
+
+        res = client.get("/mod/cached")
+        assert server_timing(res) == ["validate", "auth", "handler", "serialize", "app"]
+
+        res = client.get("/mod/fail")
+        assert res.status_code == 418
+        assert server_timing(res) == ["validate", "handler", "exception_handler", "app"]
+
+        res = client.get("/_health")
+        assert server_timing(res) == ["app"]
+
+    assert layer.tracer is not None
+    assert len(layer.tracer.buffer) == 0
+
+
+def test_trace_buffer_and_file(tmp_path):
+    config = ll.TracingConfig(sample_rate=1.0, buffer_size=2, file=tmp_path / "traces.jsonl")
+    layer = ll.LogicLayer(debug=True, tracing=config)
+    layer.add_module("/mod", TracedModule())
+
+    with TestClient(app=layer) as client:
+        for item_id in range(3):
+            client.get(f"/mod/item/{item_id}")
+        res = client.get("/_debug/traces", params={"path": "/mod"})
+
+    assert res.status_code == 200, res.text
+    traces = res.json()
+    assert [item["path"] for item in traces] == ["/mod/item/2", "/mod/item/1"]
+    trace = traces[0]
+    assert trace["route"] == "TracedModule:/item/{item_id}"
+    assert trace["status"] == 200
+    lookup = next(item for item in trace["spans"] if item["name"] == "lookup")
+    assert lookup["attributes"] == {"item": 2, "found": True}
+
+    lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+    assert len(lines) == 4
+    assert json.loads(lines[0])["path"] == "/mod/item/0"
+
+
+def test_traces_route_debug_only():
+    layer = ll.LogicLayer(tracing=ll.TracingConfig(sample_rate=1.0))
+    with TestClient(app=layer) as client:
+        assert client.get("/_debug/traces").status_code == 404
+
+
+def test_span_without_trace():
+    assert current_trace() is None
+    with ll.span("noop") as value:
+        assert value is None